@@ -12,5 +12,78 @@ COMMISSIONS = {
     '5-9': 0.075,
     '>=10': 0.10
 }
-DB_PATH = 'sqlite:///bot.db'  # SQLite database path
-CURRENCY = 'IRR'  # Assume Iranian Rial as per specs
\ No newline at end of file
+DB_PATH = os.getenv('DB_PATH', 'sqlite:///bot.db')  # SQLite database path
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+UOW_QUERY_WARN = int(os.getenv('UOW_QUERY_WARN', '25'))  # log updates running at least this many SQL statements
+CURRENCY = 'IRR'  # Assume Iranian Rial as per specs
+
+# Registered-user cache (LRU, entries)
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '50000'))
+
+# Conversation state store limits
+STATE_MAX_ENTRIES = int(os.getenv('STATE_MAX_ENTRIES', '50000'))
+STATE_TTL_SECONDS = int(os.getenv('STATE_TTL_SECONDS', '86400'))  # idle wizard expiry
+STATE_HISTORY_LIMIT = int(os.getenv('STATE_HISTORY_LIMIT', '10'))  # back-stack depth
+# Write-ahead journal of state mutations, opt-in (e.g. 'state'); compacted into a snapshot every N mutations.
+# Wizard payloads (names, addresses, document ids) are written in plaintext: use a private directory.
+STATE_JOURNAL_DIR = os.getenv('STATE_JOURNAL_DIR', '')
+STATE_JOURNAL_COMPACT_EVERY = int(os.getenv('STATE_JOURNAL_COMPACT_EVERY', '5000'))
+STATE_JOURNAL_FSYNC = os.getenv('STATE_JOURNAL_FSYNC', '0') == '1'  # fsync every mutation (survives power loss)
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'sqlite:///state.db')  # state shared by worker processes
+
+# Update processing: number of per-user ordered worker threads (0 = plain TeleBot thread pool)
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', '4'))
+
+# Multi-process mode: N worker processes fed by one ingest process (0 = single process)
+PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', '0'))
+PROCESS_QUEUE_SIZE = int(os.getenv('PROCESS_QUEUE_SIZE', '1000'))  # update batches buffered per worker
+EPOCH_BUCKETS = int(os.getenv('EPOCH_BUCKETS', '4096'))  # shared cache-invalidation counters per cache
+
+# Runtime: 'threads' (main.py) or 'asyncio' (main_async.py: Telegram I/O on an event loop)
+BOT_RUNTIME = os.getenv('BOT_RUNTIME', 'threads')
+
+# Handler modules: 'lazy' (imported on the first callback of their routes) or 'eager' (all at startup)
+HANDLER_LOADING = os.getenv('HANDLER_LOADING', 'lazy')
+
+# Update ingestion: 'polling' or 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public https base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+
+# Outbound Telegram API queue (Bot API limits: ~30 msg/s overall, ~1 msg/s per chat)
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_CHAT_BURST = float(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_SENDERS = int(os.getenv('OUTBOUND_SENDERS', '4'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '5'))
+
+# Logging: level per category ("handler=WARNING,router=DEBUG"), sampling of sub-WARNING records ("handler=0.1")
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'kv')  # 'kv' or 'json'
+LOG_CATEGORY_LEVELS = os.getenv('LOG_CATEGORY_LEVELS', '')
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# Prometheus metrics endpoint (GET /metrics); 0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Background admin notifications (retries on top of the outbound queue's own 429/network retries)
+NOTIFIER_MAX_ATTEMPTS = int(os.getenv('NOTIFIER_MAX_ATTEMPTS', '4'))
+NOTIFIER_BACKOFF = float(os.getenv('NOTIFIER_BACKOFF', '2'))  # seconds, doubled per attempt
+
+# Broadcasts: recipients are streamed in chunks; progress is checkpointed after each chunk
+BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '100'))
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))  # msg/s; below OUTBOUND_GLOBAL_RATE so replies keep flowing
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))  # seconds between progress edits
+
+# Flood control in front of all handlers: per-user token bucket + collapsing of repeated identical taps
+FLOOD_RATE = float(os.getenv('FLOOD_RATE', '1'))            # updates per second per user (sustained)
+FLOOD_BURST = float(os.getenv('FLOOD_BURST', '5'))
+FLOOD_DUPLICATE_WINDOW = float(os.getenv('FLOOD_DUPLICATE_WINDOW', '1.5'))  # seconds
+FLOOD_MAX_USERS = int(os.getenv('FLOOD_MAX_USERS', '50000'))
@@ -1,36 +1,152 @@
 # main.py
+import time
+_started = time.perf_counter()  # پیش از هر ایمپورت: زمان ایمپورت‌ها هم جزو startup است
+
+import functools
 import telebot
 from telebot.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from config.settings import BOT_TOKEN, ADMIN_ID, WALLET_ADDRESS
-from src.database.db_manager import init_db, Session
+from config.settings import (
+    BOT_TOKEN, ADMIN_ID, WALLET_ADDRESS, WORKER_THREADS, BOT_RUNTIME,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+    METRICS_HOST, METRICS_PORT, STATE_JOURNAL_DIR, HANDLER_LOADING
+)
+from src.database.db_manager import init_db, allocate_sequence, product_code
+from src.database.uow import unit_of_work, session_scope
 from src.utils.states import (
-    set_state, get_state, get_state_data, clear_state, append_to_state_list, back_state
+    store, set_state, get_state, get_state_data, clear_state, append_to_state_list
 )
+from src.utils.journal import StateJournal
+from src.utils.router import router
+from src.utils.workers import ShardedTeleBot
+from src.utils.webhook import WebhookServer
+from src.utils.outbound import RateLimitedSendMixin
+from src.utils.flood import FloodControlMixin
+from src.utils.notifier import Notifier, api_call
+from src.utils.broadcast import broadcasts
 from src.database.models import Order, User, Product
-from src.utils.keyboards import (
-    visa_menu_keyboard, products_list_keyboard, product_detail_keyboard, get_main_menu_markup
-)
+from src.database.catalog import catalog
+from src.database.users import users
+from src.utils.keyboards import get_main_menu_markup
+from src.utils.log import get_logger, setup_logging
+from src.utils import metrics
+from src.utils.startup import startup
+# ماژول‌های هندلر با اولین کال‌بک مسیرشان ایمپورت می‌شوند (نه اینجا)؛ هر ماژول مسیرهای خود را در router ثبت می‌کند
+from src import handlers
+
+startup.begin(_started)
+startup.mark('imports')
+
+class VisaBot(FloodControlMixin, RateLimitedSendMixin, ShardedTeleBot):
+    """Flood control + per-user ordered update workers + rate-limited outbound queue."""
+
+
+class SimpleVisaBot(FloodControlMixin, RateLimitedSendMixin, telebot.TeleBot):
+    """Flood control + rate-limited outbound queue on TeleBot's own thread pool."""
+
+
+# آپدیت‌های هر کاربر به ترتیب، و کاربران مختلف به صورت موازی پردازش می‌شوند
+if BOT_RUNTIME == 'asyncio':
+    from src.utils.aio import AsyncSendMixin
+
+    class AsyncioVisaBot(FloodControlMixin, AsyncSendMixin, RateLimitedSendMixin, ShardedTeleBot):
+        """The same handlers on worker threads; Telegram I/O runs on main_async's event loop."""
+
+    bot = AsyncioVisaBot(BOT_TOKEN, num_workers=max(WORKER_THREADS, 1))
+elif WORKER_THREADS > 0:
+    bot = VisaBot(BOT_TOKEN, num_workers=WORKER_THREADS)
+else:
+    bot = SimpleVisaBot(BOT_TOKEN)
+startup.mark('bot')
+init_db()  # تنها بررسی schema: یک PRAGMA user_version وقتی دیتابیس به‌روز است
+startup.mark('schema')
+log = get_logger('handler')
+
+# ── متریک‌ها ──
+UPDATES = metrics.counter('visabot_updates', 'Updates handled, by kind', ['kind'])
+UPDATE_ERRORS = metrics.counter('visabot_update_errors', 'Updates whose handler failed, by kind', ['kind'])
+MESSAGE_SECONDS = metrics.histogram('visabot_message_seconds', 'Message handler latency by conversation state', ['state'])
+ROUTE_SECONDS = metrics.histogram('visabot_route_seconds', 'Callback handler latency by route', ['route'])
+ROUTE_CALLS = metrics.counter('visabot_route_calls', 'Callback dispatches by route and outcome', ['route', 'outcome'])
+metrics.gauge('visabot_state_store_size', 'Users with an active conversation state').set_function(
+    lambda: store.stats()['size'])
+metrics.gauge('visabot_outbound_queue_depth', 'Outgoing API calls waiting to be sent').set_function(
+    bot.outbound.queue_depth)
+if hasattr(bot, 'executor'):
+    _worker_depth = metrics.gauge('visabot_worker_queue_depth', 'Updates waiting per worker shard', ['shard'])
+    for _shard, _queue in enumerate(bot.executor.queues):
+        _worker_depth.labels(_shard).set_function(_queue.qsize)
+
+
+def _observe_route(route, elapsed, error):
+    ROUTE_SECONDS.labels(route.pattern).observe(elapsed)
+    ROUTE_CALLS.labels(route.pattern, 'error' if error else 'ok').inc()
+
+
+router.add_observer(_observe_route)
+
+
+def instrumented_message_handler(handler):
+    @functools.wraps(handler)
+    def wrapper(message):
+        state = get_state(message.from_user.id)
+        started = time.perf_counter()
+        try:
+            # یک session مشترک برای کل آپدیت؛ commit یک‌باره در پایان
+            with unit_of_work('message'):
+                return handler(message)
+        finally:
+            MESSAGE_SECONDS.labels(state or 'none').observe(time.perf_counter() - started)
+            UPDATES.labels('message').inc()
+            startup.first_update('message')
+    return wrapper
+
+
+# اعلان‌های ادمین در پس‌زمینه، با اولویت پایین‌تر از پاسخ کاربران
+admin_notifier = Notifier(bot.outbound, name='admin-notifier')
+
+
+def notify_admin_new_order(order_id: int, user_id: int, data: dict):
+    media = []
+    if data.get('passport_file_id'):
+        media.append(telebot.types.InputMediaPhoto(data['passport_file_id'], caption="Passport"))
+    if data.get('verification_video_id'):
+        media.append(telebot.types.InputMediaVideo(data['verification_video_id'], caption="Verification Video"))
+
+    caption = (
+        f"New Order #{order_id}\n"
+        f"User ID: {user_id}\n"
+        f"Full Name: {data.get('full_name', 'N/A')}\n"
+        f"Address: {data.get('address', 'N/A')}\n"
+        f"Mobile: {data.get('mobile', 'N/A')}\n"
+        f"Product: {data.get('product_name', 'Unknown')}\n"
+        f"Price: {data.get('product_price', 0):,} IRR\n"
+        f"Deposit Hash: {data.get('tx_hash')}\n"
+        f"Status: Pending"
+    )
 
-# ایمپورت تمام هندلرها
-from src.handlers import (
-    onboarding,
-    profile,
-    wallet,
-    orders,
-    support,
-    vip,
-    admin,
-    visa_card
-)
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(
+        InlineKeyboardButton("Accept", callback_data=f"admin:accept_order:{order_id}"),
+        InlineKeyboardButton("Reject", callback_data=f"admin:reject_order:{order_id}")
+    )
+    markup.add(
+        InlineKeyboardButton(
+            "Open User Chat",
+            url=f"tg://user?id={user_id}"
+        )
+    )
 
-bot = telebot.TeleBot(BOT_TOKEN)
-init_db()
+    calls = [api_call('send_media_group', ADMIN_ID, media)] if media else []
+    calls.append(api_call('send_message', ADMIN_ID, caption, reply_markup=markup))
+    admin_notifier.notify(*calls, label=f"order:{order_id}")
 
 
 # ── شروع ربات ──
 @bot.message_handler(commands=['start'])
+@instrumented_message_handler
 def start_handler(message):
     user_id = message.from_user.id
+    handlers.load('onboarding').register_user(message)
     text = (
         "Welcome to Visa Card Bot!\n"
         "Choose an option below:"
@@ -40,18 +156,17 @@ def start_handler(message):
         text,
         reply_markup=get_main_menu_markup(user_id)
     )
+    startup.first_update('start')
     
     
 
 @bot.message_handler(content_types=['text', 'photo', 'video', 'document'])
+@instrumented_message_handler
 def text_or_media_handler(message):
     user_id = message.from_user.id
-    
-    print(f"[HANDLER START] User: {user_id} | Type: {message.content_type} | Text: {message.text or '(no text)'}")
-    
     state = get_state(user_id)
-    print(f"[HANDLER] Current state: {state}")
-    
+    log.debug('message_received', user_id=user_id, content_type=message.content_type, state=state, text=message.text)
+
     if not state:
         bot.reply_to(message, "Please use the inline buttons.")
         return
@@ -61,7 +176,7 @@ def text_or_media_handler(message):
         if state == 'admin_add_product_photo':
             if message.content_type == 'photo':
                 photo_id = message.photo[-1].file_id
-                print(f"[PHOTO SAVED] File ID: {photo_id}")
+                log.debug('product_photo_received', user_id=user_id, photo_file_id=photo_id)
                 set_state(user_id, 'admin_add_product_name', {'photo_file_id': photo_id})
                 bot.reply_to(
                     message,
@@ -109,17 +224,19 @@ def text_or_media_handler(message):
             text = message.text.strip()
             if text == '/done':
                 data = get_state_data(user_id) or {}
-                session = Session()
                 try:
-                    product = Product(
-                        code=f"PK-{session.query(Product).count() + 1:03d}",
-                        name=data.get('name', 'Unnamed'),
-                        price=data.get('price', 0),
-                        description_text="\n".join(data.get('descriptions', [])) or None,
-                        photo_file_id=data.get('photo_file_id')
-                    )
-                    session.add(product)
-                    session.commit()
+                    with session_scope() as session:
+                        product = Product(
+                            code=product_code(allocate_sequence(session, 'product_code')[0]),
+                            name=data.get('name', 'Unnamed'),
+                            price=data.get('price', 0),
+                            description_text="\n".join(data.get('descriptions', [])) or None,
+                            photo_file_id=data.get('photo_file_id')
+                        )
+                        session.add(product)
+                        session.commit()
+                    catalog.upsert(product)
+                    log.info('product_added', admin_id=user_id, product_id=product.id, code=product.code)
                     bot.send_message(
                         message.chat.id,
                         f"Product added successfully!\n\n"
@@ -132,14 +249,49 @@ def text_or_media_handler(message):
                     )
                     clear_state(user_id)
                 except Exception as e:
+                    UPDATE_ERRORS.labels('message').inc()
+                    log.exception('product_save_failed', admin_id=user_id)
                     bot.send_message(message.chat.id, f"Error saving product: {str(e)}")
-                finally:
-                    session.close()
             else:
                 append_to_state_list(user_id, 'descriptions', text)
                 count = len(get_state_data(user_id).get('descriptions', []))
                 bot.reply_to(message, f"Description {count} saved.\nSend next or /done to finish.")
 
+        # ── بخش ادمین: ویرایش قیمت محصول ──
+        elif state == 'admin_edit_price':
+            try:
+                price = int(message.text.strip())
+            except ValueError:
+                bot.reply_to(message, "Price must be a number. Try again.")
+                return
+            product_id = get_state_data(user_id, 'product_id')
+            with session_scope() as session:
+                product = session.get(Product, product_id)
+                if not product:
+                    bot.reply_to(message, "Product not found.")
+                    clear_state(user_id)
+                    return
+                product.price = price
+                session.commit()
+            catalog.upsert(product)
+            bot.reply_to(
+                message,
+                f"Price of {product.name} updated to {price:,} IRR.",
+                reply_markup=InlineKeyboardMarkup().add(
+                    InlineKeyboardButton("Back", callback_data=f"admin:select_edit:{product.id}")
+                )
+            )
+            clear_state(user_id)
+
+        elif state == 'admin_import_products':
+            handlers.load('admin').handle_import_document(bot, message)
+
+        elif state == 'admin_broadcast_text':
+            handlers.load('admin').handle_broadcast_message(bot, message)
+
+        elif state.startswith('wallet_transfer_'):
+            handlers.load('wallet').handle_transfer_message(bot, message, state)
+
         # ── بخش سفارش ویزا کارت ── (دقیقاً طبق فلو شما)
         elif state.startswith('order_'):
             data = get_state_data(user_id) or {}
@@ -214,8 +366,8 @@ def text_or_media_handler(message):
                     bot.reply_to(message, "Please send a photo of your passport.", reply_markup=cancel_markup)
 
             elif state == 'order_verification_video':
-                print(f"[VERIFICATION VIDEO] Received content_type: {message.content_type}")
-                
+                log.debug('verification_video_received', user_id=user_id, content_type=message.content_type)
+
                 file_id = None
                 if message.content_type == 'video':
                     file_id = message.video.file_id
@@ -242,281 +394,137 @@ def text_or_media_handler(message):
                 if tx_hash:
                     data['tx_hash'] = tx_hash
 
-                    session = Session()
                     try:
-                        # Update User
-                        user = session.query(User).filter_by(user_id=user_id).first()
-                        if user:
-                            user.full_name = data.get('full_name')
-                            user.address = data.get('address')
-                            user.mobile = data.get('mobile')
-                            user.passport_file_id = data.get('passport_file_id')
-                            user.verification_video_id = data.get('verification_video_id')
-                            session.commit()
-
-                        # Create Order
-                        order = Order(
-                            user_id=user_id,
-                            product_id=product_id,
-                            product_name=product_name,
-                            product_price=product_price,
-                            full_name=data.get('full_name'),
-                            address=data.get('address'),
-                            mobile=data.get('mobile'),
-                            passport_file_id=data.get('passport_file_id'),
-                            verification_video_id=data.get('verification_video_id'),
-                            tx_hash=tx_hash,
-                            status='pending'
-                        )
-                        session.add(order)
-                        session.commit()
-
-                        # Send to admin
-                        media = []
-                        if data.get('passport_file_id'):
-                            media.append(telebot.types.InputMediaPhoto(data['passport_file_id'], caption="Passport"))
-                        if data.get('verification_video_id'):
-                            media.append(telebot.types.InputMediaVideo(data['verification_video_id'], caption="Verification Video"))
-
-                        caption = (
-                            f"New Order #{order.id}\n"
-                            f"User ID: {user_id}\n"
-                            f"Full Name: {data.get('full_name', 'N/A')}\n"
-                            f"Address: {data.get('address', 'N/A')}\n"
-                            f"Mobile: {data.get('mobile', 'N/A')}\n"
-                            f"Product: {product_name}\n"
-                            f"Price: {product_price:,} IRR\n"
-                            f"Deposit Hash: {tx_hash}\n"
-                            f"Status: Pending"
-                        )
-
-                        markup = InlineKeyboardMarkup(row_width=2)
-                        markup.add(
-                            InlineKeyboardButton("Accept", callback_data=f"admin:accept_order:{order.id}"),
-                            InlineKeyboardButton("Reject", callback_data=f"admin:reject_order:{order.id}")
-                        )
-                        markup.add(
-                            InlineKeyboardButton(
-                                "Open User Chat",
-                                url=f"tg://user?id={user_id}"
+                        with session_scope() as session:
+                            # کاربر و سفارش در یک تراکنش: یا هر دو ثبت می‌شوند یا هیچ‌کدام
+                            session.query(User).filter_by(user_id=user_id).update({
+                                'full_name': data.get('full_name'),
+                                'address': data.get('address'),
+                                'mobile': data.get('mobile'),
+                                'passport_file_id': data.get('passport_file_id'),
+                                'verification_video_id': data.get('verification_video_id'),
+                            }, synchronize_session=False)
+
+                            order = Order(
+                                user_id=user_id,
+                                product_id=product_id,
+                                product_name=product_name,
+                                product_price=product_price,
+                                full_name=data.get('full_name'),
+                                address=data.get('address'),
+                                mobile=data.get('mobile'),
+                                passport_file_id=data.get('passport_file_id'),
+                                verification_video_id=data.get('verification_video_id'),
+                                tx_hash=tx_hash,
+                                status='pending'
                             )
-                        )
-
-                        if media:
-                            bot.send_media_group(ADMIN_ID, media)
-                        bot.send_message(ADMIN_ID, caption, reply_markup=markup)
-
-                        bot.send_message(
-                            message.chat.id,
-                            "Your order has been submitted successfully! We will review it soon.",
-                            reply_markup=get_main_menu_markup(user_id)
-                        )
-                        clear_state(user_id)
+                            session.add(order)
+                            session.commit()
+                            order_id = order.id
                     except Exception as e:
-                        print(f"[ORDER SAVE ERROR] {str(e)}")
+                        UPDATE_ERRORS.labels('message').inc()
+                        log.exception('order_save_failed', user_id=user_id)
                         bot.send_message(message.chat.id, f"Error submitting order: {str(e)}")
-                    finally:
-                        session.close()
+                        return
+                    users.invalidate(user_id)
+
+                    log.info('order_submitted', user_id=user_id, order_id=order_id, product_id=product_id)
+                    # پاسخ کاربر بلافاصله بعد از commit؛ اعلان ادمین در پس‌زمینه ارسال می‌شود
+                    bot.send_message(
+                        message.chat.id,
+                        "Your order has been submitted successfully! We will review it soon.",
+                        reply_markup=get_main_menu_markup(user_id)
+                    )
+                    clear_state(user_id)
+                    notify_admin_new_order(order_id, user_id, data)
                 else:
                     bot.reply_to(message, "Transaction hash cannot be empty. Try again.", reply_markup=cancel_markup)
 
+        else:
+            bot.reply_to(message, "Please use the inline buttons.")
+
     except Exception as e:
-        print(f"[HANDLER CRASH] {type(e).__name__}: {str(e)}")
+        UPDATE_ERRORS.labels('message').inc()
+        log.exception('message_handler_crashed', user_id=user_id, state=state)
         bot.reply_to(message, f"An error occurred: {str(e)}")
         
+# ── منوی اصلی ──
+@router.route('menu')
+@router.route('menu:main')
+def main_menu(bot, call: CallbackQuery):
+    bot.edit_message_text(
+        "Main Menu",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=get_main_menu_markup(call.from_user.id)
+    )
+
+
 # ── دیسپچر مرکزی کال‌بک‌ها ──
 @bot.callback_query_handler(func=lambda call: True)
 def callback_handler(call: CallbackQuery):
+    UPDATES.labels('callback').inc()
     try:
-        data = call.data.split(':')
-        if not data:
-            bot.answer_callback_query(call.id, "Invalid data")
-            return
-
-        menu = data[0]
-
-        if menu == 'menu':
-            sub = data[1] if len(data) > 1 else 'main'
-
-            if sub == 'main':
-                bot.edit_message_text(
-                    "Main Menu",
-                    call.message.chat.id,
-                    call.message.message_id,
-                    reply_markup=get_main_menu_markup(call.from_user.id)
-                )
-
-            elif sub == 'profile':
-                profile.profile_handler(bot, call)
-                
-            elif menu == 'order' and sub == 'back':
-                previous_state, previous_data = back_state(call.from_user.id)
-                if previous_state:
-                    print(f"[BACK] Returned to {previous_state}")
-                    # نمایش دوباره پیام مرحله قبلی
-                    if previous_state == 'order_full_name':
-                        bot.edit_message_text(
-                            "Please enter your full name in English (back from previous step):",
-                            call.message.chat.id,
-                            call.message.message_id,
-                            reply_markup=InlineKeyboardMarkup().add(
-                                InlineKeyboardButton("Cancel", callback_data="order:cancel")
-                            )
-                        )
-                    elif previous_state == 'order_address':
-                        bot.edit_message_text(
-                            "Please enter your address in English format (back):",
-                            call.message.chat.id,
-                            call.message.message_id,
-                            reply_markup=InlineKeyboardMarkup().add(
-                                InlineKeyboardButton("Cancel", callback_data="order:cancel")
-                            )
-                        )
-                    # برای بقیه stateها هم مشابه اضافه کن (mobile, passport, video, hash)
-                    else:
-                        bot.edit_message_text(
-                            f"Returned to previous step: {previous_state}",
-                            call.message.chat.id,
-                            call.message.message_id
-                        )
-                    set_state(call.from_user.id, previous_state, previous_data)
-                else:
-                    bot.answer_callback_query(call.id, "No previous step available.", show_alert=True)
-                
-            elif sub == 'list_products':
-                admin.admin_list_products(bot, call)
-            
-            elif menu == 'order' and sub == 'start':
-                try:
-                    product_id = int(data[2])
-                    print(f"[ORDER START] Starting order for product {product_id}")
-                    
-                    # پیام قبلی (عکس) رو حذف کن
-                    try:
-                        bot.delete_message(call.message.chat.id, call.message.message_id)
-                        print("[ORDER START] Deleted previous photo message")
-                    except Exception as del_e:
-                        print(f"[ORDER DELETE ERROR] {str(del_e)}")
-
-                    # حالا شروع جریان سفارش با پیام جدید
-                    visa_card.start_order_flow(bot, call, product_id)
-                except (IndexError, ValueError):
-                    bot.answer_callback_query(call.id, "Invalid product ID", show_alert=True)
-
-            elif sub == 'edit_product':
-                admin.admin_edit_product(bot, call)
-
-            elif sub == 'delete_product':
-                admin.admin_delete_product(bot, call)
-
-            elif sub == 'wallet':
-                wallet.wallet_handler(bot, call)
-
-            elif sub == 'visa_card':
-                visa_card.visa_card_handler(bot, call)
-
-            elif sub == 'orders':
-                orders.orders_handler(bot, call)   # اگر هنوز وجود ندارد، placeholder بگذار
-
-            elif sub == 'support':
-                support.support_handler(bot, call)
-
-            elif sub == 'vip':
-                vip.vip_handler(bot, call)
-
-        elif menu == 'wallet':
-            action = ':'.join(data[1:])
-            wallet.wallet_callback_handler(bot, call, action)
-
-        elif menu == 'visa':
-            action = ':'.join(data[1:])
-            print(f"[VISA DISPATCH] Processing action: {action}")
-            visa_card.visa_callback_handler(bot, call, action)
-
-        elif menu == 'admin':
-            if call.from_user.id != ADMIN_ID:
-                bot.answer_callback_query(call.id, "Access denied", show_alert=True)
-                return
-
-            sub = data[1] if len(data) > 1 else 'main'
-
-            if sub == 'main' or sub == '':
-                # Admin Panel اصلی
-                markup = InlineKeyboardMarkup(row_width=1)
-                markup.add(
-                    InlineKeyboardButton("Product Settings", callback_data="admin:products"),
-                    InlineKeyboardButton("Back to Main Menu", callback_data="menu:main")
-                )
-                bot.edit_message_text(
-                    "Admin Panel",
-                    call.message.chat.id,
-                    call.message.message_id,
-                    reply_markup=markup
-                )
-
-            elif sub == 'products':
-                admin.admin_products_menu(bot, call)
-
-            elif sub == 'add_product':
-                admin.admin_start_add_product(bot, call)
-                
-            elif sub == 'add_product_skip_photo':
-                admin.admin_skip_photo(bot, call)
-                
-            elif sub == 'cancel_add_product':
-                admin.admin_cancel_add_product(bot, call)
-                
-            elif sub == 'list_products':
-                admin.admin_list_products(bot, call)
-
-            elif sub == 'edit_product':
-                admin.admin_edit_product(bot, call)
-
-            elif sub == 'delete_product':
-                admin.admin_delete_product(bot, call)
-
-            # انتخاب محصول برای ویرایش یا حذف
-            elif sub == 'select_edit':
-                product_id = int(data[2])
-                admin.admin_select_edit(bot, call, product_id)
-
-            elif sub == 'edit_price':
-                product_id = int(data[2])
-                admin.admin_edit_price(bot, call, product_id)
-
-            elif sub == 'edit_descriptions':
-                product_id = int(data[2])
-                admin.admin_edit_descriptions(bot, call, product_id)
-
-            # تأیید حذف
-            elif sub == 'confirm_delete':
-                product_id = int(data[2])
-                admin.admin_confirm_delete(bot, call, product_id)
-
-            elif sub == 'delete_confirm_yes':
-                product_id = int(data[2])
-                admin.admin_delete_confirm_yes(bot, call, product_id)
-
-            # برای view در لیست
-            elif sub == 'view_product':
-                product_id = int(data[2])
-                admin.admin_view_product(bot, call, product_id)
-
-            elif sub == 'add_product_skip_photo':
-                admin.admin_skip_photo(bot, call)
-            elif sub == 'cancel_add_product':
-                admin.admin_cancel_add_product(bot, call)
-
-            else:
-                bot.answer_callback_query(call.id, f"Unknown admin command: {sub}", show_alert=True)
-
+        with unit_of_work('callback'):
+            matched = router.dispatch(bot, call)
+        if not matched:
+            ROUTE_CALLS.labels('<unmatched>', 'unmatched').inc()
+            bot.answer_callback_query(call.id, "Invalid command.")
     except Exception as e:
-        print(f"Callback error: {e}")
+        UPDATE_ERRORS.labels('callback').inc()
+        log.exception('callback_failed', user_id=call.from_user.id, data=call.data)
         try:
             bot.answer_callback_query(call.id, "An error occurred", show_alert=True)
         except:
             pass
+    startup.first_update('callback')
+
 
+# ── بارگذاری هندلرها ──
+if HANDLER_LOADING == 'eager':
+    handlers.load_all()
+else:
+    handlers.install(router)
+startup.mark('routes')
 
-print("Bot is running...")
-bot.infinity_polling(timeout=20, long_polling_timeout=30)
\ No newline at end of file
+
+def run_polling():
+    bot.remove_webhook()
+    get_logger('bot').info('bot_started', mode='polling')
+    bot.infinity_polling(timeout=20, long_polling_timeout=30)
+
+
+def run_webhook():
+    server = WebhookServer(
+        WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH,
+        on_update=lambda update: bot.process_new_updates([update]),
+        secret=WEBHOOK_SECRET
+    )
+    bot.remove_webhook()
+    bot.set_webhook(url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None)
+    get_logger('bot').info('bot_started', mode='webhook', host=WEBHOOK_HOST, port=server.port, path=WEBHOOK_PATH)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def start_services():
+    """Process-wide startup shared by both entry points (main.py and main_async.py)."""
+    setup_logging()
+    if METRICS_PORT:
+        metrics.MetricsServer(METRICS_HOST, METRICS_PORT).start()
+    if STATE_JOURNAL_DIR:
+        # ویزاردهای نیمه‌کاره قبل از اولین آپدیت بازیابی می‌شوند
+        store.attach_journal(StateJournal(STATE_JOURNAL_DIR))
+    broadcasts.resume_interrupted(bot)  # ارسال‌های نیمه‌کاره از آخرین checkpoint ادامه می‌یابند
+    startup.mark('services')
+    startup.report(runtime=BOT_RUNTIME, handlers=HANDLER_LOADING)
+
+
+if __name__ == '__main__':
+    start_services()
+    if BOT_MODE == 'webhook':
+        run_webhook()
+    else:
+        run_polling()
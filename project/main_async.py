@@ -0,0 +1,42 @@
+# main_async.py
+"""Asyncio entry point: the handlers of main.py with Telegram I/O on an event loop.
+
+Run with ``python main_async.py``. Updates are long-polled (or received by
+the webhook server) and replies are sent through ``AsyncTeleBot`` on one event
+loop, so waiting on Telegram holds no thread. Handlers, flood control, the
+per-user worker shards and the database layer are the ones main.py uses;
+worker threads only spend time on handler code and local SQLite.
+"""
+import os
+
+os.environ['BOT_RUNTIME'] = 'asyncio'  # پیش از ایمپورت تنظیمات و main
+
+import asyncio
+from telebot.async_telebot import AsyncTeleBot
+from config.settings import BOT_TOKEN, BOT_MODE
+import main
+from src.utils.aio import poll_updates
+from src.utils.log import get_logger
+
+log = get_logger('bot')
+
+
+async def run():
+    async_bot = AsyncTeleBot(BOT_TOKEN)
+    main.bot.outbound.bind(async_bot)
+    try:
+        if BOT_MODE == 'webhook':
+            # سرور وب‌هوک روی thread خودش؛ حلقه فقط ارسال‌ها را انجام می‌دهد
+            await asyncio.get_running_loop().run_in_executor(None, main.run_webhook)
+        else:
+            await async_bot.delete_webhook()
+            log.info('bot_started', mode='polling', runtime='asyncio')
+            await poll_updates(main.bot, async_bot)
+    finally:
+        main.bot.outbound.stop(wait=False)
+        await async_bot.close_session()
+
+
+if __name__ == '__main__':
+    main.start_services()
+    asyncio.run(run())
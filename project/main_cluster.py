@@ -0,0 +1,56 @@
+# main_cluster.py
+"""Multi-process entry point: one ingest process and PROCESS_WORKERS worker processes.
+
+Run with ``PROCESS_WORKERS=4 python main_cluster.py``. This process fetches
+updates (polling or webhook), applies flood control and shards them by user
+id onto per-worker queues; each worker runs the full bot of main.py on its
+own core. This module stays light on purpose: spawned workers re-import it.
+"""
+from config.settings import (
+    BOT_TOKEN, PROCESS_WORKERS, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+    METRICS_HOST, METRICS_PORT, STATE_TTL_SECONDS
+)
+from src.database.db_manager import init_db
+from src.database.state_backend import SQLiteStateBackend
+from src.utils.supervisor import Supervisor, IngestBot
+from src.utils.webhook import WebhookServer
+from src.utils.log import get_logger, setup_logging
+from src.utils import metrics
+
+log = get_logger('bot')
+
+
+def run():
+    setup_logging()
+    if METRICS_PORT:
+        metrics.MetricsServer(METRICS_HOST, METRICS_PORT).start()
+    init_db()  # schema یک بار، پیش از اتصال workerها بررسی/مهاجرت می‌شود
+    supervisor = Supervisor(max(PROCESS_WORKERS, 1)).start()
+    # state کاربران در workerهاست؛ این پروسه فقط از جدول مشترک می‌خواند (آن هم برای کاربر بالای حد)
+    states = SQLiteStateBackend()
+    bot = IngestBot(BOT_TOKEN, supervisor.queues,
+                    in_conversation=lambda user_id: states.active(user_id, STATE_TTL_SECONDS))
+    try:
+        bot.remove_webhook()
+        if BOT_MODE == 'webhook':
+            server = WebhookServer(
+                WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH,
+                on_update=lambda update: bot.process_new_updates([update]),
+                secret=WEBHOOK_SECRET
+            )
+            bot.set_webhook(url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None)
+            log.info('bot_started', mode='webhook', workers=len(supervisor.queues), port=server.port)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+        else:
+            log.info('bot_started', mode='polling', workers=len(supervisor.queues))
+            bot.infinity_polling(timeout=20, long_polling_timeout=30)
+    finally:
+        supervisor.stop()
+        bot.outbound.stop()
+
+
+if __name__ == '__main__':
+    run()
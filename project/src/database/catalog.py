@@ -0,0 +1,117 @@
+# src/database/catalog.py
+import threading
+from bisect import bisect_left, bisect_right
+from .db_manager import Session
+from .models import Product
+
+
+class CatalogProduct:
+    """Detached, read-only snapshot of a Product row."""
+
+    __slots__ = ('id', 'code', 'name', 'price', 'description_text', 'photo_file_id')
+
+    def __init__(self, product: Product):
+        self.id = product.id
+        self.code = product.code
+        self.name = product.name
+        self.price = product.price
+        self.description_text = product.description_text
+        self.photo_file_id = product.photo_file_id
+
+
+def _build_state(products):
+    products = tuple(products)
+    # کلیدها منفیِ id هستند تا ترتیب صعودی برای bisect برقرار باشد
+    return products, {p.id: p for p in products}, [-p.id for p in products]
+
+
+class ProductCatalog:
+    """Process-wide product cache: an id-descending tuple plus an id index.
+
+    Filled from the DB on first use; admin write paths keep it current with
+    ``upsert``/``remove`` after their commit, or drop it with ``invalidate``.
+    With ``epochs`` set (multi-process mode) every such write also bumps a
+    shared counter, and each process reloads once it sees the counter move.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (tuple مرتب بر اساس id نزولی, dict از id به محصول, کلیدهای bisect) یا None وقتی هنوز لود نشده
+        self._state = None
+        self.loads = 0
+        self.epochs = None        # EpochRegion مشترک بین پروسه‌ها، یا None
+        self._loaded_epoch = 0
+
+    def _fresh(self, state) -> bool:
+        return state is not None and (self.epochs is None or self.epochs.read() == self._loaded_epoch)
+
+    def _ensure_loaded(self):
+        state = self._state
+        if self._fresh(state):
+            return state
+        with self._lock:
+            if not self._fresh(self._state):
+                # epoch پیش از خواندن ثبت می‌شود تا تغییر هم‌زمان، بار بعد دوباره لود شود
+                epoch = self.epochs.read() if self.epochs is not None else 0
+                session = Session()
+                try:
+                    rows = session.query(Product).order_by(Product.id.desc()).all()
+                    products = tuple(CatalogProduct(p) for p in rows)
+                finally:
+                    session.close()
+                self._state = _build_state(products)
+                self._loaded_epoch = epoch
+                self.loads += 1
+            return self._state
+
+    def all(self) -> tuple:
+        return self._ensure_loaded()[0]
+
+    def get(self, product_id: int):
+        return self._ensure_loaded()[1].get(product_id)
+
+    def page(self, cursor: int = None, direction: str = 'n', per_page: int = 5):
+        """Keyset page over the id-descending catalog; see ``get_transactions_page``.
+
+        Returns ``(products, has_more)``.
+        """
+        products, _, keys = self._ensure_loaded()
+        if cursor is None:
+            return products[:per_page], len(products) > per_page
+        if direction == 'p':
+            end = bisect_left(keys, -cursor)
+            start = max(0, end - per_page)
+            return products[start:end], start > 0
+        start = bisect_right(keys, -cursor)
+        return products[start:start + per_page], len(products) > start + per_page
+
+    def __len__(self):
+        return len(self._ensure_loaded()[0])
+
+    def upsert(self, product: Product):
+        """Insert or replace a product after its row has been committed."""
+        snapshot = CatalogProduct(product)
+        with self._lock:
+            if self._state is not None:
+                by_id = dict(self._state[1])
+                by_id[snapshot.id] = snapshot
+                self._state = _build_state(sorted(by_id.values(), key=lambda p: p.id, reverse=True))
+        self._bump()
+
+    def remove(self, product_id: int):
+        with self._lock:
+            if self._state is not None and product_id in self._state[1]:
+                self._state = _build_state(p for p in self._state[0] if p.id != product_id)
+        self._bump()
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+        self._bump()
+
+    def _bump(self):
+        if self.epochs is not None:
+            self.epochs.bump()
+
+
+catalog = ProductCatalog()
@@ -1,70 +1,245 @@
 # src/database/db_manager.py
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, select, update, or_, and_, func
 from sqlalchemy.orm import sessionmaker, scoped_session
-from .models import Base, User, Referral, Order, Wallet, Transaction, SupportTicket
-from config.settings import DB_PATH
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import Base, User, Referral, Order, Wallet, Transaction, SupportTicket, Sequence
+from .migrations import migrate
+from .uow import record_query, session_scope
+from config.settings import DB_PATH, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
+from src.utils import metrics
 
-engine = create_engine(DB_PATH)
+DB_QUERY_SECONDS = metrics.histogram('visabot_db_query_seconds', 'Time spent executing SQL statements', ['statement'])
+DB_ERRORS = metrics.counter('visabot_db_errors', 'SQL statements that raised', ['statement'])
+_STATEMENT_KINDS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'PRAGMA', 'CREATE', 'WITH'})
+
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip()[:7].upper().split(None, 1)
+    return head[0] if head and head[0] in _STATEMENT_KINDS else 'OTHER'
+
+
+def instrument_engine(engine):
+    """Record per-statement execution time into ``visabot_db_query_seconds`` and the current unit of work."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        DB_QUERY_SECONDS.labels(_statement_kind(statement)).observe(elapsed)
+        record_query(elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+        DB_ERRORS.labels(_statement_kind(exception_context.statement or '')).inc()
+
+
+def create_db_engine(url: str = DB_PATH):
+    """The only place engines are built; SQLite connections get WAL and tuned pragmas."""
+    engine = create_engine(url, connect_args={'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000})
+
+    if engine.dialect.name == 'sqlite':
+        in_memory = engine.url.database in (None, '', ':memory:')
+
+        @event.listens_for(engine, 'connect')
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if not in_memory:
+                # WAL: خواندن همزمان با نوشتن؛ NORMAL در حالت WAL امن و سریع‌تر است
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.close()
+
+    instrument_engine(engine)
+    return engine
+
+
+engine = create_db_engine(DB_PATH)
 Session = scoped_session(sessionmaker(bind=engine))
-# در db_manager.py یا main.py
-Base.metadata.create_all(engine)
+
 
 def init_db():
-    Base.metadata.create_all(engine)
-    
+    """Check the schema version once and migrate if needed (replaces repeated create_all)."""
+    return migrate(engine)
+
 
 def get_user(user_id: int) -> User:
-    session = Session()
-    try:
+    with session_scope() as session:
         return session.query(User).filter_by(user_id=user_id).first()
-    finally:
-        session.close()
 
 def create_user(user_data: dict) -> User:
-    session = Session()
-    try:
+    with session_scope() as session:
         user = User(**user_data)
         session.add(user)
-        session.commit()
+        session.flush()
         return user
-    finally:
-        session.close()
 
 def create_order(order_data: dict) -> Order:
-    session = Session()
-    try:
+    with session_scope() as session:
         order = Order(**order_data)
         session.add(order)
-        session.commit()
+        session.flush()
         return order
-    finally:
-        session.close()
 
 def get_balance(user_id: int) -> float:
-    session = Session()
-    try:
-        wallet = session.query(Wallet).filter_by(user_id=user_id).first()
-        return wallet.balance if wallet else 0.0
-    finally:
-        session.close()
+    """Wallet balance from the ledger's in-process cache (DB only on first read)."""
+    from .ledger import ledger
+    return ledger.balance(user_id)
 
 def update_order_status(order_id: int, status: str):
-    session = Session()
-    try:
-        order = session.query(Order).filter_by(id=order_id).first()
-        if order:
-            order.status = status
-            session.commit()
-    finally:
-        session.close()
+    with session_scope() as session:
+        session.execute(update(Order).where(Order.id == order_id).values(status=status))
+
+def allocate_sequence(session, name: str, count: int = 1) -> range:
+    """Reserve ``count`` consecutive values of a named sequence inside ``session``'s transaction.
+
+    One upsert with RETURNING: no table scan, and two writers can never get
+    the same value (SQLite serializes the UPDATE).
+    """
+    stmt = (
+        sqlite_insert(Sequence).values(name=name, value=count)
+        .on_conflict_do_update(index_elements=[Sequence.name], set_={'value': Sequence.value + count})
+        .returning(Sequence.value)
+    )
+    last = session.execute(stmt).scalar_one()
+    return range(last - count + 1, last + 1)
+
+
+def advance_sequence(session, name: str, value: int):
+    """Make sure the named sequence never hands out ``value`` or anything below it again."""
+    stmt = (
+        sqlite_insert(Sequence).values(name=name, value=value)
+        .on_conflict_do_update(index_elements=[Sequence.name], set_={'value': func.max(Sequence.value, value)})
+    )
+    session.execute(stmt)
+
+
+def product_code(number: int) -> str:
+    return f"PK-{number:03d}"
+
+
+def product_code_number(code: str) -> int | None:
+    """``PK-012`` → 12; None for codes outside the generated series."""
+    prefix, _, digits = code.partition('-')
+    return int(digits) if prefix == 'PK' and digits.isdigit() else None
+
 
 def add_transaction(tx_data: dict):
-    session = Session()
-    try:
-        tx = Transaction(**tx_data)
-        session.add(tx)
-        session.commit()
-    finally:
-        session.close()
+    """Insert a bare transaction row; balance changes go through ``ledger.post`` instead."""
+    with session_scope() as session:
+        session.add(Transaction(**tx_data))
+
+def transactions_page_query(user_id: int, cursor: int = None, direction: str = 'n', per_page: int = 5):
+    """SELECT for one keyset page of a user's transactions (``per_page + 1`` rows).
+
+    Rows come back newest first for direction ``'n'`` and oldest first for
+    ``'p'``; ``cursor`` is the id of the edge row of the page being left.
+    """
+    query = select(Transaction).where(Transaction.user_id == user_id)
+    backwards = cursor is not None and direction == 'p'
+    if cursor is not None:
+        anchor = select(Transaction.created_at).where(Transaction.id == cursor).scalar_subquery()
+        if backwards:
+            query = query.where(or_(
+                Transaction.created_at > anchor,
+                and_(Transaction.created_at == anchor, Transaction.id > cursor)
+            ))
+        else:
+            query = query.where(or_(
+                Transaction.created_at < anchor,
+                and_(Transaction.created_at == anchor, Transaction.id < cursor)
+            ))
+    if backwards:
+        query = query.order_by(Transaction.created_at.asc(), Transaction.id.asc())
+    else:
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    return query.limit(per_page + 1)
+
+
+def get_transactions_page(user_id: int, cursor: int = None, direction: str = 'n', per_page: int = 5):
+    """Keyset page of a user's transactions, newest first.
+
+    Only ``per_page + 1`` rows are fetched; the extra row tells whether there
+    is another page in that direction. Returns ``(transactions, has_more)``.
+    """
+    with session_scope() as session:
+        rows = session.scalars(transactions_page_query(user_id, cursor, direction, per_page)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if cursor is not None and direction == 'p':
+        rows.reverse()
+    return rows, has_more
+
+ORDER_STATUSES = ('pending', 'accepted', 'rejected')
+
+
+def orders_page_query(status: str = 'pending', since=None, cursor: int = None, direction: str = 'n',
+                      per_page: int = 10):
+    """SELECT for one keyset page of the admin order inbox (``per_page + 1`` rows).
+
+    Filtered by status and optionally ``created_at >= since``; served by
+    ix_orders_status_created. Same cursor convention as transactions_page_query.
+    """
+    query = select(Order).where(Order.status == status)
+    if since is not None:
+        query = query.where(Order.created_at >= since)
+    backwards = cursor is not None and direction == 'p'
+    if cursor is not None:
+        anchor = select(Order.created_at).where(Order.id == cursor).scalar_subquery()
+        if backwards:
+            query = query.where(or_(
+                Order.created_at > anchor,
+                and_(Order.created_at == anchor, Order.id > cursor)
+            ))
+        else:
+            query = query.where(or_(
+                Order.created_at < anchor,
+                and_(Order.created_at == anchor, Order.id < cursor)
+            ))
+    if backwards:
+        query = query.order_by(Order.created_at.asc(), Order.id.asc())
+    else:
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    return query.limit(per_page + 1)
+
+
+def get_orders_page(status: str = 'pending', since=None, cursor: int = None, direction: str = 'n',
+                    per_page: int = 10):
+    """Keyset page of orders, newest first. Returns ``(orders, has_more)``."""
+    with session_scope() as session:
+        rows = session.scalars(orders_page_query(status, since, cursor, direction, per_page)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if cursor is not None and direction == 'p':
+        rows.reverse()
+    return rows, has_more
+
+
+def set_orders_status(order_ids, status: str, from_status: str = 'pending') -> list:
+    """Move orders still in ``from_status`` to ``status`` with one UPDATE ... RETURNING.
+
+    Orders already handled (e.g. by another admin tap) are left untouched and
+    are simply missing from the result. Returns ``[(id, user_id, product_name), ...]``.
+    """
+    if not order_ids:
+        return []
+    with session_scope() as session:
+        rows = session.execute(
+            update(Order)
+            .where(Order.id.in_(list(order_ids)), Order.status == from_status)
+            .values(status=status)
+            .returning(Order.id, Order.user_id, Order.product_name)
+        ).all()
+    return [tuple(row) for row in rows]
 
 # Add more CRUD as needed...
\ No newline at end of file
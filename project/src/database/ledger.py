@@ -0,0 +1,214 @@
+# src/database/ledger.py
+import threading
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from .db_manager import Session
+from .models import Wallet, Transaction, TransactionType, TransactionStatus
+
+
+class LedgerError(Exception):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+class LedgerEntry:
+    """Outcome of one posted ledger row: its id and the wallet balance right after it."""
+
+    __slots__ = ('transaction_id', 'user_id', 'amount', 'balance', 'replayed')
+
+    def __init__(self, transaction_id: int, user_id: int, amount: float, balance: float, replayed: bool = False):
+        self.transaction_id = transaction_id
+        self.user_id = user_id
+        self.amount = amount
+        self.balance = balance
+        self.replayed = replayed
+
+
+class BalanceCache:
+    """user_id -> (balance, version); version is the id of the last ledger row applied.
+
+    Writers publish the balance returned by their own UPDATE after commit; a
+    lower version never overwrites a higher one, so out-of-order publishes
+    from concurrent commits cannot leave a stale value behind. Misses fill the
+    cache only when no writer has published in the meantime.
+
+    With ``epochs`` set (multi-process mode) versions are not comparable with
+    other processes' writes, so a writer bumps the user's shared bucket and
+    drops its own entry instead of publishing; every process then refills
+    from the DB, tagging the entry with the epoch read before the SELECT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._balances = {}
+        self.hits = 0
+        self.misses = 0
+        self.epochs = None  # EpochRegion مشترک بین پروسه‌ها، یا None
+
+    def epoch(self, user_id: int) -> int:
+        return self.epochs.read(user_id) if self.epochs is not None else 0
+
+    def get(self, user_id: int):
+        entry = self._balances.get(user_id)
+        if entry is None or (self.epochs is not None and entry[2] != self.epochs.read(user_id)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def fill(self, user_id: int, balance: float, epoch: int = 0) -> float:
+        with self._lock:
+            current = self._balances.get(user_id)
+            if current is None or current[2] != epoch:
+                current = self._balances[user_id] = (balance, -1, epoch)
+            return current[0]
+
+    def publish(self, user_id: int, balance: float, version: int):
+        if self.epochs is not None:
+            self.epochs.bump(user_id)
+            with self._lock:
+                self._balances.pop(user_id, None)
+            return
+        with self._lock:
+            current = self._balances.get(user_id)
+            if current is None or current[1] < version:
+                self._balances[user_id] = (balance, version, 0)
+
+    def invalidate(self, user_id: int = None):
+        with self._lock:
+            if user_id is None:
+                self._balances.clear()
+            else:
+                self._balances.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._balances)
+
+
+class Ledger:
+    """Append-only wallet ledger.
+
+    Every balance change is a ``transactions`` row plus an in-SQL delta on
+    ``wallet.balance``, committed together. Debits are guarded in the UPDATE
+    itself (``balance >= amount``), so concurrent spends cannot overdraw and
+    no read-modify-write happens in Python. Passing an ``idempotency_key``
+    makes a repeated request (double tap, retry) return the original result
+    instead of posting twice.
+    """
+
+    def __init__(self, session_factory=Session):
+        self.Session = session_factory
+        self.cache = BalanceCache()
+        # SQLite فقط یک نویسنده دارد؛ صف‌شدن روی این قفل از خواب‌های busy_timeout بسیار ارزان‌تر است
+        self._write_lock = threading.Lock()
+
+    # ── خواندن ──
+    def balance(self, user_id: int) -> float:
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached
+        epoch = self.cache.epoch(user_id)
+        session = self.Session()
+        try:
+            balance = session.scalar(select(Wallet.balance).where(Wallet.user_id == user_id))
+        finally:
+            session.close()
+        return self.cache.fill(user_id, balance or 0.0, epoch)
+
+    # ── نوشتن ──
+    def post(self, user_id: int, amount: float, type: TransactionType, description: str,
+             idempotency_key: str = None, tx_hash: str = None) -> LedgerEntry:
+        """Credit (``amount > 0``) or debit (``amount < 0``) one wallet."""
+        return self._commit([(user_id, amount, type, description, tx_hash)], idempotency_key)[0]
+
+    def transfer(self, from_user_id: int, to_user_id: int, amount: float, description: str = None,
+                 idempotency_key: str = None):
+        """Move ``amount`` between wallets atomically; returns ``(debit_entry, credit_entry)``."""
+        if amount <= 0:
+            raise LedgerError("Transfer amount must be positive")
+        if from_user_id == to_user_id:
+            raise LedgerError("Cannot transfer to the same wallet")
+        description = description or f"Transfer {from_user_id} -> {to_user_id}"
+        debit, credit = self._commit([
+            (from_user_id, -amount, TransactionType.transfer, description, None),
+            (to_user_id, amount, TransactionType.transfer, description, None),
+        ], idempotency_key)
+        return debit, credit
+
+    @staticmethod
+    def _apply_delta(session, user_id: int, amount: float) -> float:
+        if amount >= 0:
+            stmt = (
+                insert(Wallet).values(user_id=user_id, balance=amount)
+                .on_conflict_do_update(index_elements=[Wallet.user_id], set_={'balance': Wallet.balance + amount})
+                .returning(Wallet.balance)
+            )
+        else:
+            stmt = (
+                update(Wallet)
+                .where(Wallet.user_id == user_id, Wallet.balance >= -amount)
+                .values(balance=Wallet.balance + amount)
+                .returning(Wallet.balance)
+            )
+        balance = session.execute(stmt).scalar()
+        if balance is None:
+            raise InsufficientFunds(f"Insufficient balance for user {user_id}")
+        return balance
+
+    @staticmethod
+    def _leg_key(idempotency_key: str, index: int):
+        if idempotency_key is None:
+            return None
+        return idempotency_key if index == 0 else f"{idempotency_key}:{index}"
+
+    def _commit(self, legs, idempotency_key: str = None):
+        with self._write_lock:
+            entries = self._write(legs, idempotency_key)
+        for entry in entries:
+            if not entry.replayed:
+                self.cache.publish(entry.user_id, entry.balance, entry.transaction_id)
+        return entries
+
+    def _write(self, legs, idempotency_key: str = None):
+        entries = []
+        session = self.Session()
+        try:
+            for index, (user_id, amount, type, description, tx_hash) in enumerate(legs):
+                # ردیف دفتر اول نوشته می‌شود تا قفل نوشتن SQLite از همان ابتدا گرفته شود
+                row = Transaction(user_id=user_id, type=type, amount=amount, description=description,
+                                  tx_hash=tx_hash, status=TransactionStatus.confirmed,
+                                  idempotency_key=self._leg_key(idempotency_key, index))
+                session.add(row)
+                try:
+                    session.flush()
+                except IntegrityError:
+                    session.rollback()
+                    if idempotency_key is None:
+                        raise
+                    return self._replay(session, idempotency_key, len(legs))
+                balance = self._apply_delta(session, user_id, amount)
+                entries.append(LedgerEntry(row.id, user_id, amount, balance))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return entries
+
+    def _replay(self, session, idempotency_key: str, count: int):
+        keys = [self._leg_key(idempotency_key, i) for i in range(count)]
+        rows = {row.idempotency_key: row for row in
+                session.scalars(select(Transaction).where(Transaction.idempotency_key.in_(keys)))}
+        if len(rows) != count:
+            raise LedgerError(f"Idempotency key {idempotency_key!r} belongs to a different operation")
+        entries = [rows[key] for key in keys]
+        return [LedgerEntry(row.id, row.user_id, row.amount, self.balance(row.user_id), replayed=True)
+                for row in entries]
+
+
+ledger = Ledger()
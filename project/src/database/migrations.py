@@ -0,0 +1,95 @@
+# src/database/migrations.py
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from .models import Base, Order, Transaction, Sequence, Broadcast, BroadcastFailure
+
+# نسخه‌ی schema در PRAGMA user_version ذخیره می‌شود.
+# نسخه 1 = schema اولیه (همان چیزی که create_all قبلاً می‌ساخت).
+SCHEMA_VERSION = 5
+
+# {نسخه: تابعی که connection را گرفته و دیتابیس را از نسخه‌ی قبل به این نسخه می‌برد}
+MIGRATIONS = {}
+
+
+def migration(version: int):
+    def decorator(fn):
+        MIGRATIONS[version] = fn
+        return fn
+    return decorator
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def _set_schema_version(conn, version: int):
+    conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def migrate(engine: Engine) -> int:
+    """Bring the database to SCHEMA_VERSION; a no-op (one PRAGMA read) when current.
+
+    A fresh file is created straight at the latest schema. A legacy file with
+    tables but no version is treated as version 1 and migrated forward.
+    """
+    with engine.connect() as conn:
+        version = get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return version
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema v{version} is newer than this code (v{SCHEMA_VERSION})")
+
+    with engine.begin() as conn:
+        has_tables = bool(conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+        )).first())
+        # جدول‌های جدید/ناموجود ساخته می‌شوند؛ جدول‌های موجود دست نمی‌خورند
+        Base.metadata.create_all(conn)
+        if not has_tables:
+            _set_schema_version(conn, SCHEMA_VERSION)
+            return SCHEMA_VERSION
+
+        version = max(version, 1)
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[target](conn)
+        _set_schema_version(conn, SCHEMA_VERSION)
+    return SCHEMA_VERSION
+
+
+@migration(2)
+def _add_hot_path_indexes(conn):
+    """Secondary indexes for balance, history and order pipeline lookups."""
+    for table in (Order.__table__, Transaction.__table__):
+        for index in table.indexes:
+            if index.name.startswith('ix_'):
+                index.create(conn, checkfirst=True)
+
+
+@migration(3)
+def _add_ledger_idempotency_key(conn):
+    """Idempotency keys for wallet ledger rows (unique; NULL for legacy rows)."""
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(transactions)"))}
+    if 'idempotency_key' not in columns:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN idempotency_key VARCHAR"))
+    for index in Transaction.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+@migration(4)
+def _add_sequences(conn):
+    """Sequence table; the product code counter starts after the highest existing PK-### code."""
+    Sequence.__table__.create(conn, checkfirst=True)
+    highest = conn.execute(text(
+        "SELECT MAX(CAST(SUBSTR(code, 4) AS INTEGER)) FROM products WHERE code LIKE 'PK-%'"
+    )).scalar() or 0
+    conn.execute(text(
+        "INSERT INTO sequences (name, value) VALUES ('product_code', :value) "
+        "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)"
+    ), {'value': highest})
+
+
+@migration(5)
+def _add_broadcasts(conn):
+    """Broadcast jobs with their resume checkpoint, and per-recipient failures."""
+    Broadcast.__table__.create(conn, checkfirst=True)
+    BroadcastFailure.__table__.create(conn, checkfirst=True)
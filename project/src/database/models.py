@@ -1,12 +1,10 @@
 # src/database/models.py
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Enum, JSON, func, Text
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Enum, JSON, func, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from config.settings import DB_PATH
 import enum
 
 Base = declarative_base()
-engine = create_engine(DB_PATH)
 
 # ──────────────────────────────────────────────────────────────
 # مدل‌های جدید (Product, ProductContent, ProductGuide)
@@ -129,15 +127,22 @@ class Order(Base):
     passport_file_id = Column(String)
     verification_video_id = Column(String)
     tx_hash = Column(String)
-    status = Column(String, default='pending')  # pending, suspended, done
+    status = Column(String, default='pending')  # pending, accepted, rejected
     description = Column(Text)  # for notes
     created_at = Column(DateTime, default=func.now())
 
     user = relationship('User', backref='orders')
     product = relationship('Product', backref='orders')
 
+    __table_args__ = (
+        Index('ix_orders_user_status', 'user_id', 'status'),
+        Index('ix_orders_status_created', 'status', 'created_at', 'id'),  # صف بررسی ادمین
+        Index('ix_orders_tx_hash', 'tx_hash'),
+    )
+
 class Wallet(Base):
     __tablename__ = 'wallet'
+    # user_id کلید اصلی است؛ جست‌وجوی get_balance ایندکس جداگانه لازم ندارد
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     balance = Column(Float, default=0.0)
 
@@ -152,10 +157,16 @@ class Transaction(Base):
     description = Column(String)
     tx_hash = Column(String)
     status = Column(Enum(TransactionStatus), default=TransactionStatus.pending)
+    idempotency_key = Column(String)  # تکرار یک عملیات (مثلاً دوبار زدن دکمه) ردیف دوم نمی‌سازد
     created_at = Column(DateTime, default=func.now())
 
     user = relationship('User', backref='transactions')
 
+    __table_args__ = (
+        Index('ix_transactions_user_created', 'user_id', 'created_at', 'id'),  # تاریخچه با keyset
+        Index('ux_transactions_idempotency', 'idempotency_key', unique=True),
+    )
+
 class SupportTicket(Base):
     __tablename__ = 'support_tickets'
     id = Column(Integer, primary_key=True)
@@ -167,9 +178,42 @@ class SupportTicket(Base):
 
     user = relationship('User', backref='tickets')
 
+class Sequence(Base):
+    """Named counters (e.g. product codes); advanced atomically with UPDATE ... RETURNING."""
+    __tablename__ = 'sequences'
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class Broadcast(Base):
+    """An announcement to every user; ``last_user_id`` (users.id) is the resume checkpoint."""
+    __tablename__ = 'broadcasts'
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(String(20), default='running')  # running, paused, cancelled, done
+    total = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    last_user_id = Column(Integer, default=0)
+    progress_chat_id = Column(Integer)     # پیام پیشرفت ادمین که مدام ویرایش می‌شود
+    progress_message_id = Column(Integer)
+    created_at = Column(DateTime, default=func.now())
+    finished_at = Column(DateTime)
+
+class BroadcastFailure(Base):
+    __tablename__ = 'broadcast_failures'
+    id = Column(Integer, primary_key=True)
+    broadcast_id = Column(Integer, ForeignKey('broadcasts.id'), nullable=False)
+    user_id = Column(Integer, nullable=False)  # Telegram user_id
+    reason = Column(String(20))                # blocked, not_found, error
+    error = Column(String)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('ux_broadcast_failures_user', 'broadcast_id', 'user_id', unique=True),
+    )
+
 
 # Force configure mappers (اختیاری اما توصیه می‌شود در SQLAlchemy 2.0+)
 Base.registry.configure()
-
-# Create tables if not exist
-Base.metadata.create_all(engine)
\ No newline at end of file
@@ -0,0 +1,243 @@
+# src/database/product_io.py
+import codecs
+import csv
+import io
+import json
+import tempfile
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from .db_manager import Session, allocate_sequence, advance_sequence, product_code, product_code_number
+from .models import Product
+from .catalog import catalog
+
+FORMATS = ('csv', 'json', 'jsonl')
+EXPORT_FIELDS = ('code', 'name', 'price', 'description', 'photo_file_id')
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportReport:
+    __slots__ = ('inserted', 'rows', 'errors', 'codes')
+
+    def __init__(self):
+        self.inserted = 0
+        self.rows = 0
+        self.errors = []   # (شماره ردیف, پیام)
+        self.codes = []    # اولین و آخرین کد ساخته‌شده
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def detect_format(file_name: str = '', mime_type: str = '') -> str | None:
+    name = (file_name or '').lower()
+    for ext, fmt in (('.csv', 'csv'), ('.jsonl', 'jsonl'), ('.ndjson', 'jsonl'), ('.json', 'json')):
+        if name.endswith(ext):
+            return fmt
+    if mime_type in ('text/csv', 'text/comma-separated-values'):
+        return 'csv'
+    if mime_type == 'application/json':
+        return 'json'
+    return None
+
+
+# ── خواندن جریانی ──
+def _iter_json_array(text_stream, chunk_size: int = 64 * 1024):
+    """Yield the objects of a top-level JSON array without loading the whole document."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started, eof = '', 0, False, False
+    while True:
+        # فاصله‌ها، '[' ابتدایی و ',' بین اعضا رد می‌شوند
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ',' or (buffer[pos] == '[' and not started)):
+            started = started or buffer[pos] == '['
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                raise ValueError("JSON document must be an array of products")
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                pos = end
+                continue
+        if eof:
+            raise ValueError("Unexpected end of JSON document")
+        chunk = text_stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_records(stream, fmt: str):
+    """Yield ``(row_number, dict)`` from a binary stream, one record at a time."""
+    text_stream = codecs.getreader('utf-8-sig')(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for number, row in enumerate(reader, start=2):  # ردیف ۱ عنوان ستون‌هاست
+            yield number, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(text_stream, start=1):
+            if line.strip():
+                yield number, json.loads(line)
+    elif fmt == 'json':
+        for number, item in enumerate(_iter_json_array(text_stream), start=1):
+            yield number, item
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def validate_record(record) -> dict:
+    """Normalize one input record to Product column values; raises ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError("record must be an object")
+    name = str(record.get('name') or '').strip()
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > 100:
+        raise ValueError("name is longer than 100 characters")
+    raw_price = str(record.get('price') if record.get('price') is not None else '').replace(',', '').strip()
+    try:
+        price = float(raw_price)
+    except ValueError:
+        raise ValueError(f"invalid price {raw_price!r}") from None
+    if price <= 0:
+        raise ValueError("price must be positive")
+    code = str(record.get('code') or '').strip() or None
+    if code and len(code) > 20:
+        raise ValueError("code is longer than 20 characters")
+    description = record.get('description', record.get('description_text'))
+    description = str(description).strip() if description is not None else ''
+    return {
+        'code': code,
+        'name': name,
+        'price': int(price) if price.is_integer() else price,
+        'description_text': description or None,
+        'photo_file_id': str(record.get('photo_file_id') or '').strip() or None,
+    }
+
+
+def _flush_batch(session, batch, report):
+    # کدهای صریح PK-### سری را جلو می‌برند تا کد خودکار بعدی (همین‌جا یا در افزودن ادمین) تکراری نشود
+    explicit = [n for n in (product_code_number(row['code']) for row in batch if row['code']) if n is not None]
+    if explicit:
+        advance_sequence(session, 'product_code', max(explicit))
+    missing = [row for row in batch if row['code'] is None]
+    if missing:
+        for row, number in zip(missing, allocate_sequence(session, 'product_code', len(missing))):
+            row['code'] = product_code(number)
+    session.execute(insert(Product), batch)  # executemany در یک درخواست
+    report.inserted += len(batch)
+    if not report.codes:
+        report.codes.append(batch[0]['code'])
+    report.codes[1:] = [batch[-1]['code']]
+
+
+def import_products(stream, fmt: str, batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """Validate and insert every product in ``stream`` in one transaction.
+
+    Records are parsed and inserted in batches so memory stays flat; any
+    invalid row (or a duplicate code) rolls the whole import back and is
+    reported with its row number.
+    """
+    report = ImportReport()
+    session = Session()
+    try:
+        batch = []
+        try:
+            for number, record in iter_records(stream, fmt):
+                report.rows += 1
+                try:
+                    row = validate_record(record)
+                except ValueError as e:
+                    report.errors.append((number, str(e)))
+                    batch = []  # فایل رد می‌شود؛ فقط برای گزارش خطاها ادامه می‌دهیم
+                    if len(report.errors) >= MAX_REPORTED_ERRORS:
+                        break
+                    continue
+                if report.errors:
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    _flush_batch(session, batch, report)
+                    batch = []
+        except (ValueError, csv.Error, UnicodeDecodeError) as e:
+            report.errors.append((report.rows + 1, f"unreadable document: {e}"))
+
+        if not report.errors and batch:
+            _flush_batch(session, batch, report)
+        if report.errors:
+            session.rollback()
+            report.inserted = 0
+            report.codes = []
+            return report
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        report.inserted = 0
+        report.codes = []
+        report.errors.append((0, f"duplicate product code ({e.orig})"))
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    if report.inserted:
+        catalog.invalidate()
+    return report
+
+
+# ── خروجی جریانی ──
+def _export_row(row):
+    code, name, price, description, photo_file_id = row
+    if price is not None and float(price).is_integer():
+        price = int(price)
+    return code, name, price, description, photo_file_id
+
+
+def export_products(fmt: str = 'csv', batch_size: int = IMPORT_BATCH_SIZE):
+    """Write the catalog to a spooled temp file (in memory until 1 MB) and return it rewound.
+
+    Rows are streamed from the DB ``batch_size`` at a time; the file can be
+    read back by ``import_products``.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    out = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+b')
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    stmt = select(Product.code, Product.name, Product.price, Product.description_text, Product.photo_file_id) \
+        .order_by(Product.id).execution_options(yield_per=batch_size)
+
+    session = Session()
+    try:
+        rows = session.execute(stmt)
+        if fmt == 'csv':
+            writer = csv.writer(text)
+            writer.writerow(EXPORT_FIELDS)
+            for row in rows:
+                writer.writerow(_export_row(row))
+        else:
+            first = True
+            if fmt == 'json':
+                text.write('[')
+            for row in rows:
+                item = json.dumps(dict(zip(EXPORT_FIELDS, _export_row(row))), ensure_ascii=False)
+                if fmt == 'json':
+                    text.write(item if first else ',\n' + item)
+                else:
+                    text.write(item + '\n')
+                first = False
+            if fmt == 'json':
+                text.write(']\n')
+    finally:
+        session.close()
+    text.flush()
+    text.detach()
+    out.seek(0)
+    return out
@@ -0,0 +1,72 @@
+# src/database/state_backend.py
+import json
+import time
+from sqlalchemy import MetaData, Table, Column, Integer, String, Text, Float, select, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.schema import CreateTable
+from config.settings import STATE_DB_PATH
+from .db_manager import create_db_engine
+
+# فایل جدا از bot.db: نوشتن state هیچ‌وقت پشت قفل نوشتن تراکنش‌های هندلر نمی‌ماند
+metadata = MetaData()
+conversation_states = Table(
+    'conversation_states', metadata,
+    Column('user_id', Integer, primary_key=True),  # Telegram user_id
+    Column('state', String(100)),
+    Column('data', Text),      # JSON
+    Column('history', Text),   # JSON، پشته‌ی برگشت
+    Column('touched', Float, nullable=False),  # زمان آخرین نوشتن (wall clock)
+)
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class SQLiteStateBackend:
+    """Conversation state shared by worker processes, in its own SQLite file.
+
+    Each worker keeps its users' records in its in-memory StateStore (reads
+    never touch this table) and writes every mutated record through. Updates
+    are sharded by user, so a record has one writer; the table lets a
+    restarted worker, or a new shard layout, pick the records back up.
+    """
+
+    def __init__(self, url: str = STATE_DB_PATH, engine=None):
+        self.engine = engine or create_db_engine(url)
+        with self.engine.begin() as conn:
+            # IF NOT EXISTS: چند worker هم‌زمان بالا می‌آیند
+            conn.execute(CreateTable(conversation_states, if_not_exists=True))
+
+    def load(self, ttl: float, shard: int = 0, shards: int = 1) -> list:
+        """``(user_id, state, data, history, touched)`` rows of one shard; expired rows are deleted."""
+        table = conversation_states
+        in_shard = (table.c.user_id % shards) == shard
+        with self.engine.begin() as conn:
+            conn.execute(delete(table).where(in_shard, table.c.touched < time.time() - ttl))
+            rows = conn.execute(
+                select(table.c.user_id, table.c.state, table.c.data, table.c.history, table.c.touched)
+                .where(in_shard).order_by(table.c.touched)
+            ).all()
+        return [(user_id, state, json.loads(data) if data else {}, json.loads(history) if history else None, touched)
+                for user_id, state, data, history, touched in rows]
+
+    def active(self, user_id: int, ttl: float) -> bool:
+        """True if ``user_id`` has an unexpired conversation state written by any worker."""
+        table = conversation_states
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(table.c.user_id).where(table.c.user_id == user_id, table.c.state.is_not(None),
+                                              table.c.touched >= time.time() - ttl)
+            ).first() is not None
+
+    def save(self, user_id: int, state: str, data: dict, history, touched: float):
+        values = {'state': state, 'data': _dumps(data), 'history': _dumps(history) if history else None,
+                  'touched': touched}
+        stmt = insert(conversation_states).values(user_id=user_id, **values)
+        with self.engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_update(index_elements=['user_id'], set_=values))
+
+    def delete(self, *user_ids: int):
+        with self.engine.begin() as conn:
+            conn.execute(delete(conversation_states).where(conversation_states.c.user_id.in_(user_ids)))
@@ -0,0 +1,159 @@
+# src/database/uow.py
+import threading
+from contextlib import contextmanager
+from config.settings import UOW_QUERY_WARN
+from src.utils.log import get_logger
+from src.utils import metrics
+
+log = get_logger('db')
+UPDATE_QUERIES = metrics.histogram('visabot_update_db_queries', 'SQL statements executed per update', ['kind'],
+                                   buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55))
+UPDATE_DB_SECONDS = metrics.histogram('visabot_update_db_seconds', 'DB time spent per update', ['kind'])
+
+_local = threading.local()
+
+
+def _default_factory():
+    from .db_manager import Session
+    return Session.session_factory
+
+
+class UnitOfWork:
+    """Database context of one update: a lazily opened session shared by every helper.
+
+    The session is only opened on first use, so updates that never touch the
+    DB cost nothing. ``unit_of_work`` commits it once when the update is done
+    (or rolls it back if the handler raised) and then runs the ``on_commit``
+    hooks. Every SQL statement executed on this thread in the meantime is
+    counted in ``queries``/``db_time``: the count comes from the engine, so it
+    includes the sessions of the modules below.
+
+    Deliberately outside the unit (own session, own commit):
+
+    - ``ledger``: a money write commits before the handler replies and
+      releases SQLite's write lock at once. An idempotency conflict rolls
+      back only that write.
+    - ``catalog`` and ``users``: cache fills are reads that any update may
+      share, independent of the update's outcome.
+    - ``product_io``: an import is one large transaction of its own.
+    - ``broadcasts``: runs on its own thread, with a commit per chunk
+      checkpoint.
+    """
+
+    def __init__(self, kind: str = 'update', session_factory=None):
+        self.kind = kind
+        self.session_factory = session_factory
+        self._session = None
+        self._hooks = []
+        self.queries = 0
+        self.db_time = 0.0
+
+    @property
+    def session(self):
+        if self._session is None:
+            factory = self.session_factory or _default_factory()
+            # اشیاء بعد از commit هم خواندنی می‌مانند (برای hookها و پاسخ هندلر)
+            self._session = factory(expire_on_commit=False)
+        return self._session
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def on_commit(self, hook):
+        """Run ``hook()`` after the unit commits; dropped if it rolls back."""
+        self._hooks.append(hook)
+
+    def commit(self):
+        if self._session is not None:
+            self._session.commit()
+        hooks, self._hooks = self._hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                log.exception('on_commit_hook_failed', kind=self.kind)
+
+    def rollback(self):
+        self._hooks = []
+        if self._session is not None:
+            self._session.rollback()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def current_unit():
+    return getattr(_local, 'unit', None)
+
+
+def after_commit(hook):
+    """Run ``hook()`` once the current unit has committed, or right away outside a unit."""
+    unit = current_unit()
+    if unit is None:
+        hook()
+    else:
+        unit.on_commit(hook)
+
+
+def record_query(elapsed: float):
+    """Called by the engine instrumentation after every statement."""
+    unit = getattr(_local, 'unit', None)
+    if unit is not None:
+        unit.queries += 1
+        unit.db_time += elapsed
+
+
+@contextmanager
+def unit_of_work(kind: str = 'update', session_factory=None):
+    """Open the unit of work for one update; a nested call joins the outer unit."""
+    outer = current_unit()
+    if outer is not None:
+        yield outer
+        return
+    unit = UnitOfWork(kind, session_factory)
+    _local.unit = unit
+    try:
+        yield unit
+        unit.commit()
+    except Exception:
+        unit.rollback()
+        raise
+    finally:
+        unit.close()
+        _local.unit = None
+        UPDATE_QUERIES.labels(kind).observe(unit.queries)
+        UPDATE_DB_SECONDS.labels(kind).observe(unit.db_time)
+        if unit.queries >= UOW_QUERY_WARN:
+            log.warning('update_query_heavy', kind=kind, queries=unit.queries, db_ms=round(unit.db_time * 1000, 1))
+
+
+@contextmanager
+def session_scope(session_factory=None):
+    """Session for one helper call.
+
+    Inside a unit of work this is the unit's shared session, left open and
+    uncommitted; an exception rolls the whole unit back. Outside one (workers,
+    scripts, tests) it is a private session committed on success and closed.
+    Code that must not tell the user anything before the data is durable can
+    still call ``session.commit()`` itself.
+    """
+    unit = current_unit()
+    if unit is not None and session_factory is None:
+        try:
+            yield unit.session
+        except Exception:
+            unit.rollback()
+            raise
+        return
+    session = (session_factory or _default_factory())(expire_on_commit=False)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
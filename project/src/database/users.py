@@ -0,0 +1,156 @@
+# src/database/users.py
+import random
+import string
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from config.settings import USER_CACHE_SIZE
+from .db_manager import Session
+from .models import User
+
+REFERRAL_ALPHABET = string.ascii_uppercase + string.digits
+
+
+def new_referral_code() -> str:
+    return ''.join(random.choices(REFERRAL_ALPHABET, k=8))
+
+
+class CachedUser:
+    """The few users-table fields the hot path needs, detached from any session."""
+
+    __slots__ = ('id', 'user_id', 'is_vip', 'referral_code', 'epoch')
+
+    def __init__(self, id: int, user_id: int, is_vip: bool, referral_code: str, epoch: int = 0):
+        self.id = id
+        self.user_id = user_id
+        self.is_vip = bool(is_vip)
+        self.referral_code = referral_code
+        self.epoch = epoch
+
+
+class UserRegistry:
+    """LRU cache of registered users keyed by Telegram user id.
+
+    ``register`` is an idempotent upsert (one INSERT ... ON CONFLICT ...
+    RETURNING, with the referrer resolved by a subquery), so a repeated
+    /start costs no DB round trip once the user is cached. Write paths that
+    change a user's row call ``invalidate`` after their commit; with
+    ``epochs`` set (multi-process mode) that also bumps the user's shared
+    bucket, so other processes drop their copy on its next lookup.
+    """
+
+    def __init__(self, max_entries: int = USER_CACHE_SIZE, session_factory=Session):
+        self.max_entries = max_entries
+        self.Session = session_factory
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.epochs = None  # EpochRegion مشترک بین پروسه‌ها، یا None
+
+    def _epoch(self, user_id: int) -> int:
+        return self.epochs.read(user_id) if self.epochs is not None else 0
+
+    def _cached(self, user_id: int):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None and user.epoch != self._epoch(user_id):
+                del self._users[user_id]
+                user = None
+            if user is None:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def _remember(self, row, epoch: int) -> CachedUser:
+        user = CachedUser(*row, epoch=epoch)
+        with self._lock:
+            self._users[user.user_id] = user
+            self._users.move_to_end(user.user_id)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+        return user
+
+    # ── API ──
+    def get(self, user_id: int):
+        """CachedUser for a Telegram id, or None if the user never registered."""
+        user = self._cached(user_id)
+        if user is not None:
+            return user
+        epoch = self._epoch(user_id)
+        session = self.Session()
+        try:
+            row = session.execute(
+                select(User.id, User.user_id, User.is_vip, User.referral_code).where(User.user_id == user_id)
+            ).first()
+        finally:
+            session.close()
+        # کاربر ناشناس cache نمی‌شود تا ثبت‌نامش بلافاصله دیده شود
+        return self._remember(row, epoch) if row is not None else None
+
+    def known(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+    def register(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None,
+                 referrer_code: str = None):
+        """Create the user or refresh their names; returns ``(CachedUser, created)``."""
+        user = self._cached(user_id)
+        if user is not None:
+            return user, False
+
+        referrer = None
+        if referrer_code:
+            referrer = select(User.id).where(User.referral_code == referrer_code).scalar_subquery()
+        epoch = self._epoch(user_id)
+        session = self.Session()
+        try:
+            for _ in range(3):
+                code = new_referral_code()
+                # DO NOTHING فقط در صورت درج واقعی سطر برمی‌گرداند؛ همین «created» است
+                inserted = insert(User).values(
+                    user_id=user_id, username=username, first_name=first_name, last_name=last_name,
+                    referral_code=code, referred_by=referrer,
+                ).on_conflict_do_nothing(index_elements=[User.user_id])
+                inserted = inserted.returning(User.id, User.user_id, User.is_vip, User.referral_code)
+                refreshed = update(User).where(User.user_id == user_id).values(
+                    username=username, first_name=first_name, last_name=last_name,
+                    # کاربران قدیمی بدون کد معرف، یکی می‌گیرند
+                    referral_code=func.coalesce(User.referral_code, code),
+                ).returning(User.id, User.user_id, User.is_vip, User.referral_code)
+                try:
+                    row = session.execute(inserted).one_or_none()
+                    created = row is not None
+                    if not created:
+                        row = session.execute(refreshed).one()
+                    session.commit()
+                except IntegrityError:
+                    # کد معرف تصادفی تکراری بود؛ با کد دیگری تلاش می‌شود
+                    session.rollback()
+                    continue
+                return self._remember(row, epoch), created
+            raise RuntimeError(f"Could not allocate a referral code for user {user_id}")
+        finally:
+            session.close()
+
+    def invalidate(self, user_id: int = None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+        if self.epochs is not None:
+            if user_id is None:
+                for bucket in range(self.epochs.size):
+                    self.epochs.bump(bucket)
+            else:
+                self.epochs.bump(user_id)
+
+    def __len__(self):
+        return len(self._users)
+
+
+users = UserRegistry()
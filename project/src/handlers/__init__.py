@@ -1 +1,45 @@
-from . import onboarding, profile  # Add other handlers
+# src/handlers/__init__.py
+"""Handler modules are imported on first use, not when main.py starts.
+
+A module registers its callback routes on import; ``ROUTE_MODULES`` tells
+the router which module to import when callback data under a prefix has no
+route yet. Message-state handlers are reached through ``load(name)``.
+"""
+import importlib
+import sys
+import time
+from src.utils.startup import startup
+
+MODULES = ('onboarding', 'profile', 'wallet', 'orders', 'support', 'vip', 'admin', 'visa_card')
+
+# {پیشوند callback_data: ماژولی که مسیرهای آن پیشوند را ثبت می‌کند}
+ROUTE_MODULES = {
+    'admin': 'admin',
+    'wallet': 'wallet',
+    'menu:wallet': 'wallet',
+    'visa': 'visa_card',
+    'order': 'visa_card',
+    'menu:visa_card': 'visa_card',
+    'menu:profile': 'profile',
+}
+
+
+def load(name: str):
+    """Import ``src.handlers.<name>`` (registering its routes) and return it."""
+    module = sys.modules.get(f"{__name__}.{name}")
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(f"{__name__}.{name}")
+        startup.add('handlers', time.perf_counter() - started)
+    return module
+
+
+def load_all():
+    for name in MODULES:
+        load(name)
+
+
+def install(router):
+    """Let ``router`` import each module the first time one of its prefixes is hit."""
+    for prefix, name in ROUTE_MODULES.items():
+        router.add_loader(prefix, lambda name=name: load(name))
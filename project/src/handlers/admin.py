@@ -1,35 +1,49 @@
 # src/handlers/admin.py
+from datetime import datetime, timedelta
+import requests
 from telebot import TeleBot
 from telebot.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from src.utils.states import set_state, clear_state
-from src.database.db_manager import Session
-from src.database.models import Product, ProductContent
+from src.utils.states import set_state, get_state, get_state_data, update_state_data, clear_state
+from src.utils.router import router
+from src.utils.keyboards import admin_panel_keyboard, admin_products_keyboard
+from src.database.db_manager import ORDER_STATUSES, get_orders_page, set_orders_status
+from src.database.uow import session_scope, after_commit
+from src.database.models import Product, ProductContent, User
+from src.database.catalog import catalog
+from src.database.product_io import FORMATS, detect_format, import_products, export_products
+from src.utils.log import get_logger
+from src.utils.outbound import PRIORITY_BULK
+from src.utils.broadcast import broadcasts
+
+log = get_logger('admin')
+
+
+@router.route('admin', admin_only=True)
+@router.route('admin:main', admin_only=True)
+def admin_main_panel(bot: TeleBot, call: CallbackQuery):
+    bot.edit_message_text(
+        "Admin Panel",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=admin_panel_keyboard()
+    )
 
 
+@router.route('admin:products', admin_only=True)
 def admin_products_menu(bot: TeleBot, call: CallbackQuery):
-    markup = InlineKeyboardMarkup(row_width=2)
-    markup.add(
-        InlineKeyboardButton("Add Product", callback_data="admin:add_product"),
-        InlineKeyboardButton("Edit Product", callback_data="admin:edit_product"),
-        InlineKeyboardButton("List Products", callback_data="admin:list_products"),
-        InlineKeyboardButton("Delete Product", callback_data="admin:delete_product"),
-    )
-    markup.add(InlineKeyboardButton("Back to Admin Panel", callback_data="admin:main"))
-
     bot.edit_message_text(
         "Product Settings",
         call.message.chat.id,
         call.message.message_id,
-        reply_markup=markup
+        reply_markup=admin_products_keyboard()
     )
 
 
 # ── List Products ──
+@router.route('admin:list_products', admin_only=True)
 def admin_list_products(bot: TeleBot, call: CallbackQuery):
-    session = Session()
     try:
-        products = session.query(Product).order_by(Product.id.desc()).all()
-        print(f"[ADMIN LIST] Found {len(products)} products")
+        products = catalog.all()
 
         if not products:
             text = "No products found."
@@ -47,9 +61,8 @@ def admin_list_products(bot: TeleBot, call: CallbackQuery):
         # Delete the previous message (photo or text) to avoid edit error
         try:
             bot.delete_message(call.message.chat.id, call.message.message_id)
-            print("[ADMIN LIST] Deleted previous message")
         except Exception as del_e:
-            print(f"[ADMIN LIST DELETE ERROR] {str(del_e)}")  # Continue even if delete fails
+            log.debug('delete_message_failed', chat_id=call.message.chat.id, error=str(del_e))  # Continue even if delete fails
 
         # Send new text message
         bot.send_message(
@@ -57,9 +70,8 @@ def admin_list_products(bot: TeleBot, call: CallbackQuery):
             text,
             reply_markup=markup
         )
-        print("[ADMIN LIST] New message sent")
     except Exception as e:
-        print(f"[ADMIN LIST ERROR] {str(e)}")
+        log.exception('list_products_failed')
         bot.send_message(
             call.message.chat.id,
             "Error loading products. Please try again.",
@@ -67,116 +79,127 @@ def admin_list_products(bot: TeleBot, call: CallbackQuery):
                 InlineKeyboardButton("Back to Product Settings", callback_data="admin:products")
             )
         )
-    finally:
-        session.close()
 
 
 # ── View single product (for list & delete/edit selection) ──
+@router.route('admin:view_product:<int:product_id>', admin_only=True)
 def admin_view_product(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-            return
-
-        text = (
-            f"Product ID: {product.id}\n"
-            f"Code: {product.code}\n"
-            f"Name: {product.name}\n"
-            f"Price: {product.price:,} IRR\n"
-            f"Description:\n{product.description_text or 'None'}"
-        )
-
-        markup = InlineKeyboardMarkup().add(
-            InlineKeyboardButton("Back to List", callback_data="admin:list_products")
-        )
-
-        if product.photo_file_id:
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-            bot.send_photo(
-                call.message.chat.id,
-                product.photo_file_id,
-                caption=text,
-                reply_markup=markup
-            )
-        else:
-            bot.edit_message_text(
-                text,
-                call.message.chat.id,
-                call.message.message_id,
-                reply_markup=markup
-            )
-    finally:
-        session.close()
-
+    product = catalog.get(product_id)
+    if not product:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
+
+    text = (
+        f"Product ID: {product.id}\n"
+        f"Code: {product.code}\n"
+        f"Name: {product.name}\n"
+        f"Price: {product.price:,} IRR\n"
+        f"Description:\n{product.description_text or 'None'}"
+    )
 
-# ── Edit Product ──
-def admin_edit_product(bot: TeleBot, call: CallbackQuery):
-    session = Session()
-    try:
-        products = session.query(Product).all()
-        if not products:
-            text = "No products to edit."
-            markup = InlineKeyboardMarkup().add(
-                InlineKeyboardButton("Back", callback_data="admin:products")
-            )
-        else:
-            text = "Select a product to edit:"
-            markup = InlineKeyboardMarkup(row_width=1)
-            for p in products:
-                markup.add(InlineKeyboardButton(f"{p.code} - {p.name}", callback_data=f"admin:select_edit:{p.id}"))
-            markup.add(InlineKeyboardButton("Back", callback_data="admin:products"))
+    markup = InlineKeyboardMarkup().add(
+        InlineKeyboardButton("Back to List", callback_data="admin:list_products")
+    )
 
+    if product.photo_file_id:
+        bot.delete_message(call.message.chat.id, call.message.message_id)
+        bot.send_photo(
+            call.message.chat.id,
+            product.photo_file_id,
+            caption=text,
+            reply_markup=markup
+        )
+    else:
         bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             reply_markup=markup
         )
-    finally:
-        session.close()
 
 
+# ── Edit Product ──
+@router.route('admin:edit_product', admin_only=True)
+def admin_edit_product(bot: TeleBot, call: CallbackQuery):
+    products = catalog.all()
+    if not products:
+        text = "No products to edit."
+        markup = InlineKeyboardMarkup().add(
+            InlineKeyboardButton("Back", callback_data="admin:products")
+        )
+    else:
+        text = "Select a product to edit:"
+        markup = InlineKeyboardMarkup(row_width=1)
+        for p in products:
+            markup.add(InlineKeyboardButton(f"{p.code} - {p.name}", callback_data=f"admin:select_edit:{p.id}"))
+        markup.add(InlineKeyboardButton("Back", callback_data="admin:products"))
+
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
+
+
+@router.route('admin:select_edit:<int:product_id>', admin_only=True)
 def admin_select_edit(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-            return
+    product = catalog.get(product_id)
+    if not product:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
 
-        text = f"You selected product: {product.name}"
-        markup = InlineKeyboardMarkup(row_width=1)
-        markup.add(InlineKeyboardButton(f"Change Price (Current: {product.price:,} IRR)", callback_data=f"admin:edit_price:{product.id}"))
-        markup.add(InlineKeyboardButton("Edit Descriptions", callback_data=f"admin:edit_descriptions:{product.id}"))
-        markup.add(InlineKeyboardButton("Back", callback_data="admin:edit_product"))
+    text = f"You selected product: {product.name}"
+    markup = InlineKeyboardMarkup(row_width=1)
+    markup.add(InlineKeyboardButton(f"Change Price (Current: {product.price:,} IRR)", callback_data=f"admin:edit_price:{product.id}"))
+    markup.add(InlineKeyboardButton("Edit Descriptions", callback_data=f"admin:edit_descriptions:{product.id}"))
+    markup.add(InlineKeyboardButton("Back", callback_data="admin:edit_product"))
 
-        bot.edit_message_text(
-            text,
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=markup
-        )
-    finally:
-        session.close()
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
 
 
+@router.route('admin:edit_price:<int:product_id>', admin_only=True)
 def admin_edit_price(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-            return
-
-        text = (
-            f"Please send the new price (English numbers only)\n"
-            f"Current price: {product.price:,} IRR"
-        )
-        markup = InlineKeyboardMarkup().add(
-            InlineKeyboardButton("Back", callback_data=f"admin:select_edit:{product.id}")
-        )
+    product = catalog.get(product_id)
+    if not product:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
+
+    text = (
+        f"Please send the new price (English numbers only)\n"
+        f"Current price: {product.price:,} IRR"
+    )
+    markup = InlineKeyboardMarkup().add(
+        InlineKeyboardButton("Back", callback_data=f"admin:select_edit:{product.id}")
+    )
+
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
+    set_state(call.from_user.id, 'admin_edit_price', {'product_id': product_id})
+
+
+@router.route('admin:edit_descriptions:<int:product_id>', admin_only=True)
+def admin_edit_descriptions(bot: TeleBot, call: CallbackQuery, product_id: int):
+    product = catalog.get(product_id)
+    if not product or not product.description_text:
+        text = "No descriptions to edit."
+    else:
+        text = "Current descriptions:\nSelect one to edit:"
+        markup = InlineKeyboardMarkup(row_width=1)
+        descriptions = product.description_text.split('\n')
+        for i, desc in enumerate(descriptions, 1):
+            if desc.strip():
+                markup.add(InlineKeyboardButton(f"Description {i}: {desc[:30]}...", callback_data=f"admin:edit_desc_item:{product.id}:{i}"))
+        markup.add(InlineKeyboardButton("Back", callback_data=f"admin:select_edit:{product.id}"))
 
         bot.edit_message_text(
             text,
@@ -184,115 +207,86 @@ def admin_edit_price(bot: TeleBot, call: CallbackQuery, product_id: int):
             call.message.message_id,
             reply_markup=markup
         )
-        set_state(call.from_user.id, 'admin_edit_price', {'product_id': product_id})
-    finally:
-        session.close()
-
-
-def admin_edit_descriptions(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product or not product.description_text:
-            text = "No descriptions to edit."
-        else:
-            text = "Current descriptions:\nSelect one to edit:"
-            markup = InlineKeyboardMarkup(row_width=1)
-            descriptions = product.description_text.split('\n')
-            for i, desc in enumerate(descriptions, 1):
-                if desc.strip():
-                    markup.add(InlineKeyboardButton(f"Description {i}: {desc[:30]}...", callback_data=f"admin:edit_desc_item:{product.id}:{i}"))
-            markup.add(InlineKeyboardButton("Back", callback_data=f"admin:select_edit:{product.id}"))
-
-            bot.edit_message_text(
-                text,
-                call.message.chat.id,
-                call.message.message_id,
-                reply_markup=markup
-            )
-    finally:
-        session.close()
 
 
 # ── Delete Product ──
+@router.route('admin:delete_product', admin_only=True)
 def admin_delete_product(bot: TeleBot, call: CallbackQuery):
-    session = Session()
-    try:
-        products = session.query(Product).all()
-        if not products:
-            text = "No products to delete."
-            markup = InlineKeyboardMarkup().add(
-                InlineKeyboardButton("Back", callback_data="admin:products")
-            )
-        else:
-            text = "Select a product to delete:"
-            markup = InlineKeyboardMarkup(row_width=1)
-            for p in products:
-                markup.add(InlineKeyboardButton(f"{p.code} - {p.name}", callback_data=f"admin:confirm_delete:{p.id}"))
-            markup.add(InlineKeyboardButton("Back", callback_data="admin:products"))
-
-        bot.edit_message_text(
-            text,
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=markup
+    products = catalog.all()
+    if not products:
+        text = "No products to delete."
+        markup = InlineKeyboardMarkup().add(
+            InlineKeyboardButton("Back", callback_data="admin:products")
         )
-    finally:
-        session.close()
+    else:
+        text = "Select a product to delete:"
+        markup = InlineKeyboardMarkup(row_width=1)
+        for p in products:
+            markup.add(InlineKeyboardButton(f"{p.code} - {p.name}", callback_data=f"admin:confirm_delete:{p.id}"))
+        markup.add(InlineKeyboardButton("Back", callback_data="admin:products"))
 
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
 
+
+@router.route('admin:confirm_delete:<int:product_id>', admin_only=True)
 def admin_confirm_delete(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-            return
-
-        text = (
-            f"Are you sure you want to delete this product?\n\n"
-            f"ID: {product.id}\n"
-            f"Name: {product.name}\n"
-            f"Price: {product.price:,} IRR\n"
-            f"Description: {product.description_text or 'None'}"
-        )
-        markup = InlineKeyboardMarkup(row_width=2)
-        markup.add(
-            InlineKeyboardButton("Yes, Delete", callback_data=f"admin:delete_confirm_yes:{product.id}"),
-            InlineKeyboardButton("No", callback_data="admin:delete_product")
-        )
+    product = catalog.get(product_id)
+    if not product:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
+
+    text = (
+        f"Are you sure you want to delete this product?\n\n"
+        f"ID: {product.id}\n"
+        f"Name: {product.name}\n"
+        f"Price: {product.price:,} IRR\n"
+        f"Description: {product.description_text or 'None'}"
+    )
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(
+        InlineKeyboardButton("Yes, Delete", callback_data=f"admin:delete_confirm_yes:{product.id}"),
+        InlineKeyboardButton("No", callback_data="admin:delete_product")
+    )
 
-        bot.edit_message_text(
-            text,
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=markup
-        )
-    finally:
-        session.close()
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
 
 
+@router.route('admin:delete_confirm_yes:<int:product_id>', admin_only=True)
 def admin_delete_confirm_yes(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
+    label = None
+    with session_scope() as session:
+        # حذف از طریق ORM تا محتواها و راهنماهای محصول هم cascade شوند
+        product = session.get(Product, product_id)
         if product:
+            label = f"{product.code} - {product.name}"
             session.delete(product)
             session.commit()
-            bot.edit_message_text(
-                f"Product {product.code} - {product.name} deleted successfully.",
-                call.message.chat.id,
-                call.message.message_id,
-                reply_markup=InlineKeyboardMarkup().add(
-                    InlineKeyboardButton("Back to Product Settings", callback_data="admin:products")
-                )
-            )
-        else:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-    finally:
-        session.close()
-        
-        
+            catalog.remove(product_id)
+    # درخواست تلگرام بیرون از بلوک session، تا تراکنش پشت شبکه باز نماند
+    if label is None:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
+    bot.edit_message_text(
+        f"Product {label} deleted successfully.",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=InlineKeyboardMarkup().add(
+            InlineKeyboardButton("Back to Product Settings", callback_data="admin:products")
+        )
+    )
+
+
+@router.route('admin:add_product', admin_only=True)
 def admin_start_add_product(bot: TeleBot, call: CallbackQuery):
     """Start the add product flow"""
     user_id = call.from_user.id
@@ -312,6 +306,7 @@ def admin_start_add_product(bot: TeleBot, call: CallbackQuery):
     )
     
     
+@router.route('admin:add_product_skip_photo', admin_only=True)
 def admin_skip_photo(bot: TeleBot, call: CallbackQuery):
     user_id = call.from_user.id
     set_state(user_id, 'admin_add_product_name', {'photo_file_id': None})
@@ -322,4 +317,340 @@ def admin_skip_photo(bot: TeleBot, call: CallbackQuery):
         reply_markup=InlineKeyboardMarkup().add(
             InlineKeyboardButton("Cancel", callback_data="admin:cancel_add_product")
         )
-    )
\ No newline at end of file
+    )
+
+
+@router.route('admin:cancel_add_product', admin_only=True)
+@router.route('admin:cancel_import', admin_only=True)
+def admin_cancel_add_product(bot: TeleBot, call: CallbackQuery):
+    clear_state(call.from_user.id)
+    admin_products_menu(bot, call)
+
+
+# ── Bulk Import / Export ──
+@router.route('admin:import_products', admin_only=True)
+def admin_start_import(bot: TeleBot, call: CallbackQuery):
+    set_state(call.from_user.id, 'admin_import_products')
+    bot.edit_message_text(
+        "Send a .csv, .json or .jsonl file with the products to import.\n\n"
+        "Columns / keys: name, price (required), description, photo_file_id, code (optional; "
+        "generated when empty).\n"
+        "The whole file is rejected if any row is invalid.",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=InlineKeyboardMarkup().add(
+            InlineKeyboardButton("Cancel", callback_data="admin:cancel_import")
+        )
+    )
+
+
+def handle_import_document(bot: TeleBot, message):
+    """Stream the uploaded document from Telegram straight into the importer."""
+    if message.content_type != 'document':
+        bot.reply_to(message, "Please send the products file as a document.")
+        return
+    document = message.document
+    fmt = detect_format(document.file_name, document.mime_type)
+    if fmt is None:
+        bot.reply_to(message, "Unsupported file type. Use .csv, .json or .jsonl.")
+        return
+
+    with requests.get(bot.get_file_url(document.file_id), stream=True, timeout=60) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        report = import_products(response.raw, fmt)
+
+    if not report.ok:
+        lines = [f"Row {row}: {error}" if row else error for row, error in report.errors]
+        bot.reply_to(
+            message,
+            "Import rejected, nothing was saved.\n\n" + "\n".join(lines) + "\n\nFix the file and send it again.",
+            reply_markup=InlineKeyboardMarkup().add(
+                InlineKeyboardButton("Cancel", callback_data="admin:cancel_import")
+            )
+        )
+        return
+
+    clear_state(message.from_user.id)
+    log.info('products_imported', admin_id=message.from_user.id, count=report.inserted, format=fmt)
+    codes = f" ({report.codes[0]} … {report.codes[-1]})" if report.codes else ""
+    bot.reply_to(
+        message,
+        f"Imported {report.inserted} products{codes}.",
+        reply_markup=admin_products_keyboard()
+    )
+
+
+@router.route('admin:export_products:<fmt>', admin_only=True)
+def admin_export_products(bot: TeleBot, call: CallbackQuery, fmt: str):
+    if fmt not in FORMATS:
+        bot.answer_callback_query(call.id, "Unknown format.")
+        return
+    bot.answer_callback_query(call.id, "Preparing export...")
+    export = export_products(fmt)
+    try:
+        bot.send_document(
+            call.message.chat.id,
+            export,
+            visible_file_name=f"products.{fmt}",
+            caption=f"Product catalog ({len(catalog)} products)"
+        )
+    finally:
+        export.close()
+
+
+# ── Order Inbox (keyset pages over ix_orders_status_created) ──
+ORDERS_PER_PAGE = 8
+PERIODS = {'all': None, 'today': 0, '7d': 7, '30d': 30}  # روزهای گذشته؛ 0 یعنی از ابتدای امروز
+PERIOD_LABELS = {'all': 'All time', 'today': 'Today', '7d': '7 days', '30d': '30 days'}
+DECISIONS = {'accept': 'accepted', 'reject': 'rejected'}
+DECISION_MESSAGES = {
+    'accepted': "✅ Your order #{id} ({product}) has been accepted. We will contact you soon.",
+    'rejected': "❌ Your order #{id} ({product}) has been rejected. Please contact support for details.",
+}
+
+
+def _since(period: str):
+    days = PERIODS.get(period)
+    if days is None:
+        return None
+    now = datetime.utcnow()  # created_at با func.now() در SQLite به وقت UTC ذخیره می‌شود
+    if days == 0:
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return now - timedelta(days=days)
+
+
+def _inbox_data(admin_id: int) -> dict:
+    if get_state(admin_id) != 'admin_order_inbox':
+        set_state(admin_id, 'admin_order_inbox', {'selected': [], 'view': ['pending', 'all', 'n', 1, None]})
+    return get_state_data(admin_id)
+
+
+def render_order_inbox(bot: TeleBot, call: CallbackQuery, status: str = 'pending', period: str = 'all',
+                       direction: str = 'n', page: int = 1, cursor: int = None):
+    admin_id = call.from_user.id
+    data = _inbox_data(admin_id)
+    if data['view'][0] != status:
+        update_state_data(admin_id, 'selected', [])
+    update_state_data(admin_id, 'view', [status, period, direction, page, cursor])
+    selected = set(get_state_data(admin_id, 'selected'))
+
+    orders, more = get_orders_page(status, _since(period), cursor, direction, ORDERS_PER_PAGE)
+    if cursor is None:
+        page, has_prev, has_next = 1, False, more
+    elif direction == 'p':
+        page, has_prev, has_next = (page if more else 1), more, True
+    else:
+        has_prev, has_next = True, more
+    update_state_data(admin_id, 'page_ids', [o.id for o in orders])
+
+    lines = [f"📥 Orders · {status.title()} · {PERIOD_LABELS[period]} (page {page})"]
+    if status == 'pending':
+        lines.append(f"Selected: {len(selected)}")
+    lines.append("")
+    if not orders:
+        lines.append("No orders.")
+    for o in orders:
+        date = o.created_at.strftime("%Y-%m-%d %H:%M") if o.created_at else '-'
+        lines.append(f"#{o.id} · {o.product_name} · {o.product_price or 0:,.0f} IRR · {date} · user {o.user_id}")
+
+    markup = InlineKeyboardMarkup(row_width=2)
+    if status == 'pending':
+        markup.add(*[
+            InlineKeyboardButton(f"{'☑' if o.id in selected else '☐'} #{o.id} {o.product_name}",
+                                 callback_data=f"admin:order_toggle:{o.id}")
+            for o in orders
+        ])
+    nav = []
+    if has_prev and orders:
+        nav.append(InlineKeyboardButton("◀ Previous", callback_data=f"admin:orders:{status}:{period}:p:{page-1}:{orders[0].id}"))
+    if has_next and orders:
+        nav.append(InlineKeyboardButton("Next ▶", callback_data=f"admin:orders:{status}:{period}:n:{page+1}:{orders[-1].id}"))
+    if nav:
+        markup.row(*nav)
+    markup.row(*[
+        InlineKeyboardButton(f"• {s.title()}" if s == status else s.title(), callback_data=f"admin:orders:{s}:{period}")
+        for s in ORDER_STATUSES
+    ])
+    markup.row(*[
+        InlineKeyboardButton(f"• {label}" if p == period else label, callback_data=f"admin:orders:{status}:{p}")
+        for p, label in PERIOD_LABELS.items()
+    ])
+    if status == 'pending':
+        markup.row(
+            InlineKeyboardButton("Select page", callback_data="admin:orders_select_page"),
+            InlineKeyboardButton("Clear", callback_data="admin:orders_clear"),
+        )
+        markup.row(
+            InlineKeyboardButton(f"✅ Accept ({len(selected)})", callback_data="admin:orders_batch:accept"),
+            InlineKeyboardButton(f"❌ Reject ({len(selected)})", callback_data="admin:orders_batch:reject"),
+        )
+    markup.add(InlineKeyboardButton("Back to Admin Panel", callback_data="admin:main"))
+
+    bot.edit_message_text("\n".join(lines), call.message.chat.id, call.message.message_id, reply_markup=markup)
+
+
+@router.route('admin:orders', admin_only=True)
+@router.route('admin:orders:<status>:<period>', admin_only=True)
+@router.route('admin:orders:<status>:<period>:<direction>:<int:page>:<int:cursor>', admin_only=True)
+def admin_order_inbox(bot: TeleBot, call: CallbackQuery, status: str = 'pending', period: str = 'all',
+                      direction: str = 'n', page: int = 1, cursor: int = None):
+    if status not in ORDER_STATUSES or period not in PERIODS:
+        bot.answer_callback_query(call.id, "Invalid filter.")
+        return
+    render_order_inbox(bot, call, status, period, direction, page, cursor)
+
+
+def _rerender_inbox(bot: TeleBot, call: CallbackQuery):
+    render_order_inbox(bot, call, *_inbox_data(call.from_user.id)['view'])
+
+
+@router.route('admin:order_toggle:<int:order_id>', admin_only=True)
+def admin_toggle_order(bot: TeleBot, call: CallbackQuery, order_id: int):
+    selected = _inbox_data(call.from_user.id)['selected']
+    if order_id in selected:
+        selected = [i for i in selected if i != order_id]
+    else:
+        selected = selected + [order_id]
+    update_state_data(call.from_user.id, 'selected', selected)
+    _rerender_inbox(bot, call)
+
+
+@router.route('admin:orders_select_page', admin_only=True)
+def admin_select_page(bot: TeleBot, call: CallbackQuery):
+    data = _inbox_data(call.from_user.id)
+    update_state_data(call.from_user.id, 'selected', list(dict.fromkeys(data['selected'] + data.get('page_ids', []))))
+    _rerender_inbox(bot, call)
+
+
+@router.route('admin:orders_clear', admin_only=True)
+def admin_clear_selection(bot: TeleBot, call: CallbackQuery):
+    update_state_data(call.from_user.id, 'selected', [])
+    _rerender_inbox(bot, call)
+
+
+def decide_orders(bot: TeleBot, order_ids, status: str) -> list:
+    """One bulk UPDATE; once it is committed, queue every affected user's notification at bulk priority."""
+    changed = set_orders_status(order_ids, status)
+    template = DECISION_MESSAGES[status]
+
+    def notify_users():
+        for order_id, user_id, product_name in changed:
+            bot.outbound.submit('send_message', user_id, template.format(id=order_id, product=product_name),
+                                priority=PRIORITY_BULK)
+
+    after_commit(notify_users)
+    log.info('orders_decided', status=status, requested=len(order_ids), changed=len(changed))
+    return changed
+
+
+@router.route('admin:orders_batch:<action>', admin_only=True)
+def admin_batch_decide(bot: TeleBot, call: CallbackQuery, action: str):
+    status = DECISIONS.get(action)
+    selected = _inbox_data(call.from_user.id)['selected']
+    if status is None or not selected:
+        bot.answer_callback_query(call.id, "Select at least one order first.")
+        return
+    changed = decide_orders(bot, selected, status)
+    update_state_data(call.from_user.id, 'selected', [])
+    bot.answer_callback_query(call.id, f"{len(changed)} order(s) {status}.")
+    _rerender_inbox(bot, call)
+
+
+@router.route('admin:accept_order:<int:order_id>', admin_only=True)
+def admin_accept_order(bot: TeleBot, call: CallbackQuery, order_id: int):
+    _decide_single(bot, call, order_id, 'accepted')
+
+
+@router.route('admin:reject_order:<int:order_id>', admin_only=True)
+def admin_reject_order(bot: TeleBot, call: CallbackQuery, order_id: int):
+    _decide_single(bot, call, order_id, 'rejected')
+
+
+def _decide_single(bot: TeleBot, call: CallbackQuery, order_id: int, status: str):
+    """Accept/Reject buttons on the new-order notification."""
+    if not decide_orders(bot, [order_id], status):
+        bot.answer_callback_query(call.id, f"Order #{order_id} was already handled.", show_alert=True)
+        return
+    bot.answer_callback_query(call.id, f"Order #{order_id} {status}.")
+    text = (call.message.text or f"Order #{order_id}").replace("Status: Pending", f"Status: {status.title()}")
+    bot.edit_message_text(text, call.message.chat.id, call.message.message_id)
+
+
+# ── Broadcast ──
+def _broadcast_controls(*buttons):
+    return InlineKeyboardMarkup().row(*[InlineKeyboardButton(label, callback_data=data) for label, data in buttons])
+
+
+@router.route('admin:broadcast', admin_only=True)
+def admin_start_broadcast(bot: TeleBot, call: CallbackQuery):
+    set_state(call.from_user.id, 'admin_broadcast_text')
+    bot.edit_message_text(
+        "Send the announcement text to broadcast to all users.",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=_broadcast_controls(("Cancel", "admin:broadcast_discard"))
+    )
+
+
+def handle_broadcast_message(bot: TeleBot, message):
+    """Store the draft and show a preview with the recipient count."""
+    if message.content_type != 'text' or not message.text.strip():
+        bot.reply_to(message, "Please send the announcement as text.")
+        return
+    set_state(message.from_user.id, 'admin_broadcast_confirm', {'text': message.text})
+    with session_scope() as session:
+        recipients = session.query(User).filter(User.user_id.isnot(None)).count()
+    bot.reply_to(
+        message,
+        f"Preview:\n\n{message.text}\n\nSend to {recipients} users?",
+        reply_markup=_broadcast_controls(("✅ Send", "admin:broadcast_send"), ("Cancel", "admin:broadcast_discard"))
+    )
+
+
+@router.route('admin:broadcast_discard', admin_only=True)
+def admin_discard_broadcast(bot: TeleBot, call: CallbackQuery):
+    clear_state(call.from_user.id)
+    admin_main_panel(bot, call)
+
+
+@router.route('admin:broadcast_send', admin_only=True)
+def admin_send_broadcast(bot: TeleBot, call: CallbackQuery):
+    admin_id = call.from_user.id
+    if get_state(admin_id) != 'admin_broadcast_confirm':
+        bot.answer_callback_query(call.id, "This broadcast was already sent.")
+        return
+    text = get_state_data(admin_id, 'text')
+    clear_state(admin_id)
+    # همین پیام پیش‌نمایش به پیام پیشرفت تبدیل می‌شود
+    broadcast_id = broadcasts.create(admin_id, text, call.message.chat.id, call.message.message_id)
+    log.info('broadcast_started', admin_id=admin_id, broadcast_id=broadcast_id)
+    bot.answer_callback_query(call.id, "Broadcast started.")
+    broadcasts.report(bot, broadcast_id)
+    broadcasts.start(bot, broadcast_id)
+
+
+@router.route('admin:broadcast_pause:<int:broadcast_id>', admin_only=True)
+def admin_pause_broadcast(bot: TeleBot, call: CallbackQuery, broadcast_id: int):
+    if broadcasts.pause(broadcast_id):
+        bot.answer_callback_query(call.id, "Pausing after the current batch...")
+    else:
+        bot.answer_callback_query(call.id, "This broadcast is not running.")
+
+
+@router.route('admin:broadcast_resume:<int:broadcast_id>', admin_only=True)
+def admin_resume_broadcast(bot: TeleBot, call: CallbackQuery, broadcast_id: int):
+    if broadcasts.resume(bot, broadcast_id):
+        bot.answer_callback_query(call.id, "Broadcast resumed.")
+        broadcasts.report(bot, broadcast_id)
+    else:
+        bot.answer_callback_query(call.id, "This broadcast is not paused.")
+
+
+@router.route('admin:broadcast_cancel:<int:broadcast_id>', admin_only=True)
+def admin_cancel_broadcast(bot: TeleBot, call: CallbackQuery, broadcast_id: int):
+    if broadcasts.cancel(broadcast_id):
+        bot.answer_callback_query(call.id, "Broadcast cancelled.")
+        broadcasts.report(bot, broadcast_id)
+    else:
+        bot.answer_callback_query(call.id, "This broadcast has already finished.")
@@ -2,7 +2,9 @@
 from telebot import TeleBot
 from telebot.types import CallbackQuery
 from src.utils.keyboards import main_menu_keyboard
+from src.utils.router import router
 
+@router.route('menu:profile')
 def profile_handler(bot: TeleBot, call: CallbackQuery):
     user = call.from_user
     text = f"""
@@ -1,13 +1,15 @@
 # src/handlers/visa_card.py
 from telebot import TeleBot
 from telebot.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from src.database.db_manager import Session
-from src.database.models import Product, ProductContent
+from src.database.catalog import catalog
 from src.utils.keyboards import visa_menu_keyboard, products_list_keyboard, product_detail_keyboard , get_main_menu_markup
-from src.utils.states import set_state, get_state, get_state_data, clear_state
+from src.utils.states import set_state, get_state, get_state_data, clear_state, back_state
+from src.utils.router import router
 from config.settings import ADMIN_ID, WALLET_ADDRESS
 
 
+@router.route('menu:visa_card')
+@router.route('visa:menu')
 def visa_card_handler(bot: TeleBot, call: CallbackQuery):
     """Entry point to Visa Card section"""
     bot.edit_message_text(
@@ -17,114 +19,117 @@ def visa_card_handler(bot: TeleBot, call: CallbackQuery):
         reply_markup=visa_menu_keyboard()
     )
 
-def visa_callback_handler(bot: TeleBot, call: CallbackQuery, action: str):
-    print(f"[VISA CALLBACK] Action received: {action}")
-    bot.answer_callback_query(call.id, "Processing...")
 
-    data_parts = action.split(':')
-    if not data_parts:
-        return
-
-    cmd = data_parts[0]
-
-    if cmd == 'menu':
-        bot.edit_message_text(
-            "Please select an option:",
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=visa_menu_keyboard()
-        )
-
-    elif cmd == 'order':
-        show_products_list(bot, call)
-
-    elif cmd == 'products':
-        page = int(data_parts[1]) if len(data_parts) > 1 else 1
-        show_products_list(bot, call, page)
+@router.route('visa:verification_guide')
+@router.route('order:verification_guide')
+def show_verification_guide(bot: TeleBot, call: CallbackQuery):
+    bot.send_message(
+        call.message.chat.id,
+        "Verification guide is not set yet. Please contact support."
+    )
 
-    elif cmd == 'product':
-        product_id = int(data_parts[1])
-        show_product_detail(bot, call, product_id)
 
-    elif cmd == 'guide':
-        product_id = int(data_parts[1])
-        show_product_guide(bot, call, product_id)
+@router.route('visa:cancel')
+@router.route('order:cancel')
+def cancel_order(bot: TeleBot, call: CallbackQuery):
+    clear_state(call.from_user.id)
+    bot.edit_message_text(
+        "Operation cancelled.",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=get_main_menu_markup(call.from_user.id)
+    )
 
-    elif cmd == 'order_product':
-        product_id = int(data_parts[1])
-        start_order_flow(bot, call, product_id)
 
-    elif cmd == 'order_continue':
-        product_id = int(data_parts[1])
-        start_order_name(bot, call, product_id)
+@router.route('order:back')
+def order_back(bot: TeleBot, call: CallbackQuery):
+    previous_state, previous_data = back_state(call.from_user.id)
+    if not previous_state:
+        bot.answer_callback_query(call.id, "No previous step available.", show_alert=True)
+        return
 
-    elif cmd == 'verification_guide':
-        bot.send_message(
-            call.message.chat.id,
-            "Verification guide is not set yet. Please contact support."
-        )
+    cancel_markup = InlineKeyboardMarkup().add(
+        InlineKeyboardButton("Cancel", callback_data="order:cancel")
+    )
+    # نمایش دوباره پیام مرحله قبلی
+    if previous_state == 'order_full_name':
+        text = "Please enter your full name in English (back from previous step):"
+    elif previous_state == 'order_address':
+        text = "Please enter your address in English format (back):"
+    else:
+        text = f"Returned to previous step: {previous_state}"
+        cancel_markup = None
 
-    elif cmd == 'cancel':
-        clear_state(call.from_user.id)
-        bot.edit_message_text(
-            "Operation cancelled.",
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=get_main_menu_markup(call.from_user.id)
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=cancel_markup
+    )
+    set_state(call.from_user.id, previous_state, previous_data)
+
+
+@router.route('visa:order')
+@router.route('visa:products')
+@router.route('visa:products:<int:page>')
+@router.route('visa:products:<direction>:<int:page>:<int:cursor>')
+def show_products_list(bot: TeleBot, call: CallbackQuery, page: int = 1, direction: str = 'n', cursor: int = None):
+    products, more = catalog.page(cursor, direction)
+    if cursor is not None and not products:
+        # cursor قدیمی که دیگر محصولی بعد از آن نیست: برگشت به صفحه اول
+        cursor = None
+        products, more = catalog.page()
+
+    if cursor is None:
+        page = 1
+        has_more = more
+    elif direction == 'p':
+        # در برگشت، صفحه بعدی همیشه وجود دارد
+        page = page if more else 1
+        has_more = True
+    else:
+        has_more = more
+    if not products:
+        text = "No products available at the moment.\nComing soon."
+        markup = InlineKeyboardMarkup().add(
+            InlineKeyboardButton("Back", callback_data="visa:menu")
         )
-
     else:
-        bot.send_message(call.message.chat.id, "Invalid command.")
+        text = "Select a product to order:"
+        markup = products_list_keyboard(products, page, has_more)
 
-def show_products_list(bot: TeleBot, call: CallbackQuery, page: int = 1):
-    session = Session()
-    try:
-        products = session.query(Product).order_by(Product.id.desc()).all()
-        if not products:
-            text = "No products available at the moment.\nComing soon."
-            markup = InlineKeyboardMarkup().add(
-                InlineKeyboardButton("Back", callback_data="visa:menu")
-            )
-        else:
-            text = "Select a product to order:"
-            markup = products_list_keyboard(products, page)
-
-        bot.edit_message_text(
-            text,
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=markup
-        )
-    finally:
-        session.close()
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
 
+@router.route('visa:product:<int:product_id>')
 def show_product_detail(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-            return
-
-        text = (
-            f"Product ID: {product.id}\n"
-            f"Code: {product.code}\n"
-            f"Name: {product.name}\n"
-            f"Price: {product.price:,} IRR\n\n"
-            f"Description:\n{product.description_text or 'None'}"
-        )
+    product = catalog.get(product_id)
+    if not product:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
 
-        markup = product_detail_keyboard(product_id)
+    text = (
+        f"Product ID: {product.id}\n"
+        f"Code: {product.code}\n"
+        f"Name: {product.name}\n"
+        f"Price: {product.price:,} IRR\n\n"
+        f"Description:\n{product.description_text or 'None'}"
+    )
 
-        bot.edit_message_text(
-            text,
-            call.message.chat.id,
-            call.message.message_id,
-            reply_markup=markup
-        )
-    finally:
-        session.close()
+    markup = product_detail_keyboard(product_id)
+
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=markup
+    )
 
+@router.route('visa:guide:<int:product_id>')
 def show_product_guide(bot: TeleBot, call: CallbackQuery, product_id: int):
     text = (
         "Product Guide:\n"
@@ -142,38 +147,36 @@ def show_product_guide(bot: TeleBot, call: CallbackQuery, product_id: int):
         reply_markup=markup
     )
 
+@router.route('visa:order_product:<int:product_id>')
+@router.route('order:start:<int:product_id>')
 def start_order_flow(bot: TeleBot, call: CallbackQuery, product_id: int):
-    session = Session()
-    try:
-        product = session.query(Product).filter_by(id=product_id).first()
-        if not product:
-            bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
-            return
-
-        set_state(call.from_user.id, 'order_full_name', {
-            'product_id': product_id,
-            'product_name': product.name,
-            'product_price': product.price
-        })
-
-        text = (
-            f"For ordering '{product.name}' at {product.price:,.0f} IRR,\n"
-            "Please enter your full name in English:"
-        )
-        markup = InlineKeyboardMarkup().add(
-            InlineKeyboardButton("Cancel", callback_data="order:cancel")
-        )
+    product = catalog.get(product_id)
+    if not product:
+        bot.answer_callback_query(call.id, "Product not found!", show_alert=True)
+        return
 
-        # پیام قبلی رو حذف کن (عکس جزئیات محصول)
-        try:
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-        except:
-            pass
+    set_state(call.from_user.id, 'order_full_name', {
+        'product_id': product_id,
+        'product_name': product.name,
+        'product_price': product.price
+    })
 
-        bot.send_message(
-            call.message.chat.id,
-            text,
-            reply_markup=markup
-        )
-    finally:
-        session.close()
\ No newline at end of file
+    text = (
+        f"For ordering '{product.name}' at {product.price:,.0f} IRR,\n"
+        "Please enter your full name in English:"
+    )
+    markup = InlineKeyboardMarkup().add(
+        InlineKeyboardButton("Cancel", callback_data="order:cancel")
+    )
+
+    # پیام قبلی رو حذف کن (عکس جزئیات محصول)
+    try:
+        bot.delete_message(call.message.chat.id, call.message.message_id)
+    except:
+        pass
+
+    bot.send_message(
+        call.message.chat.id,
+        text,
+        reply_markup=markup
+    )
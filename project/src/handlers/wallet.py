@@ -1,13 +1,21 @@
 # src/handlers/wallet.py
+import secrets
 from telebot import TeleBot
 from telebot.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from src.database.db_manager import get_balance, add_transaction, get_user
+from src.database.db_manager import get_balance, get_transactions_page
+from src.database.users import users
+from src.database.ledger import ledger, LedgerError, InsufficientFunds
 from src.database.models import Transaction, TransactionType
-from src.utils.keyboards import main_menu_keyboard
+from src.utils.keyboards import main_menu_keyboard, wallet_home_keyboard
+from src.utils.router import router
+from src.utils.states import set_state, get_state, get_state_data, clear_state
 from config.settings import CURRENCY
 from datetime import datetime
 
+TRANSACTIONS_PER_PAGE = 5
+
 # --- منوی اصلی والت ---
+@router.route('menu:wallet')
 def wallet_handler(bot: TeleBot, call: CallbackQuery):
     user_id = call.from_user.id
     balance = get_balance(user_id)
@@ -20,47 +28,18 @@ def wallet_handler(bot: TeleBot, call: CallbackQuery):
 انتخاب کنید:
     """.strip()
     
-    markup = InlineKeyboardMarkup(row_width=2)
-    markup.add(
-        InlineKeyboardButton("💳 نمایش موجودی", callback_data="wallet:balance"),
-        InlineKeyboardButton("🔋 شارژ کیف پول", callback_data="wallet:charge"),
-        InlineKeyboardButton("📜 تاریخچه تراکنش‌ها", callback_data="wallet:transactions:1"),
-        InlineKeyboardButton("🔙 بازگشت به منوی اصلی", callback_data="menu:main")
-    )
-    
-    bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup, parse_mode='Markdown')
-
-
-# --- مدیریت کال‌بک‌های والت ---
-def wallet_callback_handler(bot: TeleBot, call: CallbackQuery, action: str):
-    user_id = call.from_user.id
-    data_parts = action.split(':')
-    cmd = data_parts[0]
-
-    if cmd == 'balance':
-        balance = get_balance(user_id)
-        bot.answer_callback_query(call.id, f"موجودی شما: {balance:,.0f} {CURRENCY}", show_alert=True)
-
-    elif cmd == 'charge':
-        show_charge_options(bot, call)
-
-    elif cmd == 'charge_amount':
-        amount = int(data_parts[1])
-        show_charge_confirm(bot, call, amount)
-
-    elif cmd == 'confirm_charge':
-        amount = int(data_parts[1])
-        confirm_charge(bot, call, amount)
+    bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=wallet_home_keyboard(), parse_mode='Markdown')
 
-    elif cmd == 'transactions':
-        page = int(data_parts[1]) if len(data_parts) > 1 else 1
-        show_transactions(bot, call, user_id, page)
 
-    else:
-        bot.answer_callback_query(call.id, "دستور نامعتبر!")
+# --- موجودی ---
+@router.route('wallet:balance')
+def show_balance(bot: TeleBot, call: CallbackQuery):
+    balance = get_balance(call.from_user.id)
+    bot.answer_callback_query(call.id, f"موجودی شما: {balance:,.0f} {CURRENCY}", show_alert=True)
 
 
 # --- نمایش گزینه‌های شارژ ---
+@router.route('wallet:charge')
 def show_charge_options(bot: TeleBot, call: CallbackQuery):
     markup = InlineKeyboardMarkup(row_width=2)
     amounts = [100000, 500000, 1000000, 2000000, 5000000]
@@ -80,10 +59,13 @@ def show_charge_options(bot: TeleBot, call: CallbackQuery):
 
 
 # --- تأیید شارژ ---
+@router.route('wallet:charge_amount:<int:amount>')
 def show_charge_confirm(bot: TeleBot, call: CallbackQuery, amount: int):
+    # هر صفحه‌ی تأیید nonce خودش را دارد: کلید idempotency همین شارژ، نه پیام مشترک والت
+    nonce = secrets.token_hex(6)
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
-        InlineKeyboardButton("✅ تأیید پرداخت", callback_data=f"wallet:confirm_charge:{amount}"),
+        InlineKeyboardButton("✅ تأیید پرداخت", callback_data=f"wallet:confirm_charge:{amount}:{nonce}"),
         InlineKeyboardButton("❌ لغو", callback_data="menu:wallet")
     )
 
@@ -101,59 +83,163 @@ def show_charge_confirm(bot: TeleBot, call: CallbackQuery, amount: int):
 
 
 # --- انجام شارژ (mock - بعداً واقعی می‌کنی) ---
-def confirm_charge(bot: TeleBot, call: CallbackQuery, amount: int):
+@router.route('wallet:confirm_charge:<int:amount>:<nonce>')
+def confirm_charge(bot: TeleBot, call: CallbackQuery, amount: int, nonce: str):
     user_id = call.from_user.id
 
     # اضافه کردن به والت (در نسخه واقعی: بعد از تأیید پرداخت دستی یا خودکار)
-    from src.database.db_manager import Session
-    session = Session()
-    try:
-        wallet = session.query(Wallet).filter_by(user_id=user_id).first()
-        if wallet:
-            wallet.balance += amount
-            session.commit()
-    finally:
-        session.close()
-
-    # ثبت تراکنش
-    add_transaction({
-        'user_id': user_id,
-        'type': TransactionType.deposit.value,
-        'amount': amount,
-        'description': f'شارژ کیف پول (mock)',
-        'status': 'confirmed'
-    })
+    # کلید یکتا = nonce صفحه‌ی تأیید؛ دوبار زدن همان دکمه دوبار شارژ نمی‌کند
+    entry = ledger.post(
+        user_id, amount, TransactionType.deposit, 'شارژ کیف پول (mock)',
+        idempotency_key=f"charge:{user_id}:{nonce}"
+    )
+    if entry.replayed:
+        text = f"ℹ️ این شارژ قبلاً اعمال شده است.\n\nموجودی فعلی: {entry.balance:,.0f} {CURRENCY}"
+        notice = "این شارژ قبلاً انجام شده بود."
+    else:
+        text = f"✅ شارژ موفق!\n\nمبلغ {amount:,.0f} {CURRENCY} به کیف پول شما اضافه شد."
+        notice = "شارژ انجام شد!"
 
     bot.edit_message_text(
-        f"✅ شارژ موفق!\n\nمبلغ {amount:,.0f} {CURRENCY} به کیف پول شما اضافه شد.",
+        text,
         call.message.chat.id,
         call.message.message_id,
         reply_markup=InlineKeyboardMarkup().add(
             InlineKeyboardButton("🔙 بازگشت به والت", callback_data="menu:wallet")
         )
     )
-    bot.answer_callback_query(call.id, "شارژ انجام شد!")
+    bot.answer_callback_query(call.id, notice)
+
+
+# --- انتقال به کاربر دیگر: گیرنده ← مبلغ ← تأیید ---
+def _transfer_cancel_markup():
+    return InlineKeyboardMarkup().add(InlineKeyboardButton("❌ لغو", callback_data="wallet:transfer_cancel"))
+
+
+@router.route('wallet:transfer')
+def start_transfer(bot: TeleBot, call: CallbackQuery):
+    set_state(call.from_user.id, 'wallet_transfer_recipient', {})
+    bot.edit_message_text(
+        "🔄 شناسه عددی تلگرام گیرنده را ارسال کنید:",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=_transfer_cancel_markup()
+    )
+
+
+def handle_transfer_message(bot: TeleBot, message, state: str):
+    """Text steps of the transfer wizard (called from the main message handler)."""
+    user_id = message.from_user.id
+    text = (message.text or '').strip()
+
+    if state == 'wallet_transfer_recipient':
+        if not text.isdigit():
+            bot.reply_to(message, "شناسه باید عددی باشد. دوباره ارسال کنید:", reply_markup=_transfer_cancel_markup())
+            return
+        recipient_id = int(text)
+        if recipient_id == user_id:
+            bot.reply_to(message, "امکان انتقال به خودتان وجود ندارد.", reply_markup=_transfer_cancel_markup())
+            return
+        if not users.known(recipient_id):
+            bot.reply_to(message, "کاربری با این شناسه در ربات ثبت نشده است.", reply_markup=_transfer_cancel_markup())
+            return
+        set_state(user_id, 'wallet_transfer_amount', {'recipient_id': recipient_id})
+        bot.reply_to(
+            message,
+            f"موجودی شما: {get_balance(user_id):,.0f} {CURRENCY}\nمبلغ انتقال را ارسال کنید:",
+            reply_markup=_transfer_cancel_markup()
+        )
+
+    elif state == 'wallet_transfer_amount':
+        amount = text.replace(',', '')
+        if not amount.isdigit() or int(amount) <= 0:
+            bot.reply_to(message, "مبلغ نامعتبر است. یک عدد مثبت ارسال کنید:", reply_markup=_transfer_cancel_markup())
+            return
+        amount = int(amount)
+        if amount > get_balance(user_id):
+            bot.reply_to(message, "موجودی کافی نیست. مبلغ کمتری ارسال کنید:", reply_markup=_transfer_cancel_markup())
+            return
+        data = get_state_data(user_id)
+        data['amount'] = amount
+        set_state(user_id, 'wallet_transfer_confirm', data)
+        markup = InlineKeyboardMarkup(row_width=2)
+        markup.add(
+            InlineKeyboardButton("✅ تأیید انتقال", callback_data="wallet:transfer_confirm"),
+            InlineKeyboardButton("❌ لغو", callback_data="wallet:transfer_cancel")
+        )
+        bot.reply_to(
+            message,
+            f"انتقال {amount:,.0f} {CURRENCY} به کاربر {data['recipient_id']} را تأیید می‌کنید؟",
+            reply_markup=markup
+        )
+
+    else:
+        bot.reply_to(message, "لطفاً از دکمه‌ها استفاده کنید.")
 
 
-# --- نمایش تاریخچه تراکنش‌ها (با صفحه‌بندی ساده) ---
-def show_transactions(bot: TeleBot, call: CallbackQuery, user_id: int, page: int = 1):
-    from src.database.db_manager import Session
-    session = Session()
+@router.route('wallet:transfer_confirm')
+def confirm_transfer(bot: TeleBot, call: CallbackQuery):
+    user_id = call.from_user.id
+    if get_state(user_id) != 'wallet_transfer_confirm':
+        bot.answer_callback_query(call.id, "این درخواست منقضی شده یا قبلاً انجام شده است.")
+        return
+    data = get_state_data(user_id)
+    recipient_id, amount = data['recipient_id'], data['amount']
+
     try:
-        transactions = session.query(Transaction).filter_by(user_id=user_id).order_by(Transaction.created_at.desc()).all()
-    finally:
-        session.close()
+        debit, _ = ledger.transfer(
+            user_id, recipient_id, amount,
+            description=f"انتقال از {user_id} به {recipient_id}",
+            idempotency_key=f"transfer:{call.message.chat.id}:{call.message.message_id}"
+        )
+    except InsufficientFunds:
+        bot.answer_callback_query(call.id, "موجودی کافی نیست.", show_alert=True)
+        return
+    except LedgerError as e:
+        bot.answer_callback_query(call.id, str(e), show_alert=True)
+        return
+    clear_state(user_id)
+
+    bot.edit_message_text(
+        f"✅ انتقال انجام شد.\n\nمبلغ: {amount:,.0f} {CURRENCY}\nگیرنده: {recipient_id}\n"
+        f"موجودی جدید: {debit.balance:,.0f} {CURRENCY}",
+        call.message.chat.id,
+        call.message.message_id,
+        reply_markup=InlineKeyboardMarkup().add(
+            InlineKeyboardButton("🔙 بازگشت به والت", callback_data="menu:wallet")
+        )
+    )
+    if not debit.replayed:
+        bot.outbound.submit('send_message', recipient_id, f"💰 مبلغ {amount:,.0f} {CURRENCY} از کاربر {user_id} به کیف پول شما منتقل شد.")
+
+
+@router.route('wallet:transfer_cancel')
+def cancel_transfer(bot: TeleBot, call: CallbackQuery):
+    clear_state(call.from_user.id)
+    wallet_handler(bot, call)
+
+
+# --- نمایش تاریخچه تراکنش‌ها (صفحه‌بندی keyset: wallet:transactions:<جهت>:<شماره صفحه>:<cursor>) ---
+@router.route('wallet:transactions')
+@router.route('wallet:transactions:<int:page>')
+@router.route('wallet:transactions:<direction>:<int:page>:<int:cursor>')
+def show_transactions(bot: TeleBot, call: CallbackQuery, page: int = 1, direction: str = 'n', cursor: int = None):
+    user_id = call.from_user.id
+    transactions, more = get_transactions_page(user_id, cursor, direction, TRANSACTIONS_PER_PAGE)
+
+    if cursor is None:
+        page, has_prev, has_next = 1, False, more
+    elif direction == 'p':
+        # در برگشت، صفحه بعدی همیشه وجود دارد
+        page, has_prev, has_next = (page if more else 1), more, True
+    else:
+        has_prev, has_next = True, more
 
     if not transactions:
         text = "📜 هنوز هیچ تراکنشی ندارید."
     else:
-        per_page = 5
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_transactions = transactions[start:end]
-
         text_lines = [f"📜 تاریخچه تراکنش‌ها (صفحه {page})\n"]
-        for tx in page_transactions:
+        for tx in transactions:
             emoji = "➕" if tx.type == 'deposit' else "➖" if tx.type in ['withdraw', 'payment'] else "🔄"
             status = "✅" if tx.status == 'confirmed' else "⏳" if tx.status == 'pending' else "❌"
             date = tx.created_at.strftime("%Y-%m-%d %H:%M")
@@ -164,12 +250,12 @@ def show_transactions(bot: TeleBot, call: CallbackQuery, user_id: int, page: int
 
     markup = InlineKeyboardMarkup(row_width=3)
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton("◀ قبلی", callback_data=f"wallet:transactions:{page-1}"))
-    if len(transactions) > page * per_page:
-        nav_buttons.append(InlineKeyboardButton("بعدی ▶", callback_data=f"wallet:transactions:{page+1}"))
+    if has_prev and transactions:
+        nav_buttons.append(InlineKeyboardButton("◀ قبلی", callback_data=f"wallet:transactions:p:{page-1}:{transactions[0].id}"))
+    if has_next and transactions:
+        nav_buttons.append(InlineKeyboardButton("بعدی ▶", callback_data=f"wallet:transactions:n:{page+1}:{transactions[-1].id}"))
     if nav_buttons:
         markup.add(*nav_buttons)
     markup.add(InlineKeyboardButton("🔙 بازگشت", callback_data="menu:wallet"))
 
-    bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
\ No newline at end of file
+    bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
@@ -0,0 +1,109 @@
+# src/utils/aio.py
+import asyncio
+import time
+import aiohttp
+from telebot.asyncio_helper import ApiTelegramException as AsyncApiTelegramException, RequestTimeout
+from src.utils.outbound import OutboundDispatcher, OutboundJob, PRIORITY_USER
+from src.utils.log import get_logger
+
+log = get_logger('outbound')
+
+
+class AsyncOutbound(OutboundDispatcher):
+    """OutboundDispatcher whose API calls are coroutines on an asyncio loop (``AsyncTeleBot``).
+
+    Scheduling is unchanged (priorities, global and per-chat buckets, one call
+    in flight per chat, 429 pauses and retries); only the HTTP round trip moves
+    from the sender thread pool onto the event loop, so any number of calls can
+    be in flight without a thread each. Jobs submitted before ``bind`` wait in
+    the queue.
+    """
+
+    API_ERRORS = OutboundDispatcher.API_ERRORS + (AsyncApiTelegramException,)
+    NETWORK_ERRORS = OutboundDispatcher.NETWORK_ERRORS + (aiohttp.ClientError, asyncio.TimeoutError, RequestTimeout)
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('autostart', False)
+        super().__init__(sender=None, senders=1, **kwargs)
+        self.async_bot = None
+        self.loop = None
+
+    def bind(self, async_bot, loop=None):
+        """Start sending through ``async_bot`` on ``loop`` (default: the running loop)."""
+        self.async_bot = async_bot
+        self.loop = loop or asyncio.get_running_loop()
+        return self.start()
+
+    def call(self, method: str, *args, priority: int = PRIORITY_USER, **kwargs):
+        """Queue a call without waiting for it; failures are logged instead of raised.
+
+        Per-chat order is still kept by the dispatcher, so a handler's replies
+        arrive in the order it sent them while its worker thread moves on.
+        """
+        future = self.submit(method, *args, priority=priority, **kwargs)
+        future.add_done_callback(lambda f: self._log_failure(method, f))
+        return future
+
+    @staticmethod
+    def _log_failure(method: str, future):
+        error = future.exception()
+        if error is not None:
+            log.warning('send_failed', method=method, error=type(error).__name__, detail=str(error))
+
+    def _launch(self, job: OutboundJob):
+        asyncio.run_coroutine_threadsafe(self._execute_async(job), self.loop)
+
+    async def _execute_async(self, job: OutboundJob):
+        job.attempts += 1
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.async_bot, job.method)(*job.args, **job.kwargs)
+        except Exception as e:
+            self._settle(job, started, error=e)
+        else:
+            self._settle(job, started, result=result)
+
+
+class AsyncSendMixin:
+    """TeleBot mixin for the asyncio runtime: every reply goes through an AsyncOutbound.
+
+    Goes in front of RateLimitedSendMixin. Handlers keep calling the usual
+    synchronous methods, which now return a Future at once instead of the
+    sent Message. ``send_document`` is the exception: it uploads a file the
+    handler closes afterwards, so it waits for the upload and returns the
+    Message. Methods not routed here (``get_file_url`` and friends) still
+    make a blocking request.
+    """
+
+    def __init__(self, *args, outbound: OutboundDispatcher = None, **kwargs):
+        super().__init__(*args, outbound=outbound or AsyncOutbound(), **kwargs)
+
+    def answer_callback_query(self, *args, **kwargs):
+        return self.outbound.call('answer_callback_query', *args, **kwargs)
+
+    def edit_message_reply_markup(self, *args, **kwargs):
+        return self.outbound.call('edit_message_reply_markup', *args, **kwargs)
+
+    def send_document(self, *args, **kwargs):
+        # فایل تا پایان آپلود روی حلقه خوانده می‌شود؛ هندلر بعد از بازگشت آن را می‌بندد
+        return self.outbound.call('send_document', *args, **kwargs).result()
+
+
+async def poll_updates(bot, async_bot, timeout: int = 20, retry_delay: float = 3.0):
+    """Long-poll with ``async_bot`` and hand every batch to ``bot.process_new_updates``.
+
+    ``bot`` is the shared synchronous bot: flood control and the per-user
+    worker shards take it from there without blocking the loop.
+    """
+    while True:
+        try:
+            updates = await async_bot.get_updates(offset=bot.last_update_id + 1, timeout=timeout,
+                                                  request_timeout=timeout + 10)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning('get_updates_failed', error=type(e).__name__)
+            await asyncio.sleep(retry_delay)
+            continue
+        if updates:
+            bot.process_new_updates(updates)
@@ -0,0 +1,269 @@
+# src/utils/broadcast.py
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from config.settings import BROADCAST_CHUNK_SIZE, BROADCAST_RATE, BROADCAST_PROGRESS_INTERVAL
+from src.database.db_manager import Session
+from src.database.models import User, Broadcast, BroadcastFailure
+from src.utils.outbound import PRIORITY_ADMIN, PRIORITY_BULK
+from src.utils.ratelimit import TokenBucket
+from src.utils.log import get_logger
+from src.utils import metrics
+
+log = get_logger('broadcast')
+BROADCAST_MESSAGES = metrics.counter('visabot_broadcast_messages', 'Broadcast deliveries by outcome', ['outcome'])
+
+STATUS_LABELS = {
+    'running': '📣 Broadcasting',
+    'paused': '⏸ Broadcast paused',
+    'cancelled': '🛑 Broadcast cancelled',
+    'done': '✅ Broadcast finished',
+}
+
+
+def failure_reason(error: Exception) -> str:
+    if isinstance(error, ApiTelegramException):
+        if error.error_code == 403:
+            return 'blocked'  # ربات بلاک شده یا حساب کاربر حذف شده
+        if error.error_code == 400 and 'chat not found' in str(error.description).lower():
+            return 'not_found'
+    return 'error'
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+def progress_text(broadcast: Broadcast, rate: float = None) -> str:
+    processed = broadcast.sent + broadcast.failed
+    total = max(broadcast.total, processed)  # کاربرانی که وسط ارسال عضو شده‌اند هم دریافت می‌کنند
+    percent = processed * 100 // total if total else 100
+    lines = [
+        f"{STATUS_LABELS.get(broadcast.status, broadcast.status)} #{broadcast.id}",
+        f"Progress: {processed}/{total} ({percent}%)",
+        f"Sent: {broadcast.sent} · Failed: {broadcast.failed}",
+    ]
+    if broadcast.status == 'running' and rate:
+        lines.append(f"Rate: {rate:.1f} msg/s · ETA: {_format_duration((total - processed) / rate)}")
+    return "\n".join(lines)
+
+
+def progress_markup(broadcast: Broadcast):
+    if broadcast.status == 'running':
+        toggle = InlineKeyboardButton("⏸ Pause", callback_data=f"admin:broadcast_pause:{broadcast.id}")
+    elif broadcast.status == 'paused':
+        toggle = InlineKeyboardButton("▶ Resume", callback_data=f"admin:broadcast_resume:{broadcast.id}")
+    else:
+        return None
+    return InlineKeyboardMarkup().row(
+        toggle, InlineKeyboardButton("🛑 Cancel", callback_data=f"admin:broadcast_cancel:{broadcast.id}")
+    )
+
+
+class BroadcastEngine:
+    """Sends an announcement to every user from one background thread per broadcast.
+
+    Recipients are read by keyset over ``users.id``, ``chunk_size`` at a time
+    (never the whole table), and queued on the outbound dispatcher at bulk
+    priority, paced to ``rate`` msg/s so interactive replies keep flowing.
+    After each chunk the cursor, counters and failures are committed together;
+    ``resume_interrupted`` continues any broadcast left running by a restart
+    from its last checkpoint, so at most one chunk can be delivered twice.
+    """
+
+    def __init__(self, session_factory=Session, chunk_size: int = BROADCAST_CHUNK_SIZE,
+                 rate: float = BROADCAST_RATE, progress_interval: float = BROADCAST_PROGRESS_INTERVAL):
+        self.Session = session_factory
+        self.chunk_size = chunk_size
+        self.rate = rate
+        self.progress_interval = progress_interval
+        self._lock = threading.Lock()
+        self._threads = {}  # broadcast_id -> thread در حال ارسال
+
+    # ── DB ──
+    def create(self, admin_id: int, text: str, chat_id: int = None, message_id: int = None) -> int:
+        session = self.Session()
+        try:
+            total = session.scalar(select(func.count(User.id)).where(User.user_id.isnot(None)))
+            broadcast = Broadcast(admin_id=admin_id, text=text, status='running', total=total, sent=0, failed=0,
+                                  last_user_id=0, progress_chat_id=chat_id, progress_message_id=message_id)
+            session.add(broadcast)
+            session.commit()
+            return broadcast.id
+        finally:
+            session.close()
+
+    def get(self, broadcast_id: int):
+        session = self.Session()
+        try:
+            return session.get(Broadcast, broadcast_id)
+        finally:
+            session.close()
+
+    def _set_status(self, broadcast_id: int, status: str, from_statuses) -> bool:
+        values = {'status': status}
+        if status in ('cancelled', 'done'):
+            values['finished_at'] = datetime.utcnow()
+        session = self.Session()
+        try:
+            changed = session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status.in_(from_statuses))
+                .values(**values)
+            ).rowcount
+            session.commit()
+            return bool(changed)
+        finally:
+            session.close()
+
+    def _next_chunk(self, after_id: int):
+        session = self.Session()
+        try:
+            return session.execute(
+                select(User.id, User.user_id)
+                .where(User.id > after_id, User.user_id.isnot(None))
+                .order_by(User.id)
+                .limit(self.chunk_size)
+            ).all()
+        finally:
+            session.close()
+
+    def _checkpoint(self, broadcast_id: int, cursor: int, sent: int, failures: list):
+        session = self.Session()
+        try:
+            session.execute(
+                update(Broadcast).where(Broadcast.id == broadcast_id).values(
+                    last_user_id=cursor, sent=Broadcast.sent + sent, failed=Broadcast.failed + len(failures)
+                )
+            )
+            if failures:
+                # بعد از resume ممکن است یک chunk دوباره ارسال شود؛ خطای تکراری ثبت نمی‌شود
+                session.execute(insert(BroadcastFailure).on_conflict_do_nothing(), failures)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # ── کنترل ──
+    def start(self, bot, broadcast_id: int) -> bool:
+        """Start the sending thread unless one is already running for this broadcast."""
+        with self._lock:
+            if broadcast_id in self._threads:
+                return False
+            thread = threading.Thread(target=self._run, args=(bot, broadcast_id),
+                                      name=f'broadcast-{broadcast_id}', daemon=True)
+            self._threads[broadcast_id] = thread
+        thread.start()
+        return True
+
+    def pause(self, broadcast_id: int) -> bool:
+        """The thread stops after its current chunk (and checkpoint)."""
+        return self._set_status(broadcast_id, 'paused', ('running',))
+
+    def cancel(self, broadcast_id: int) -> bool:
+        return self._set_status(broadcast_id, 'cancelled', ('running', 'paused'))
+
+    def resume(self, bot, broadcast_id: int) -> bool:
+        if not self._set_status(broadcast_id, 'running', ('paused',)):
+            return False
+        self.start(bot, broadcast_id)  # اگر thread قبلی هنوز زنده است، خودش ادامه می‌دهد
+        return True
+
+    def resume_interrupted(self, bot) -> list:
+        """Restart every broadcast that was still running when the process stopped."""
+        session = self.Session()
+        try:
+            ids = session.scalars(select(Broadcast.id).where(Broadcast.status == 'running')).all()
+        finally:
+            session.close()
+        for broadcast_id in ids:
+            log.info('broadcast_resumed', broadcast_id=broadcast_id)
+            self.start(bot, broadcast_id)
+        return ids
+
+    def join(self, broadcast_id: int, timeout: float = None):
+        thread = self._threads.get(broadcast_id)
+        if thread is not None:
+            thread.join(timeout)
+
+    def report(self, bot, broadcast_id: int, rate: float = None):
+        """Edit the admin's progress message (fire-and-forget)."""
+        broadcast = self.get(broadcast_id)
+        if broadcast is None or broadcast.progress_chat_id is None:
+            return
+        bot.outbound.submit('edit_message_text', progress_text(broadcast, rate), broadcast.progress_chat_id,
+                            broadcast.progress_message_id, reply_markup=progress_markup(broadcast),
+                            priority=PRIORITY_ADMIN)
+
+    # ── ارسال ──
+    def _run(self, bot, broadcast_id: int):
+        try:
+            self._deliver(bot, broadcast_id)
+        except Exception:
+            log.exception('broadcast_crashed', broadcast_id=broadcast_id)
+            with self._lock:
+                self._threads.pop(broadcast_id, None)
+        self.report(bot, broadcast_id)
+
+    def _deliver(self, bot, broadcast_id: int):
+        bucket = TokenBucket(self.rate, self.rate)
+        started = time.monotonic()
+        last_report = started
+        processed = 0
+        while True:
+            # خروج و start() زیر یک قفل‌اند تا resume درست بعد از pause گم نشود
+            with self._lock:
+                broadcast = self.get(broadcast_id)
+                if broadcast is None or broadcast.status != 'running':
+                    self._threads.pop(broadcast_id, None)
+                    return
+            rows = self._next_chunk(broadcast.last_user_id)
+            if not rows:
+                if self._set_status(broadcast_id, 'done', ('running',)):
+                    log.info('broadcast_finished', broadcast_id=broadcast_id, sent=broadcast.sent,
+                             failed=broadcast.failed, seconds=round(time.monotonic() - started, 1))
+                continue
+
+            futures = []
+            for _, user_id in rows:
+                wait = bucket.delay()
+                if wait > 0:
+                    time.sleep(wait)
+                bucket.consume()
+                futures.append((user_id, bot.outbound.submit('send_message', user_id, broadcast.text,
+                                                             priority=PRIORITY_BULK)))
+            sent, failures = 0, []
+            for user_id, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    reason = failure_reason(e)
+                    failures.append({'broadcast_id': broadcast_id, 'user_id': user_id, 'reason': reason,
+                                     'error': str(e)[:500]})
+                    BROADCAST_MESSAGES.labels(reason).inc()
+                else:
+                    sent += 1
+            BROADCAST_MESSAGES.labels('sent').inc(sent)
+            self._checkpoint(broadcast_id, rows[-1][0], sent, failures)
+
+            processed += len(rows)
+            now = time.monotonic()
+            if now - last_report >= self.progress_interval:
+                last_report = now
+                self.report(bot, broadcast_id, processed / (now - started))
+
+
+broadcasts = BroadcastEngine()
@@ -0,0 +1,56 @@
+# src/utils/epochs.py
+import multiprocessing
+
+
+class EpochTable:
+    """Change counters in shared memory, for invalidating per-process caches.
+
+    A writer bumps the counter of what it changed after committing; a cached
+    entry remembers the counter it was loaded under and is stale once the two
+    differ. Reads are a single lock-free load from shared memory; bumps take
+    a cross-process lock. Create the table before starting worker processes
+    and hand ``shared()`` to each of them.
+    """
+
+    def __init__(self, slots: int, shared=None, ctx=multiprocessing):
+        if shared is None:
+            shared = (ctx.RawArray('Q', slots), ctx.Lock())
+        self._array, self._lock = shared
+        self.slots = slots
+        self._next = 0
+
+    def shared(self) -> tuple:
+        return self._array, self._lock
+
+    def region(self, size: int) -> 'EpochRegion':
+        """Allocate the next ``size`` slots; every process must allocate in the same order."""
+        if self._next + size > self.slots:
+            raise ValueError(f"Epoch table has {self.slots} slots, {self._next + size} requested")
+        region = EpochRegion(self, self._next, size)
+        self._next += size
+        return region
+
+    def read(self, slot: int) -> int:
+        return self._array[slot]
+
+    def bump(self, slot: int) -> int:
+        with self._lock:
+            self._array[slot] += 1
+            return self._array[slot]
+
+
+class EpochRegion:
+    """Slots of an EpochTable for one cache; keys are hashed onto ``size`` buckets."""
+
+    __slots__ = ('table', 'base', 'size')
+
+    def __init__(self, table: EpochTable, base: int, size: int):
+        self.table = table
+        self.base = base
+        self.size = size
+
+    def read(self, key: int = 0) -> int:
+        return self.table.read(self.base + key % self.size)
+
+    def bump(self, key: int = 0) -> int:
+        return self.table.bump(self.base + key % self.size)
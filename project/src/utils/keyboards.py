@@ -1,8 +1,42 @@
 # utils/keyboards.py
+from functools import lru_cache
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from config.settings import ADMIN_ID
 
-def main_menu_keyboard():
+
+class StaticKeyboard(InlineKeyboardMarkup):
+    """Immutable inline keyboard whose ``reply_markup`` JSON is serialized once."""
+
+    def __init__(self, markup: InlineKeyboardMarkup):
+        super().__init__(inline_keyboard=markup.keyboard, row_width=markup.row_width)
+        self._json = super().to_json()
+
+    def to_json(self):
+        return self._json
+
+    def add(self, *args, **kwargs):
+        raise TypeError("StaticKeyboard is shared and cannot be modified")
+
+    row = add
+
+
+# ── رجیستری کیبوردهای ثابت: یک بار در زمان ایمپورت ساخته می‌شوند ──
+_REGISTRY = {}
+
+
+def static_keyboard(name: str):
+    def decorator(builder):
+        _REGISTRY[name] = StaticKeyboard(builder())
+        return builder
+    return decorator
+
+
+def get_keyboard(name: str) -> StaticKeyboard:
+    return _REGISTRY[name]
+
+
+@static_keyboard('main_menu')
+def _build_main_menu():
     # Main menu as inline for callback-based navigation
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
@@ -16,7 +50,7 @@ def main_menu_keyboard():
     return markup
 
 
-def get_main_menu_markup(user_id: int) -> InlineKeyboardMarkup:
+def _build_start_menu(is_admin: bool):
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
         InlineKeyboardButton("Visa Card Order", callback_data="menu:visa_card"),
@@ -25,11 +59,17 @@ def get_main_menu_markup(user_id: int) -> InlineKeyboardMarkup:
         InlineKeyboardButton("Orders", callback_data="menu:orders"),
         InlineKeyboardButton("Support", callback_data="menu:support"),
     )
-    if user_id == ADMIN_ID:
+    if is_admin:
         markup.add(InlineKeyboardButton("Admin Panel", callback_data="admin:main"))
     return markup
 
-def wallet_menu_keyboard():
+
+static_keyboard('start_menu')(lambda: _build_start_menu(False))
+static_keyboard('start_menu_admin')(lambda: _build_start_menu(True))
+
+
+@static_keyboard('wallet_menu')
+def _build_wallet_menu():
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
         InlineKeyboardButton("Show Balance", callback_data="wallet:balance"),
@@ -40,19 +80,22 @@ def wallet_menu_keyboard():
     )
     return markup
 
-# Example inline for confirmation
-def confirm_keyboard(action: str):
+
+@static_keyboard('wallet_home')
+def _build_wallet_home():
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
-        InlineKeyboardButton("Yes", callback_data=f"confirm:{action}:yes"),
-        InlineKeyboardButton("No", callback_data=f"confirm:{action}:no")
+        InlineKeyboardButton("💳 نمایش موجودی", callback_data="wallet:balance"),
+        InlineKeyboardButton("🔋 شارژ کیف پول", callback_data="wallet:charge"),
+        InlineKeyboardButton("🔄 انتقال", callback_data="wallet:transfer"),
+        InlineKeyboardButton("📜 تاریخچه تراکنش‌ها", callback_data="wallet:transactions"),
+        InlineKeyboardButton("🔙 بازگشت به منوی اصلی", callback_data="menu:main")
     )
     return markup
 
 
-# utils/keyboards.py
-
-def visa_menu_keyboard():
+@static_keyboard('visa_menu')
+def _build_visa_menu():
     markup = InlineKeyboardMarkup(row_width=1)
     markup.add(
         InlineKeyboardButton("سفارش ویزاکارت", callback_data="visa:order"),
@@ -63,21 +106,88 @@ def visa_menu_keyboard():
     return markup
 
 
-def products_list_keyboard(products, page=1, per_page=5):
+@static_keyboard('admin_panel')
+def _build_admin_panel():
+    markup = InlineKeyboardMarkup(row_width=1)
+    markup.add(
+        InlineKeyboardButton("Product Settings", callback_data="admin:products"),
+        InlineKeyboardButton("Order Inbox", callback_data="admin:orders"),
+        InlineKeyboardButton("Broadcast", callback_data="admin:broadcast"),
+        InlineKeyboardButton("Back to Main Menu", callback_data="menu:main")
+    )
+    return markup
+
+
+@static_keyboard('admin_products')
+def _build_admin_products():
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(
+        InlineKeyboardButton("Add Product", callback_data="admin:add_product"),
+        InlineKeyboardButton("Edit Product", callback_data="admin:edit_product"),
+        InlineKeyboardButton("List Products", callback_data="admin:list_products"),
+        InlineKeyboardButton("Delete Product", callback_data="admin:delete_product"),
+        InlineKeyboardButton("Import Products", callback_data="admin:import_products"),
+    )
+    markup.row(
+        InlineKeyboardButton("Export CSV", callback_data="admin:export_products:csv"),
+        InlineKeyboardButton("Export JSON", callback_data="admin:export_products:json"),
+    )
+    markup.add(InlineKeyboardButton("Back to Admin Panel", callback_data="admin:main"))
+    return markup
+
+
+def main_menu_keyboard():
+    return _REGISTRY['main_menu']
+
+
+def get_main_menu_markup(user_id: int) -> InlineKeyboardMarkup:
+    return _REGISTRY['start_menu_admin' if user_id == ADMIN_ID else 'start_menu']
+
+
+def wallet_menu_keyboard():
+    return _REGISTRY['wallet_menu']
+
+
+def wallet_home_keyboard():
+    return _REGISTRY['wallet_home']
+
+
+def visa_menu_keyboard():
+    return _REGISTRY['visa_menu']
+
+
+def admin_panel_keyboard():
+    return _REGISTRY['admin_panel']
+
+
+def admin_products_keyboard():
+    return _REGISTRY['admin_products']
+
+
+# Example inline for confirmation
+@lru_cache(maxsize=128)
+def confirm_keyboard(action: str):
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(
+        InlineKeyboardButton("Yes", callback_data=f"confirm:{action}:yes"),
+        InlineKeyboardButton("No", callback_data=f"confirm:{action}:no")
+    )
+    return StaticKeyboard(markup)
+
+
+def products_list_keyboard(page_products, page=1, has_more=False):
+    """``page_products`` is one keyset page; cursors ride in the callback data."""
     markup = InlineKeyboardMarkup(row_width=1)
-    start = (page - 1) * per_page
-    end = start + per_page
-    page_products = products[start:end]
 
     for prod in page_products:
         markup.add(InlineKeyboardButton(prod.name, callback_data=f"visa:product:{prod.id}"))
 
-    # صفحه‌بندی
+    # صفحه‌بندی (visa:products:<جهت>:<شماره صفحه>:<cursor>)
     nav = []
-    if page > 1:
-        nav.append(InlineKeyboardButton("◀ Previous", callback_data=f"visa:products:{page-1}"))
-    if len(products) > end:
-        nav.append(InlineKeyboardButton("Next ▶", callback_data=f"visa:products:{page+1}"))
+    if page > 1 and page_products:
+        nav.append(InlineKeyboardButton("◀ Previous", callback_data=f"visa:products:p:{page-1}:{page_products[0].id}"))
+    if has_more and page_products:
+        nav.append(InlineKeyboardButton("Next ▶", callback_data=f"visa:products:n:{page+1}:{page_products[-1].id}"))
     if nav:
         markup.row(*nav)
 
@@ -85,11 +195,12 @@ def products_list_keyboard(products, page=1, per_page=5):
     return markup
 
 
+@lru_cache(maxsize=1024)
 def product_detail_keyboard(product_id):
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
         InlineKeyboardButton("Order Product", callback_data=f"visa:order_product:{product_id}"),  # ← این دکمه اصلی است
         InlineKeyboardButton("Guide", callback_data=f"visa:guide:{product_id}")
     )
-    markup.add(InlineKeyboardButton("Back to List", callback_data="visa:products:1"))
-    return markup
\ No newline at end of file
+    markup.add(InlineKeyboardButton("Back to List", callback_data="visa:products"))
+    return StaticKeyboard(markup)
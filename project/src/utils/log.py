@@ -0,0 +1,186 @@
+# src/utils/log.py
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from config.settings import LOG_LEVEL, LOG_FORMAT, LOG_CATEGORY_LEVELS, LOG_SAMPLE_RATES, LOG_QUEUE_SIZE
+
+ROOT = 'visabot'
+
+# فیلدهایی که هرگز نباید در لاگ ظاهر شوند (اطلاعات شخصی کاربر)
+REDACTED_FIELDS = frozenset({
+    'passport_file_id', 'verification_video_id', 'photo_file_id', 'file_id',
+    'full_name', 'address', 'mobile', 'text', 'caption',
+})
+
+
+def redact(fields: dict) -> dict:
+    return {k: (f"<redacted:{len(str(v))}>" if k in REDACTED_FIELDS and v is not None else v)
+            for k, v in fields.items()}
+
+
+class StructLogger:
+    """Key/value logger for one category (``visabot.<category>``).
+
+    ``log.info('order_saved', order_id=7)`` costs a level check and, for
+    sub-WARNING records, a sampling draw; formatting and the stdout write
+    happen on the listener thread. Sensitive fields are redacted here, before
+    the record leaves the calling thread.
+    """
+
+    __slots__ = ('category', 'logger', 'sample_rate')
+
+    def __init__(self, category: str, sample_rate: float = 1.0):
+        self.category = category
+        self.logger = logging.getLogger(f"{ROOT}.{category}")
+        self.sample_rate = sample_rate
+
+    def _log(self, level: int, event: str, fields: dict, exc_info=None):
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.logger.log(level, event, exc_info=exc_info,
+                        extra={'category': self.category, 'fields': redact(fields) if fields else {}})
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+def _format_value(value) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """``2024-01-01T12:00:00.123Z INFO handler message_received user_id=5 state=order_mobile``"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        ts = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+        category = getattr(record, 'category', record.name)
+        parts = [ts, record.levelname, category, record.getMessage()]
+        parts.extend(f"{k}={_format_value(v)}" for k, v in getattr(record, 'fields', {}).items())
+        line = ' '.join(parts)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': record.created,
+            'level': record.levelname,
+            'category': getattr(record, 'category', record.name),
+            'event': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: when the queue is full the record is dropped and counted."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # فرمت در ترد listener انجام می‌شود؛ اینجا فقط رکورد خام صف می‌شود
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_pairs(spec: str) -> dict:
+    """``'handler=WARNING,router=DEBUG'`` -> ``{'handler': 'WARNING', 'router': 'DEBUG'}``"""
+    pairs = {}
+    for item in filter(None, (s.strip() for s in spec.split(','))):
+        key, _, value = item.partition('=')
+        pairs[key.strip()] = value.strip()
+    return pairs
+
+
+_SAMPLE_RATES = {k: float(v) for k, v in _parse_pairs(LOG_SAMPLE_RATES).items()}
+_loggers = {}
+_listener = None
+_queue_handler = None
+
+
+def get_logger(category: str) -> StructLogger:
+    logger = _loggers.get(category)
+    if logger is None:
+        logger = _loggers[category] = StructLogger(category, _SAMPLE_RATES.get(category, 1.0))
+    return logger
+
+
+def set_sample_rate(category: str, rate: float):
+    _SAMPLE_RATES[category] = rate
+    get_logger(category).sample_rate = rate
+
+
+def set_level(category: str, level):
+    logging.getLogger(f"{ROOT}.{category}").setLevel(level)
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None, category_levels=LOG_CATEGORY_LEVELS):
+    """Route ``visabot.*`` records through a bounded queue to a background writer thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(level)
+    root.propagate = False
+    for category, category_level in _parse_pairs(category_levels).items():
+        set_level(category, category_level)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else KeyValueFormatter())
+
+    q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = _DroppingQueueHandler(q)
+    root.addHandler(_queue_handler)
+    _listener = QueueListener(q, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Flush pending records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger(ROOT).removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
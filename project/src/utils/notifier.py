@@ -0,0 +1,104 @@
+# src/utils/notifier.py
+import queue
+import threading
+import time
+from telebot.apihelper import ApiTelegramException
+from config.settings import NOTIFIER_MAX_ATTEMPTS, NOTIFIER_BACKOFF
+from src.utils.outbound import PRIORITY_ADMIN
+from src.utils.log import get_logger
+from src.utils import metrics
+
+log = get_logger('notifier')
+NOTIFICATIONS = metrics.counter('visabot_notifications', 'Background notification calls by outcome', ['outcome'])
+
+
+class Notification:
+    """An ordered batch of Bot API calls, e.g. a media group followed by its caption."""
+
+    __slots__ = ('calls', 'label', 'enqueued')
+
+    def __init__(self, calls, label: str = ''):
+        self.calls = calls
+        self.label = label
+        self.enqueued = time.monotonic()
+
+
+def api_call(method: str, *args, **kwargs):
+    return method, args, kwargs
+
+
+def _retryable(error: Exception) -> bool:
+    # 4xx (مثلاً file_id نامعتبر) با تکرار درست نمی‌شود؛ 429 و خطای شبکه را خود outbound تکرار کرده است
+    if isinstance(error, ApiTelegramException):
+        return error.error_code >= 500
+    return True
+
+
+class Notifier:
+    """Sends fire-and-forget notifications from a background thread.
+
+    Handlers call ``notify(...)`` and return immediately; the worker pushes
+    each call through the outbound queue in order, retrying transient
+    failures with exponential backoff. A call that still fails is logged and
+    the rest of the batch is sent anyway (the caption matters more than the
+    media).
+    """
+
+    _STOP = object()
+
+    def __init__(self, outbound, priority: int = PRIORITY_ADMIN, max_attempts: int = NOTIFIER_MAX_ATTEMPTS,
+                 backoff: float = NOTIFIER_BACKOFF, name: str = 'notifier'):
+        self.outbound = outbound
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def notify(self, *calls, label: str = ''):
+        """Queue ``api_call(...)`` tuples to be sent in order."""
+        self._queue.put(Notification(calls, label))
+
+    def join(self):
+        """Block until every queued notification has been handled."""
+        self._queue.join()
+
+    def stop(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                for method, args, kwargs in item.calls:
+                    self._send(item, method, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, item: Notification, method: str, args: tuple, kwargs: dict):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.outbound.submit(method, *args, priority=self.priority, **kwargs).result()
+            except Exception as e:
+                if attempt < self.max_attempts and _retryable(e):
+                    self.retried += 1
+                    NOTIFICATIONS.labels('retried').inc()
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                    continue
+                self.failed += 1
+                NOTIFICATIONS.labels('failed').inc()
+                log.error('notification_failed', label=item.label, method=method, attempts=attempt, error=str(e))
+                return
+            self.sent += 1
+            NOTIFICATIONS.labels('sent').inc()
+            return
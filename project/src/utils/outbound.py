@@ -0,0 +1,327 @@
+# src/utils/outbound.py
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.exceptions import ConnectionError, Timeout
+import telebot
+from telebot.apihelper import ApiTelegramException
+from telebot.types import Message
+from config.settings import (
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_SENDERS, OUTBOUND_MAX_RETRIES
+)
+from src.utils.ratelimit import TokenBucket
+from src.utils import metrics
+
+# اولویت‌ها: عدد کمتر زودتر ارسال می‌شود
+PRIORITY_USER = 0
+PRIORITY_ADMIN = 10
+PRIORITY_BULK = 20
+
+# جایگاه chat_id در آرگومان‌های متدهای TeleBot
+CHAT_ARG = {
+    'send_message': 0,
+    'send_photo': 0,
+    'send_video': 0,
+    'send_document': 0,
+    'send_media_group': 0,
+    'copy_message': 0,
+    'delete_message': 0,
+    'edit_message_text': 1,
+    'edit_message_caption': 1,
+    'edit_message_reply_markup': 0,
+}
+
+API_SECONDS = metrics.histogram('visabot_telegram_api_seconds', 'Telegram Bot API call latency', ['method'])
+API_CALLS = metrics.counter('visabot_telegram_api_calls', 'Telegram Bot API calls by outcome', ['method', 'outcome'])
+
+
+class OutboundJob:
+    __slots__ = ('priority', 'seq', 'method', 'args', 'kwargs', 'chat_id', 'future', 'attempts', 'not_before', 'queued_at')
+
+    def __init__(self, priority, seq, method, args, kwargs, chat_id):
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.chat_id = chat_id
+        self.future = Future()
+        self.attempts = 0
+        self.not_before = 0.0
+        self.queued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def _chat_id_of(method: str, args: tuple, kwargs: dict):
+    if 'chat_id' in kwargs:
+        return kwargs['chat_id']
+    index = CHAT_ARG.get(method)
+    if index is not None and len(args) > index:
+        return args[index]
+    return None
+
+
+class OutboundDispatcher:
+    """Rate-limited, prioritised queue in front of the Telegram Bot API.
+
+    A scheduler thread releases jobs under a global token bucket and one bucket
+    per chat; a small pool of sender threads performs the HTTP calls, with at
+    most one call in flight per chat so messages keep their order. A 429
+    pauses all sending for ``retry_after`` seconds and the job is retried.
+
+    ``sender(method, *args, **kwargs)`` performs the actual API call.
+    """
+
+    API_ERRORS = (ApiTelegramException,)
+    NETWORK_ERRORS = (ConnectionError, Timeout)
+
+    def __init__(self, sender, global_rate: float = OUTBOUND_GLOBAL_RATE,
+                 chat_rate: float = OUTBOUND_CHAT_RATE, chat_burst: float = OUTBOUND_CHAT_BURST,
+                 senders: int = OUTBOUND_SENDERS, max_retries: int = OUTBOUND_MAX_RETRIES,
+                 autostart: bool = True):
+        self.sender = sender
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.max_retries = max_retries
+
+        self._ready = []      # heap بر اساس (priority, seq)
+        self._delayed = []    # heap بر اساس (not_before, seq)
+        self._busy_chats = {}      # chat_id -> کارِ در حال ارسال؛ هر چت یک درخواست همزمان تا ترتیب حفظ شود
+        self._parked = {}          # chat_id -> کارهایی که منتظر تمام شدن درخواست قبلی همان چت هستند
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self._stopped = False
+        self._pool = ThreadPoolExecutor(max_workers=senders, thread_name_prefix='outbound-sender')
+        self._scheduler = None
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+
+        if autostart:
+            self.start()
+
+    # ── API ──
+    def submit(self, method: str, *args, priority: int = PRIORITY_USER, **kwargs) -> Future:
+        job = OutboundJob(priority, next(self._seq), method, args, kwargs, _chat_id_of(method, args, kwargs))
+        with self._cond:
+            heapq.heappush(self._ready, job)
+            self._cond.notify()
+        return job.future
+
+    def call(self, method: str, *args, priority: int = PRIORITY_USER, **kwargs):
+        """Queue a call and wait for its result (used for inline handler replies)."""
+        return self.submit(method, *args, priority=priority, **kwargs).result()
+
+    def start(self):
+        if self._scheduler is None:
+            self._scheduler = threading.Thread(target=self._run, name='outbound-scheduler', daemon=True)
+            self._scheduler.start()
+        return self
+
+    def stop(self, wait: bool = True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._scheduler is not None and wait:
+            self._scheduler.join()
+        self._pool.shutdown(wait=wait)
+
+    def set_global_rate(self, rate: float):
+        """Change the overall send rate (a worker process gets its share of the bot's limit)."""
+        with self._cond:
+            self.global_bucket = TokenBucket(rate, rate)
+            self._cond.notify()
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._ready) + len(self._delayed)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'queued': len(self._ready),
+                'delayed': len(self._delayed),
+                'in_flight': self.in_flight,
+                'sent': self.sent,
+                'failed': self.failed,
+                'retried': self.retried,
+                'rate_limited': self.rate_limited,
+                'avg_latency': self.total_latency / self.sent if self.sent else 0.0,
+                'paused_for': max(0.0, self._paused_until - time.monotonic()),
+            }
+
+    # ── زمان‌بندی ──
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                # باکت‌های پر اطلاعاتی ندارند؛ حذفشان معادل ساختن دوباره است
+                self.chat_buckets = {k: b for k, b in self.chat_buckets.items() if not b.is_full()}
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _next_job(self):
+        """Pop the next sendable job, waiting as needed. Returns None on stop."""
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    heapq.heappush(self._ready, heapq.heappop(self._delayed)[2])
+
+                wait = None
+                if self._paused_until > now:
+                    wait = self._paused_until - now
+                elif self._ready:
+                    job = self._ready[0]
+                    owner = self._busy_chats.get(job.chat_id)
+                    if owner is not None and owner is not job:
+                        heapq.heappop(self._ready)
+                        self._parked.setdefault(job.chat_id, []).append(job)
+                        continue
+                    bucket = self._chat_bucket(job.chat_id) if job.chat_id is not None else None
+                    chat_delay = bucket.delay() if bucket else 0.0
+                    if chat_delay > 0:
+                        # این چت فعلاً سهمیه ندارد؛ کارهای چت‌های دیگر جلو می‌افتند
+                        heapq.heappop(self._ready)
+                        job.not_before = now + chat_delay
+                        heapq.heappush(self._delayed, (job.not_before, job.seq, job))
+                        continue
+                    wait = self.global_bucket.delay()
+                    if wait <= 0:
+                        heapq.heappop(self._ready)
+                        self.global_bucket.consume()
+                        if bucket:
+                            bucket.consume()
+                            self._busy_chats[job.chat_id] = job
+                        self.in_flight += 1
+                        return job
+
+                if self._delayed:
+                    until_due = self._delayed[0][0] - now
+                    wait = until_due if wait is None else min(wait, until_due)
+                self._cond.wait(wait)
+        return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._launch(job)
+
+    def _launch(self, job: OutboundJob):
+        self._pool.submit(self._execute, job)
+
+    def _execute(self, job: OutboundJob):
+        job.attempts += 1
+        started = time.perf_counter()
+        try:
+            result = self.sender(job.method, *job.args, **job.kwargs)
+        except Exception as e:
+            self._settle(job, started, error=e)
+        else:
+            self._settle(job, started, result=result)
+
+    def _settle(self, job: OutboundJob, started: float, result=None, error=None):
+        """Finish the job, or schedule a retry for 429s and network errors."""
+        retry_in = None
+        outcome = 'ok'
+        if error is None:
+            self._finish(job, result=result)
+        elif isinstance(error, self.API_ERRORS):
+            outcome = 'rate_limited' if error.error_code == 429 else 'error'
+            if error.error_code == 429 and job.attempts <= self.max_retries:
+                retry_after = ((error.result_json or {}).get('parameters') or {}).get('retry_after', 1)
+                with self._cond:
+                    self.rate_limited += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                retry_in = 0.0
+            else:
+                self._finish(job, error=error)
+        elif isinstance(error, self.NETWORK_ERRORS):
+            outcome = 'network_error'
+            if job.attempts <= self.max_retries:
+                retry_in = min(2 ** job.attempts * 0.5, 30)
+            else:
+                self._finish(job, error=error)
+        else:
+            outcome = 'error'
+            self._finish(job, error=error)
+        API_SECONDS.labels(job.method).observe(time.perf_counter() - started)
+        API_CALLS.labels(job.method, outcome).inc()
+
+        if retry_in is not None:
+            with self._cond:
+                self.in_flight -= 1
+                self.retried += 1
+                job.not_before = time.monotonic() + retry_in
+                heapq.heappush(self._delayed, (job.not_before, job.seq, job))
+                self._cond.notify()
+
+    def _finish(self, job: OutboundJob, result=None, error=None):
+        with self._cond:
+            self.in_flight -= 1
+            if error is None:
+                self.sent += 1
+                self.total_latency += time.monotonic() - job.queued_at
+            else:
+                self.failed += 1
+            if job.chat_id is not None:
+                self._busy_chats.pop(job.chat_id, None)
+                for parked in self._parked.pop(job.chat_id, ()):
+                    heapq.heappush(self._ready, parked)
+                self._cond.notify()
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+
+
+class RateLimitedSendMixin:
+    """TeleBot mixin routing outgoing messages through an OutboundDispatcher.
+
+    The overridden methods keep their synchronous signatures (they wait for the
+    queued call), so handlers need no changes; fire-and-forget notifications can
+    use ``bot.outbound.submit(...)`` with a lower priority instead.
+    """
+
+    def __init__(self, *args, outbound: OutboundDispatcher = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outbound = outbound or OutboundDispatcher(self.send_direct)
+
+    def send_direct(self, method: str, *args, **kwargs):
+        """Call the underlying TeleBot method, bypassing the queue."""
+        return getattr(super(RateLimitedSendMixin, self), method)(*args, **kwargs)
+
+    def send_message(self, *args, **kwargs) -> Message:
+        return self.outbound.call('send_message', *args, **kwargs)
+
+    def send_photo(self, *args, **kwargs) -> Message:
+        return self.outbound.call('send_photo', *args, **kwargs)
+
+    def send_document(self, *args, **kwargs) -> Message:
+        return self.outbound.call('send_document', *args, **kwargs)
+
+    def send_media_group(self, *args, **kwargs):
+        return self.outbound.call('send_media_group', *args, **kwargs)
+
+    def edit_message_text(self, *args, **kwargs):
+        return self.outbound.call('edit_message_text', *args, **kwargs)
+
+    def delete_message(self, *args, **kwargs):
+        return self.outbound.call('delete_message', *args, **kwargs)
+
+
+class RateLimitedTeleBot(RateLimitedSendMixin, telebot.TeleBot):
+    pass
@@ -0,0 +1,41 @@
+# src/utils/ratelimit.py
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``capacity`` stored.
+
+    Not thread-safe on its own; callers hold their own lock.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'clock')
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Seconds until ``tokens`` are available (0.0 if available now); consumes nothing."""
+        self._refill(self.clock())
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        self._refill(self.clock())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def is_full(self) -> bool:
+        self._refill(self.clock())
+        return self.tokens >= self.capacity
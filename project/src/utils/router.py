@@ -0,0 +1,159 @@
+# src/utils/router.py
+import re
+import threading
+import time
+from telebot import TeleBot
+from telebot.types import CallbackQuery
+from config.settings import ADMIN_ID
+
+
+# تبدیل‌کننده‌های نوع پارامترها در الگوی کال‌بک
+CONVERTERS = {
+    'int': int,
+    'str': str,
+}
+
+# جداکننده‌ی بخش‌ها؛ دونقطه‌ی داخل <int:name> جداکننده نیست
+SEGMENT_SPLIT = re.compile(r':(?![^<]*>)')
+
+
+class Route:
+    """A compiled callback pattern such as ``admin:select_edit:<int:product_id>``."""
+
+    __slots__ = ('pattern', 'handler', 'prefix', 'params', 'admin_only', 'calls', 'errors', 'total_time')
+
+    def __init__(self, pattern: str, handler, admin_only: bool = False):
+        self.pattern = pattern
+        self.handler = handler
+        self.admin_only = admin_only
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+
+        prefix = []
+        params = []
+        for part in SEGMENT_SPLIT.split(pattern):
+            if part.startswith('<') and part.endswith('>'):
+                kind, _, name = part[1:-1].partition(':')
+                if not name:
+                    kind, name = 'str', kind
+                if kind not in CONVERTERS:
+                    raise ValueError(f"Unknown converter '{kind}' in pattern {pattern}")
+                params.append((name, CONVERTERS[kind]))
+            elif params:
+                raise ValueError(f"Literal segment after a parameter in pattern {pattern}")
+            else:
+                prefix.append(part)
+
+        self.prefix = tuple(prefix)
+        self.params = tuple(params)
+
+    def parse(self, args):
+        return {name: convert(value) for (name, convert), value in zip(self.params, args)}
+
+
+class CallbackRouter:
+    """Registry of callback routes; dispatch is one dict lookup per literal prefix length."""
+
+    def __init__(self):
+        self.routes = {}
+        self.prefix_lengths = ()
+        self.observers = []
+        self.loaders = {}
+        self._load_lock = threading.Lock()
+
+    def route(self, pattern: str, admin_only: bool = False):
+        def decorator(handler):
+            self.add_route(pattern, handler, admin_only)
+            return handler
+        return decorator
+
+    def add_route(self, pattern: str, handler, admin_only: bool = False):
+        route = Route(pattern, handler, admin_only)
+        key = (route.prefix, len(route.params))
+        if key in self.routes:
+            raise ValueError(f"Duplicate callback route: {pattern}")
+        self.routes[key] = route
+        self.prefix_lengths = tuple(sorted({len(p) for p, _ in self.routes}, reverse=True))
+        return route
+
+    def add_loader(self, prefix: str, loader):
+        """Call ``loader()``, which registers more routes, the first time data under ``prefix`` misses."""
+        self.loaders[tuple(prefix.split(':'))] = loader
+
+    def resolve(self, data: str):
+        """Return ``(route, kwargs)`` for callback data, or ``(None, None)``."""
+        parts = tuple(data.split(':'))
+        route, kwargs = self._lookup(parts)
+        if route is None and self.loaders:
+            # یک thread ماژول را ایمپورت می‌کند؛ بقیه پشت قفل منتظر ثبت مسیرهایش می‌مانند
+            with self._load_lock:
+                for length in range(len(parts), 0, -1):
+                    loader = self.loaders.get(parts[:length])
+                    if loader is not None:
+                        self._run_loader(loader)
+                        del self.loaders[parts[:length]]
+                route, kwargs = self._lookup(parts)
+        return route, kwargs
+
+    def _run_loader(self, loader):
+        before = set(self.routes)
+        try:
+            loader()
+        except BaseException:
+            # اگر ایمپورت وسط کار خطا دهد، مسیرهای نیمه‌ثبت‌شده برداشته می‌شوند
+            # تا تلاش بعدی (loader سر جایش می‌ماند) با «Duplicate callback route» نخورد
+            for key in set(self.routes) - before:
+                del self.routes[key]
+            self.prefix_lengths = tuple(sorted({len(p) for p, _ in self.routes}, reverse=True))
+            raise
+
+    def _lookup(self, parts: tuple):
+        for length in self.prefix_lengths:
+            if length > len(parts):
+                continue
+            route = self.routes.get((parts[:length], len(parts) - length))
+            if route is not None:
+                try:
+                    return route, route.parse(parts[length:])
+                except ValueError:
+                    return None, None
+        return None, None
+
+    def add_observer(self, observer):
+        """``observer(route, elapsed_seconds, error)`` is called after every dispatch."""
+        self.observers.append(observer)
+
+    def dispatch(self, bot: TeleBot, call: CallbackQuery) -> bool:
+        route, kwargs = self.resolve(call.data or '')
+        if route is None:
+            return False
+
+        if route.admin_only and call.from_user.id != ADMIN_ID:
+            bot.answer_callback_query(call.id, "Access denied", show_alert=True)
+            return True
+
+        error = None
+        started = time.perf_counter()
+        try:
+            route.handler(bot, call, **kwargs)
+        except Exception as e:
+            error = e
+            route.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            route.calls += 1
+            route.total_time += elapsed
+            for observer in self.observers:
+                observer(route, elapsed, error)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            route.pattern: {'calls': route.calls, 'errors': route.errors, 'total_time': route.total_time}
+            for route in self.routes.values()
+        }
+
+
+router = CallbackRouter()
@@ -0,0 +1,79 @@
+# src/utils/startup.py
+import threading
+import time
+from src.utils import metrics
+from src.utils.log import get_logger
+
+log = get_logger('bot')
+
+STARTUP_SECONDS = metrics.gauge('visabot_startup_seconds', 'Wall-clock seconds per startup phase', ['phase'])
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class StartupTimer:
+    """Wall-clock breakdown of process startup, up to the first handled update.
+
+    ``mark(phase)`` closes a phase at the current time; ``add(phase, seconds)``
+    accounts time spent out of line (handler modules imported on first use),
+    which the enclosing ``mark()`` then leaves out of its own phase.
+    ``report()`` logs ``startup_timing`` when the bot is about to fetch
+    updates, and ``first_update()`` logs ``first_update`` once one is handled.
+    """
+
+    def __init__(self, started: float = None, clock=time.perf_counter):
+        self.clock = clock
+        self.started = self._last = clock() if started is None else started
+        self.phases = {}
+        self._added = 0.0
+        self.ready_at = None
+        self.first_update_at = None
+        self._lock = threading.Lock()
+
+    def begin(self, started: float):
+        """Measure from ``started``, taken by the entry point before its first import."""
+        with self._lock:
+            self.started = self._last = started
+
+    def _account(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        STARTUP_SECONDS.labels(phase).set(self.phases[phase])
+
+    def mark(self, phase: str):
+        with self._lock:
+            now = self.clock()
+            self._account(phase, now - self._last - self._added)
+            self._last, self._added = now, 0.0
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self._account(phase, seconds)
+            self._added += seconds
+
+    def report(self, **fields) -> dict:
+        """Record the process as ready and log the phase breakdown (milliseconds)."""
+        with self._lock:
+            self.ready_at = self.clock()
+            breakdown = {f"{phase}_ms": _ms(seconds) for phase, seconds in self.phases.items()}
+            breakdown['total_ms'] = _ms(self.ready_at - self.started)
+            STARTUP_SECONDS.labels('total').set(self.ready_at - self.started)
+        log.info('startup_timing', **breakdown, **fields)
+        return breakdown
+
+    def first_update(self, kind: str):
+        """Log time-to-first-update; every later call is a single attribute check."""
+        if self.first_update_at is not None:
+            return
+        with self._lock:
+            if self.first_update_at is not None:
+                return
+            self.first_update_at = self.clock()
+            elapsed = self.first_update_at - self.started
+            STARTUP_SECONDS.labels('first_update').set(elapsed)
+        log.info('first_update', kind=kind, since_start_ms=_ms(elapsed),
+                 handlers_ms=_ms(self.phases.get('handlers', 0.0)))
+
+
+startup = StartupTimer()
@@ -1,71 +1,286 @@
 # src/utils/states.py
-from collections import defaultdict
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from config.settings import STATE_MAX_ENTRIES, STATE_TTL_SECONDS, STATE_HISTORY_LIMIT
+from src.utils.log import get_logger
 
+log = get_logger('state')
 
-user_states = defaultdict(dict)          # state فعلی
-user_history = defaultdict(list)        # تاریخچه stateها (stack)
-# ساختار: user_states[user_id] = {'state': str, 'data': dict}
-user_states = defaultdict(dict)
 
-def set_state(user_id: int, state: str, data: dict = None):
-    user_states[user_id]['state'] = state
-    if data is not None:
-        user_states[user_id]['data'] = data or {}
-    elif 'data' in user_states[user_id]:
-        user_states[user_id]['data'] = {}
+class StateRecord:
+    """وضعیت فعلی یک کاربر به همراه پشته‌ی برگشت (history)."""
 
-def get_state(user_id: int) -> str | None:
-    return user_states.get(user_id, {}).get('state')
+    __slots__ = ('state', 'data', 'history', 'touched')
 
-def get_state_data(user_id: int, key: str = None):
-    data = user_states.get(user_id, {}).get('data', {})
-    return data.get(key) if key else data
+    def __init__(self, state: str = None, data: dict = None):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.history = None  # deque، فقط وقتی لازم شد ساخته می‌شود
+        self.touched = 0.0
 
-def update_state_data(user_id: int, key: str, value):
-    if user_id in user_states and 'data' in user_states[user_id]:
-        user_states[user_id]['data'][key] = value
 
-def append_to_state_list(user_id: int, key: str, item):
-    data = get_state_data(user_id)
-    lst = data.get(key, [])
-    lst.append(item)
-    update_state_data(user_id, key, lst)
+class StateStore:
+    """Bounded LRU store of conversation state with idle TTL eviction.
 
-def clear_state(user_id: int):
-    user_states.pop(user_id, None)
-    
-    
+    Records are kept in least-recently-used order, so both capacity and TTL
+    eviction only ever look at the front of the dict. With a journal attached,
+    every mutation is logged before it is applied and survives a restart.
+    With a backend attached (multi-process mode) every mutated record is
+    also written through to storage shared by all worker processes.
+    """
 
+    def __init__(self, max_entries: int = STATE_MAX_ENTRIES, ttl: float = STATE_TTL_SECONDS,
+                 history_limit: int = STATE_HISTORY_LIMIT, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_limit = history_limit
+        self.clock = clock
+        self._records = OrderedDict()
+        self._lock = threading.RLock()
+        self.journal = None  # StateJournal؛ با attach_journal فعال می‌شود
+        self.backend = None  # SQLiteStateBackend؛ با attach_backend فعال می‌شود
+        self.ttl_evictions = 0
+        self.capacity_evictions = 0
 
-def set_state(user_id: int, state: str, data: dict = None):
-    # ذخیره state قبلی در history (اگر وجود داشت)
-    current = user_states.get(user_id, {})
-    if current.get('state'):
-        user_history[user_id].append(current)
+    def __len__(self):
+        return len(self._records)
 
-    # تنظیم state جدید
-    user_states[user_id]['state'] = state
-    user_states[user_id]['data'] = data or {}
+    # ── داخلی ──
+    def _expire(self, now: float):
+        records = self._records
+        while records:
+            user_id, record = next(iter(records.items()))
+            if now - record.touched < self.ttl:
+                break
+            del records[user_id]
+            self.ttl_evictions += 1
 
+    def _get(self, user_id: int, now: float):
+        record = self._records.get(user_id)
+        if record is None:
+            return None
+        if now - record.touched >= self.ttl:
+            del self._records[user_id]
+            self.ttl_evictions += 1
+            return None
+        record.touched = now
+        self._records.move_to_end(user_id)
+        return record
 
-def back_state(user_id: int):
-    """برگشت به state قبلی"""
-    if user_id in user_history and user_history[user_id]:
-        previous = user_history[user_id].pop()  # آخرین state رو برمی‌گردونیم
-        user_states[user_id] = previous
-        return previous['state'], previous.get('data', {})
-    return None, None
+    def _get_or_create(self, user_id: int, now: float):
+        record = self._get(user_id, now)
+        if record is None:
+            self._expire(now)
+            record = StateRecord()
+            record.touched = now
+            self._records[user_id] = record
+            while len(self._records) > self.max_entries:
+                evicted, _ = self._records.popitem(last=False)
+                self.capacity_evictions += 1
+                if self.backend is not None:
+                    self.backend.delete(evicted)
+        return record
 
+    def _apply(self, op: str, user_id: int, args, now: float):
+        """Apply one mutation; the single code path for live calls and journal replay."""
+        if op == 'clear':
+            self._records.pop(user_id, None)
+            return None
+        if op == 'set':
+            record = self._get_or_create(user_id, now)
+            # ذخیره state قبلی در history (اگر وجود داشت)
+            if record.state:
+                if record.history is None:
+                    record.history = deque(maxlen=self.history_limit)
+                record.history.append((record.state, record.data))
+            record.state, record.data = args[0], args[1] or {}
+            return None
+        record = self._get(user_id, now)
+        if record is None:
+            return None if op != 'back' else (None, None)
+        if op == 'update':
+            record.data[args[0]] = args[1]
+        elif op == 'append':
+            record.data.setdefault(args[0], []).append(args[1])
+        elif op == 'back':
+            if not record.history:
+                return None, None
+            record.state, record.data = record.history.pop()
+            return record.state, record.data
+        return None
 
-def clear_state(user_id: int):
-    user_states.pop(user_id, None)
-    user_history.pop(user_id, None)
+    def _mutate(self, op: str, user_id: int, args=()):
+        with self._lock:
+            journal = self.journal
+            if journal is not None:
+                # write-ahead: اول در journal، بعد در حافظه
+                if journal.append(time.time(), op, user_id, list(args)):
+                    self._schedule_compaction()
+            result = self._apply(op, user_id, args, self.clock())
+            if self.backend is not None:
+                self._write_through(user_id)
+            return result
+
+    def _write_through(self, user_id: int):
+        # کل رکورد نوشته می‌شود، پس نوشتنِ ناموفق با تغییر بعدی همان کاربر جبران می‌شود
+        record = self._records.get(user_id)
+        if record is None:
+            self.backend.delete(user_id)
+        else:
+            history = [list(h) for h in record.history] if record.history else None
+            self.backend.save(user_id, record.state, record.data, history, time.time())
+
+    # ── API ──
+    def set(self, user_id: int, state: str, data: dict = None):
+        self._mutate('set', user_id, (state, data))
+
+    def get(self, user_id: int):
+        with self._lock:
+            record = self._get(user_id, self.clock())
+            return record.state if record else None
+
+    def active(self, user_id: int) -> bool:
+        """True while the user is mid-conversation; a peek that neither refreshes nor evicts."""
+        with self._lock:
+            record = self._records.get(user_id)
+            return record is not None and record.state is not None and self.clock() - record.touched < self.ttl
+
+    def get_data(self, user_id: int) -> dict:
+        with self._lock:
+            record = self._get(user_id, self.clock())
+            return record.data if record else {}
+
+    def update_data(self, user_id: int, key: str, value):
+        self._mutate('update', user_id, (key, value))
+
+    def append_to_list(self, user_id: int, key: str, item):
+        self._mutate('append', user_id, (key, item))
+
+    def back(self, user_id: int):
+        return self._mutate('back', user_id)
+
+    def clear(self, user_id: int):
+        self._mutate('clear', user_id)
+
+    # ── journal ──
+    def attach_journal(self, journal) -> dict:
+        """Rebuild the store from ``journal`` (snapshot + replay), then journal every mutation.
+
+        Idle TTLs keep counting across the restart: replayed records are aged
+        by the wall-clock time since they were last written.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            snapshot, ops = journal.load()
+            wall, now = time.time(), self.clock()
+            self._records.clear()
+            if snapshot:
+                for user_id, state, data, history, touched in snapshot['records']:
+                    record = StateRecord(state, data)
+                    if history:
+                        record.history = deque([tuple(h) for h in history], maxlen=self.history_limit)
+                    record.touched = now - (wall - touched)
+                    self._records[user_id] = record
+            for _, written, op, user_id, args in ops:
+                self._apply(op, user_id, args, now - (wall - written))
+            self._expire(now)
+            self.journal = journal.open()
+        self.compact()  # بازیابی بعدی از یک snapshot تازه و journal خالی شروع می‌شود
+        stats = {'records': len(self._records), 'replayed': len(ops), 'seconds': time.perf_counter() - started}
+        log.info('state_recovered', **stats)
+        return stats
+
+    def attach_backend(self, backend, shard: int = 0, shards: int = 1) -> dict:
+        """Load this shard's records from ``backend``, then write every mutation through to it."""
+        started = time.perf_counter()
+        with self._lock:
+            wall, now = time.time(), self.clock()
+            self._records.clear()
+            for user_id, state, data, history, touched in backend.load(self.ttl, shard, shards):
+                record = StateRecord(state, data)
+                if history:
+                    record.history = deque([tuple(h) for h in history], maxlen=self.history_limit)
+                record.touched = now - (wall - touched)
+                self._records[user_id] = record
+            self.backend = backend
+        stats = {'records': len(self._records), 'shard': shard, 'seconds': time.perf_counter() - started}
+        log.info('state_loaded', **stats)
+        return stats
+
+    def _snapshot_payload(self, seq: int) -> str:
+        wall, now = time.time(), self.clock()
+        return json.dumps({'seq': seq, 'records': [
+            [user_id, r.state, r.data, list(r.history) if r.history else None, wall - (now - r.touched)]
+            for user_id, r in self._records.items()
+        ]}, ensure_ascii=False, separators=(',', ':'), default=str)
+
+    def compact(self, wait: bool = True) -> bool:
+        """Snapshot the store and truncate the journal; False if another compaction is running."""
+        journal = self.journal
+        if journal is None or not journal.compacting.acquire(blocking=wait):
+            return False
+        try:
+            with self._lock:
+                # فقط serialize زیر قفل است؛ نوشتن روی دیسک بیرون از آن
+                payload = self._snapshot_payload(journal.rotate())
+            journal.write_snapshot(payload)
+            return True
+        except Exception:
+            log.exception('state_compaction_failed')
+            return False
+        finally:
+            journal.compacting.release()
+
+    def _schedule_compaction(self):
+        threading.Thread(target=self.compact, args=(False,), name='state-compaction', daemon=True).start()
+
+    def sweep(self) -> int:
+        """Drop every idle record; returns how many were evicted."""
+        with self._lock:
+            before = self.ttl_evictions
+            self._expire(self.clock())
+            return self.ttl_evictions - before
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._records),
+                'max_entries': self.max_entries,
+                'ttl_evictions': self.ttl_evictions,
+                'capacity_evictions': self.capacity_evictions,
+            }
+
+
+store = StateStore()
+
+
+def set_state(user_id: int, state: str, data: dict = None):
+    store.set(user_id, state, data)
 
 
 def get_state(user_id: int) -> str | None:
-    return user_states.get(user_id, {}).get('state')
+    return store.get(user_id)
 
 
 def get_state_data(user_id: int, key: str = None):
-    data = user_states.get(user_id, {}).get('data', {})
-    return data.get(key) if key else data
\ No newline at end of file
+    data = store.get_data(user_id)
+    return data.get(key) if key else data
+
+
+def update_state_data(user_id: int, key: str, value):
+    store.update_data(user_id, key, value)
+
+
+def append_to_state_list(user_id: int, key: str, item):
+    store.append_to_list(user_id, key, item)
+
+
+def back_state(user_id: int):
+    """برگشت به state قبلی"""
+    return store.back(user_id)
+
+
+def clear_state(user_id: int):
+    store.clear(user_id)
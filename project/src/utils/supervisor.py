@@ -0,0 +1,161 @@
+# src/utils/supervisor.py
+import multiprocessing
+import os
+import signal
+import threading
+import telebot
+from config.settings import EPOCH_BUCKETS, PROCESS_QUEUE_SIZE, OUTBOUND_GLOBAL_RATE, METRICS_HOST, METRICS_PORT
+from src.utils.epochs import EpochTable
+from src.utils.flood import FloodControlMixin
+from src.utils.outbound import RateLimitedSendMixin
+from src.utils.workers import update_user_id
+from src.utils.log import get_logger
+
+log = get_logger('supervisor')
+
+# یک slot برای کاتالوگ، و برای کاربران و موجودی‌ها هر کدام EPOCH_BUCKETS سطل
+EPOCH_SLOTS = 1 + 2 * EPOCH_BUCKETS
+
+
+def share_caches(table: EpochTable):
+    """Put every per-process cache on the shared epoch table (same layout in every process)."""
+    from src.database.catalog import catalog
+    from src.database.users import users
+    from src.database.ledger import ledger
+    catalog.epochs = table.region(1)
+    users.epochs = table.region(EPOCH_BUCKETS)
+    ledger.cache.epochs = table.region(EPOCH_BUCKETS)
+
+
+class ProcessShardedTeleBot(telebot.TeleBot):
+    """TeleBot that runs no handlers: updates are sharded by user id onto worker-process queues.
+
+    A user's updates always reach the same worker, in order, so that worker's
+    in-memory wizard state is authoritative for them.
+    """
+
+    def __init__(self, token: str, queues, **kwargs):
+        kwargs['threaded'] = False
+        super().__init__(token, **kwargs)
+        self.queues = queues
+
+    def process_new_updates(self, updates):
+        batches = {}
+        for update in updates:
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+            batches.setdefault(update_user_id(update) % len(self.queues), []).append(update)
+        for index, batch in batches.items():
+            # صف پر یعنی worker عقب است؛ دریافت آپدیت تا خالی شدنش صبر می‌کند
+            self.queues[index].put(batch)
+
+
+def send_rate_share(workers: int) -> float:
+    """One process's share of OUTBOUND_GLOBAL_RATE: every worker and the ingest process send."""
+    return OUTBOUND_GLOBAL_RATE / (workers + 1)
+
+
+class IngestBot(FloodControlMixin, RateLimitedSendMixin, ProcessShardedTeleBot):
+    """The supervisor's bot: fetches updates, drops floods, hands the rest to the workers."""
+
+    def __init__(self, token: str, queues, **kwargs):
+        super().__init__(token, queues, **kwargs)
+        # پاسخ‌های flood control هم از سهم همان محدودیت سراسری است
+        self.outbound.set_global_rate(send_rate_share(len(queues)))
+
+
+def worker_main(index: int, count: int, updates, shared_epochs):
+    """Body of one worker process: the whole bot of main.py except fetching updates.
+
+    Each worker has its own DB connections, its share of the outbound send
+    rate, and the conversation state of its users, loaded from (and written
+    through to) the shared state backend.
+    """
+    # Ctrl-C به کل گروه پروسه می‌رسد؛ توقف workerها را supervisor به ترتیب انجام می‌دهد
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import main
+    from src.database.state_backend import SQLiteStateBackend
+    from src.utils.broadcast import broadcasts
+    from src.utils.log import setup_logging
+    from src.utils.startup import startup
+    from src.utils import metrics
+
+    setup_logging()
+    share_caches(EpochTable(EPOCH_SLOTS, shared=shared_epochs))
+    main.bot.outbound.set_global_rate(send_rate_share(count))
+    main.store.attach_backend(SQLiteStateBackend(), index, count)
+    if METRICS_PORT:
+        metrics.MetricsServer(METRICS_HOST, METRICS_PORT + 1 + index).start()
+    if index == 0:
+        broadcasts.resume_interrupted(main.bot)
+    startup.mark('services')
+    startup.report(worker=index)
+    # flood control در پروسه‌ی دریافت انجام شده؛ اینجا مستقیم به shardها/هندلرها
+    dispatch = super(FloodControlMixin, main.bot).process_new_updates
+    log.info('worker_started', worker=index, pid=os.getpid())
+    while True:
+        batch = updates.get()
+        if batch is None:
+            break
+        dispatch(batch)
+    if hasattr(main.bot, 'executor'):
+        main.bot.executor.join()
+    main.admin_notifier.join()
+    log.info('worker_stopped', worker=index)
+
+
+class Supervisor:
+    """Runs ``num_workers`` worker processes, each fed by its own IPC queue, and restarts any that die.
+
+    Workers are started with ``spawn`` so none inherits this process's
+    threads or DB connections. Everything they share lives on this box: the
+    SQLite files, the queues and the epoch table in shared memory.
+    """
+
+    def __init__(self, num_workers: int, queue_size: int = PROCESS_QUEUE_SIZE, target=worker_main,
+                 check_interval: float = 1.0):
+        self.ctx = multiprocessing.get_context('spawn')
+        self.epochs = EpochTable(EPOCH_SLOTS, ctx=self.ctx)
+        self.queues = [self.ctx.Queue(maxsize=queue_size) for _ in range(num_workers)]
+        self.target = target
+        self.check_interval = check_interval
+        self.processes = [None] * num_workers
+        self.restarts = 0
+        self._stopping = threading.Event()
+        self._watcher = None
+
+    def _spawn(self, index: int):
+        process = self.ctx.Process(target=self.target, name=f"bot-worker-{index}",
+                                   args=(index, len(self.queues), self.queues[index], self.epochs.shared()))
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(len(self.queues)):
+            self._spawn(index)
+        self._watcher = threading.Thread(target=self._watch, name='supervisor-watch', daemon=True)
+        self._watcher.start()
+        return self
+
+    def _watch(self):
+        while not self._stopping.wait(self.check_interval):
+            for index, process in enumerate(self.processes):
+                if not process.is_alive() and not self._stopping.is_set():
+                    # صف همان worker باقی است؛ پروسه‌ی جدید از آپدیت بعدی ادامه می‌دهد
+                    log.error('worker_died', worker=index, exitcode=process.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def stop(self, timeout: float = 30.0):
+        """Let every worker finish its queue, then wait for it to exit."""
+        self._stopping.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        for q in self.queues:
+            q.put(None)
+        for index, process in enumerate(self.processes):
+            process.join(timeout)
+            if process.is_alive():
+                log.warning('worker_killed', worker=index)
+                process.terminate()
+                process.join()
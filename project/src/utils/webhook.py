@@ -0,0 +1,79 @@
+# src/utils/webhook.py
+import hmac
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from telebot.types import Update
+from src.utils.log import get_logger
+
+log = get_logger('webhook')
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Acknowledges Telegram's POST immediately, then hands the Update to the dispatcher."""
+
+    def do_POST(self):
+        server = self.server
+        if self.path != server.webhook_path:
+            self.send_error(404)
+            return
+
+        token = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if server.secret and not hmac.compare_digest(token, server.secret):
+            self.send_error(403)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+
+        # پاسخ فوری؛ پردازش آپدیت منتظر هندلرها نمی‌ماند
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+        try:
+            update = Update.de_json(json.loads(body))
+        except (ValueError, TypeError, KeyError) as e:
+            log.warning('invalid_update_payload', error=str(e), size=length)
+            return
+        server.received += 1
+        server.on_update(update)
+
+    def do_GET(self):
+        self.send_error(405)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookServer(HTTPServer):
+    """Single-threaded HTTP endpoint for Telegram webhooks.
+
+    Requests are served one at a time, so updates reach ``on_update`` in the
+    order Telegram delivered them; the handler only acks and enqueues, so this
+    is not a bottleneck. TLS is expected to be terminated by a reverse proxy.
+    """
+
+    def __init__(self, host: str, port: int, path: str, on_update, secret: str = ''):
+        super().__init__((host, port), WebhookHandler)
+        self.webhook_path = path
+        self.secret = secret
+        self.on_update = on_update
+        self.received = 0
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in a background thread (used by tests and embedded runs)."""
+        self._thread = threading.Thread(target=self.serve_forever, name='webhook', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
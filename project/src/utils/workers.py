@@ -0,0 +1,136 @@
+# src/utils/workers.py
+import queue
+import threading
+import time
+import telebot
+from telebot.types import Update
+from src.utils.log import get_logger
+
+log = get_logger('worker')
+
+
+class ShardStats:
+    __slots__ = ('processed', 'errors', 'busy_time', 'max_latency', 'wait_time')
+
+    def __init__(self):
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0    # زمان اجرای هندلرها
+        self.wait_time = 0.0    # زمان انتظار در صف
+        self.max_latency = 0.0  # بیشترین (انتظار + اجرا)
+
+
+class ShardedExecutor:
+    """Runs ``handler(item)`` on N worker threads, one FIFO queue per shard.
+
+    Items submitted with the same key always land on the same shard, so they
+    are processed strictly in submission order; different keys run in parallel.
+    """
+
+    _STOP = object()
+
+    def __init__(self, num_shards: int, handler, name: str = 'shard'):
+        self.num_shards = num_shards
+        self.handler = handler
+        self.queues = [queue.Queue() for _ in range(num_shards)]
+        self.shard_stats = [ShardStats() for _ in range(num_shards)]
+        self.threads = [
+            threading.Thread(target=self._run, args=(i,), name=f"{name}-{i}", daemon=True)
+            for i in range(num_shards)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key: int, item):
+        self.queues[key % self.num_shards].put((item, time.perf_counter()))
+
+    def _run(self, index: int):
+        q = self.queues[index]
+        stats = self.shard_stats[index]
+        while True:
+            entry = q.get()
+            try:
+                if entry is self._STOP:
+                    return
+                item, enqueued = entry
+                started = time.perf_counter()
+                try:
+                    self.handler(item)
+                except Exception as e:
+                    stats.errors += 1
+                    log.exception('handler_failed', shard=index, error=type(e).__name__)
+                finished = time.perf_counter()
+                stats.processed += 1
+                stats.wait_time += started - enqueued
+                stats.busy_time += finished - started
+                stats.max_latency = max(stats.max_latency, finished - enqueued)
+            finally:
+                q.task_done()
+
+    def join(self):
+        """Block until every submitted item has been processed."""
+        for q in self.queues:
+            q.join()
+
+    def shutdown(self, wait: bool = True):
+        for q in self.queues:
+            q.put(self._STOP)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    def stats(self) -> list:
+        result = []
+        for index, (q, s) in enumerate(zip(self.queues, self.shard_stats)):
+            result.append({
+                'shard': index,
+                'queue_depth': q.qsize(),
+                'processed': s.processed,
+                'errors': s.errors,
+                'avg_wait': s.wait_time / s.processed if s.processed else 0.0,
+                'avg_busy': s.busy_time / s.processed if s.processed else 0.0,
+                'max_latency': s.max_latency,
+            })
+        return result
+
+
+def update_user_id(update: Update) -> int:
+    """Shard key of an update: the sender's id, falling back to the chat id."""
+    for kind in ('message', 'edited_message', 'callback_query', 'inline_query',
+                 'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'my_chat_member'):
+        obj = getattr(update, kind, None)
+        if obj is None:
+            continue
+        user = getattr(obj, 'from_user', None)
+        if user is not None:
+            return user.id
+        chat = getattr(obj, 'chat', None)
+        if chat is not None:
+            return chat.id
+    return 0
+
+
+class ShardedTeleBot(telebot.TeleBot):
+    """TeleBot whose updates are sharded by user id across a worker pool.
+
+    Each user's updates stay strictly ordered (the order wizard relies on it)
+    while different users are handled concurrently.
+    """
+
+    def __init__(self, token: str, num_workers: int = 4, **kwargs):
+        kwargs['threaded'] = False
+        super().__init__(token, **kwargs)
+        self.executor = ShardedExecutor(num_workers, self._process_update, name='update-worker')
+
+    def process_new_updates(self, updates):
+        for update in updates:
+            # offset باید همین‌جا جلو برود، وگرنه getUpdates بعدی تکراری برمی‌گرداند
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+            self.executor.submit(update_user_id(update), update)
+
+    def _process_update(self, update: Update):
+        super().process_new_updates([update])
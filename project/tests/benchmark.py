@@ -0,0 +1,328 @@
+# tests/benchmark.py
+"""In-process benchmark: drives the real handlers in main.py with synthetic updates.
+
+Run with ``python -m tests.benchmark [--iterations N] [--scenario NAME] [--json]``.
+A stub TeleBot records every API call instead of talking to Telegram, and the
+bot runs on a throw-away SQLite file.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+
+os.environ.setdefault('BOT_TOKEN', '123456:BENCHMARK')
+os.environ.setdefault('ADMIN_ID', '1000')
+os.environ.setdefault('DB_PATH', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='visabot-bench-'), 'bench.db'))
+
+import telebot
+from telebot import types
+
+
+class StubOutbound:
+    """Stand-in for OutboundDispatcher: runs queued calls inline on the stub."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def submit(self, method, *args, priority=0, **kwargs):
+        future = Future()
+        future.set_result(getattr(self.bot, method)(*args, **kwargs))
+        return future
+
+    def call(self, method, *args, priority=0, **kwargs):
+        return getattr(self.bot, method)(*args, **kwargs)
+
+    def queue_depth(self):
+        return 0
+
+
+class StubBot(telebot.TeleBot):
+    """TeleBot that records outgoing API calls instead of performing them."""
+
+    def __init__(self):
+        super().__init__(os.environ['BOT_TOKEN'], threaded=False)
+        self.calls = []
+        self.outbound = StubOutbound(self)
+        self._message_ids = itertools.count(1000)
+
+    def _record(self, method, chat_id, kwargs):
+        markup = kwargs.get('reply_markup')
+        if markup is not None and hasattr(markup, 'to_json'):
+            markup.to_json()  # هزینه‌ی serialize مثل ارسال واقعی حساب شود
+        self.calls.append((method, chat_id, kwargs))
+        return types.Message.de_json({
+            'message_id': next(self._message_ids), 'date': 0,
+            'chat': {'id': chat_id or 0, 'type': 'private'}, 'text': kwargs.get('text', '')
+        })
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self._record('send_message', chat_id, dict(kwargs, text=text))
+
+    def reply_to(self, message, text, **kwargs):
+        return self._record('send_message', message.chat.id, dict(kwargs, text=text))
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return self._record('edit_message_text', chat_id, dict(kwargs, text=text))
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        return self._record('send_photo', chat_id, kwargs)
+
+    def send_document(self, chat_id, document, **kwargs):
+        return self._record('send_document', chat_id, kwargs)
+
+    def send_media_group(self, chat_id, media, **kwargs):
+        return [self._record('send_media_group', chat_id, kwargs)]
+
+    def delete_message(self, chat_id, message_id, **kwargs):
+        self.calls.append(('delete_message', chat_id, kwargs))
+        return True
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self.calls.append(('answer_callback_query', None, dict(kwargs, text=text)))
+        return True
+
+    def last_markup(self):
+        for method, _, kwargs in reversed(self.calls):
+            if kwargs.get('reply_markup') is not None:
+                return kwargs['reply_markup']
+        return None
+
+
+# ── ساخت آپدیت‌های مصنوعی ──
+_ids = itertools.count(1)
+
+
+def _user(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}", 'username': f"user{user_id}"}
+
+
+def make_message(user_id, text=None, photo=False, video=False):
+    data = {'message_id': next(_ids), 'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'}, 'from': _user(user_id)}
+    if text is not None:
+        data['text'] = text
+    if photo:
+        data['photo'] = [{'file_id': f"photo-{user_id}", 'file_unique_id': 'p', 'width': 800, 'height': 600}]
+    if video:
+        data['video'] = {'file_id': f"video-{user_id}", 'file_unique_id': 'v', 'width': 640, 'height': 480, 'duration': 5}
+    return types.Message.de_json(data)
+
+
+def make_callback(user_id, data):
+    return types.CallbackQuery.de_json({
+        'id': str(next(_ids)), 'from': _user(user_id), 'chat_instance': 'bench', 'data': data,
+        'message': {'message_id': next(_ids), 'date': 0, 'chat': {'id': user_id, 'type': 'private'},
+                    'from': _user(1), 'text': 'menu'},
+    })
+
+
+def callback_data_of(markup, prefix):
+    """First callback_data in ``markup`` starting with ``prefix``."""
+    for row in markup.keyboard:
+        for button in row:
+            if button.callback_data and button.callback_data.startswith(prefix):
+                return button.callback_data
+    return None
+
+
+# ── سناریوها ──
+class Harness:
+    def __init__(self):
+        import main
+        from src.database.db_manager import Session
+        from src.database.catalog import catalog
+        self.main = main
+        self.Session = Session
+        self.catalog = catalog
+        from src.utils.notifier import Notifier
+        self.bot = StubBot()
+        main.bot = self.bot
+        main.admin_notifier = Notifier(self.bot.outbound, backoff=0, name='bench-notifier')
+        self.admin_id = main.ADMIN_ID
+        self._user_ids = itertools.count(10_000)
+
+    def drain(self):
+        """Wait for background admin notifications to reach the stub."""
+        self.main.admin_notifier.join()
+
+    def new_user(self):
+        return next(self._user_ids)
+
+    def message(self, message):
+        self.main.text_or_media_handler(message)
+
+    def callback(self, user_id, data):
+        self.main.callback_handler(make_callback(user_id, data))
+
+    def seed_products(self, count):
+        from src.database.models import Product
+        session = self.Session()
+        try:
+            existing = session.query(Product).count()
+            for i in range(existing, count):
+                session.add(Product(code=f"BENCH-{i:04d}", name=f"Bench card {i}", price=1_000_000 + i,
+                                    description_text="Synthetic product"))
+            session.commit()
+        finally:
+            session.close()
+        self.catalog.invalidate()
+        return [p.id for p in self.catalog.all()]
+
+    def seed_transactions(self, user_id, count):
+        from src.database.models import Transaction, TransactionType, TransactionStatus
+        session = self.Session()
+        try:
+            session.add_all(
+                Transaction(user_id=user_id, type=TransactionType.deposit, amount=1000 + i,
+                            description=f"bench {i}", status=TransactionStatus.confirmed)
+                for i in range(count)
+            )
+            session.commit()
+        finally:
+            session.close()
+
+
+def scenario_catalog_browse(h, record):
+    """Visa menu -> product list -> next page -> product detail -> back to list."""
+    product_ids = h.seed_products(30)
+    user_id = h.new_user()
+
+    def step(data):
+        started = time.perf_counter()
+        h.callback(user_id, data)
+        record(time.perf_counter() - started)
+
+    step('menu:visa_card')
+    step('visa:order')
+    next_page = callback_data_of(h.bot.last_markup(), 'visa:products:n:')
+    if next_page:
+        step(next_page)
+    step(f"visa:product:{product_ids[len(product_ids) // 2]}")
+    step('visa:products')
+
+
+def scenario_order_wizard(h, record):
+    """Full order wizard: product pick, five text/media steps and the deposit hash."""
+    product_id = h.seed_products(30)[0]
+    user_id = h.new_user()
+
+    def timed(fn, *args):
+        started = time.perf_counter()
+        fn(*args)
+        record(time.perf_counter() - started)
+
+    timed(h.callback, user_id, f"visa:order_product:{product_id}")
+    timed(h.message, make_message(user_id, 'John Smith'))
+    timed(h.message, make_message(user_id, '221B Baker Street, London'))
+    timed(h.message, make_message(user_id, '09121234567'))
+    timed(h.message, make_message(user_id, photo=True))
+    timed(h.message, make_message(user_id, video=True))
+    timed(h.message, make_message(user_id, f"0x{user_id:064x}"))
+
+
+def scenario_wallet_history(h, record):
+    """First page of a heavy user's wallet history, then page forward four times."""
+    user_id = h.new_user()
+    h.seed_transactions(user_id, 500)
+    data = 'wallet:transactions'
+    for _ in range(5):
+        started = time.perf_counter()
+        h.callback(user_id, data)
+        record(time.perf_counter() - started)
+        data = callback_data_of(h.bot.last_markup(), 'wallet:transactions:n:')
+        if not data:
+            break
+
+
+def scenario_admin_product_add(h, record):
+    """Admin add-product wizard: photo, name, price, two descriptions, /done."""
+    admin_id = h.admin_id
+
+    def timed(fn, *args):
+        started = time.perf_counter()
+        fn(*args)
+        record(time.perf_counter() - started)
+
+    timed(h.callback, admin_id, 'admin:add_product')
+    timed(h.message, make_message(admin_id, photo=True))
+    timed(h.message, make_message(admin_id, 'Benchmark Gold'))
+    timed(h.message, make_message(admin_id, '2500000'))
+    timed(h.message, make_message(admin_id, 'Line one'))
+    timed(h.message, make_message(admin_id, 'Line two'))
+    timed(h.message, make_message(admin_id, '/done'))
+
+
+SCENARIOS = {
+    'catalog_browse': scenario_catalog_browse,
+    'order_wizard': scenario_order_wizard,
+    'wallet_history': scenario_wallet_history,
+    'admin_product_add': scenario_admin_product_add,
+}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def run(iterations=100, scenarios=None, harness=None, warmup=3):
+    """Run each scenario ``iterations`` times; returns ``{name: stats}`` (times in ms)."""
+    harness = harness or Harness()
+    results = {}
+    for name in scenarios or SCENARIOS:
+        fn = SCENARIOS[name]
+        samples = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(warmup):
+                fn(harness, lambda _: None)
+            calls_before = len(harness.bot.calls)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn(harness, samples.append)
+            elapsed = time.perf_counter() - started
+            harness.drain()
+        samples.sort()
+        results[name] = {
+            'iterations': iterations,
+            'updates': len(samples),
+            'api_calls': len(harness.bot.calls) - calls_before,
+            'throughput': len(samples) / elapsed if elapsed else 0.0,  # آپدیت در ثانیه
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'max_ms': (samples[-1] if samples else 0.0) * 1000,
+        }
+    return results
+
+
+def format_results(results) -> str:
+    lines = [f"{'scenario':<20}{'updates':>9}{'upd/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+    for name, r in results.items():
+        lines.append(f"{name:<20}{r['updates']:>9}{r['throughput']:>10.1f}"
+                     f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args(argv)
+
+    from src.database.db_manager import init_db
+    init_db()
+    results = run(args.iterations, args.scenario)
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# tests/benchmark_ledger.py
+"""Concurrency/throughput benchmark for the wallet ledger.
+
+Run with ``python -m tests.benchmark_ledger [--threads N] [--ops N] [--users N]``.
+Worker threads post random transfers (plus some deposits) between a pool of
+wallets on a throw-away SQLite file, then the run checks that no money was
+created or lost and that every wallet equals the sum of its ledger rows.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from tests.benchmark import percentile
+from src.database.db_manager import create_db_engine
+from src.database.migrations import migrate
+from src.database.ledger import Ledger, InsufficientFunds
+from src.database.models import Transaction, TransactionType, Wallet
+
+INITIAL_BALANCE = 1_000_000
+
+
+def make_ledger(path: str = None):
+    path = path or os.path.join(tempfile.mkdtemp(prefix='visabot-ledger-'), 'ledger.db')
+    engine = create_db_engine(f"sqlite:///{path}")
+    migrate(engine)
+    return Ledger(sessionmaker(bind=engine)), engine
+
+
+def check_invariants(ledger: Ledger, engine, users: int, deposits: float) -> dict:
+    session = ledger.Session()
+    try:
+        total = session.scalar(select(func.sum(Wallet.balance))) or 0.0
+        ledger_sums = dict(session.execute(
+            select(Transaction.user_id, func.sum(Transaction.amount)).group_by(Transaction.user_id)).all())
+        balances = dict(session.execute(select(Wallet.user_id, Wallet.balance)).all())
+    finally:
+        session.close()
+    expected = users * INITIAL_BALANCE + deposits
+    mismatched = [uid for uid, balance in balances.items() if abs(balance - ledger_sums.get(uid, 0.0)) > 1e-6]
+    stale = [uid for uid, balance in balances.items() if ledger.cache.get(uid) not in (None, balance)]
+    return {
+        'total': total,
+        'expected_total': expected,
+        'conserved': abs(total - expected) < 1e-6,
+        'ledger_matches_balances': not mismatched,
+        'cache_consistent': not stale,
+        'negative_wallets': sum(1 for b in balances.values() if b < 0),
+    }
+
+
+def run(threads: int = 8, ops: int = 2000, users: int = 50, deposit_ratio: float = 0.1, seed: int = 1,
+        path: str = None) -> dict:
+    ledger, engine = make_ledger(path)
+    for uid in range(1, users + 1):
+        ledger.post(uid, INITIAL_BALANCE, TransactionType.deposit, 'seed')
+
+    latencies = []
+    counts = {'transfers': 0, 'deposits': 0, 'insufficient': 0, 'replayed': 0}
+    deposited = [0.0]
+    lock = threading.Lock()
+    per_thread = ops // threads
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local_latencies, local = [], dict.fromkeys(counts, 0)
+        local_deposits = 0.0
+        for op in range(per_thread):
+            started = time.perf_counter()
+            if rng.random() < deposit_ratio:
+                amount = rng.randint(1, 10) * 1000
+                # هر کلید دو بار ارسال می‌شود؛ بار دوم باید replay باشد
+                key = f"bench:{index}:{op}"
+                ledger.post(rng.randint(1, users), amount, TransactionType.deposit, 'bench', idempotency_key=key)
+                entry = ledger.post(rng.randint(1, users), amount, TransactionType.deposit, 'bench', idempotency_key=key)
+                local['deposits'] += 1
+                local['replayed'] += entry.replayed
+                local_deposits += amount
+            else:
+                src, dst = rng.sample(range(1, users + 1), 2)
+                try:
+                    ledger.transfer(src, dst, rng.randint(1, 400) * 1000)
+                    local['transfers'] += 1
+                except InsufficientFunds:
+                    local['insufficient'] += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            for key, value in local.items():
+                counts[key] += value
+            deposited[0] += local_deposits
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = dict(counts)
+    result.update({
+        'threads': threads,
+        'operations': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,  # عملیات در ثانیه
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'cache_hit_rate': ledger.cache.hits / max(1, ledger.cache.hits + ledger.cache.misses),
+    })
+    result.update(check_invariants(ledger, engine, users, deposited[0]))
+    engine.dispose()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args(argv)
+    result = run(args.threads, args.ops, args.users)
+    print(json.dumps(result, indent=2))
+    return 0 if result['conserved'] and result['ledger_matches_balances'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# tests/benchmark_runtime.py
+"""Threads vs asyncio runtime under many concurrent wizard users.
+
+Run with ``python -m tests.benchmark_runtime [--users N] [--latency MS] [--workers N] [--json]``.
+Every user runs the full order wizard at once (one callback and six
+messages) through the real handlers and the per-user worker shards. The
+Telegram API is simulated with a fixed round-trip latency: a blocking sleep
+for the threaded runtime, ``asyncio.sleep`` for the asyncio one. Telegram's
+rate limits are lifted so the runtimes, not the buckets, set the pace.
+"done s" includes the admin's new-order notifications, which stay serialized
+on the single admin chat in both runtimes.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import threading
+import time
+
+from tests.benchmark import make_message, make_callback
+from telebot import types
+
+UNLIMITED = {'global_rate': 1_000_000, 'chat_rate': 1_000_000, 'chat_burst': 1_000_000}
+_update_ids = itertools.count(1)
+_user_ids = itertools.count(2_000_000)
+
+
+class FakeApi:
+    """Blocking stand-in for the Bot API: every call costs ``latency`` seconds of a thread."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, *args, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return True
+
+
+class FakeAsyncApi:
+    """AsyncTeleBot stand-in: every method awaits ``latency`` seconds on the loop."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def __getattr__(self, method):
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self.latency)
+            self.calls += 1
+            return True
+        return call
+
+
+def as_update(message=None, callback_query=None):
+    update = types.Update.de_json({'update_id': next(_update_ids)})
+    update.message = message
+    update.callback_query = callback_query
+    return update
+
+
+def wizard_steps(user_id: int, product_id: int) -> list:
+    return [
+        as_update(callback_query=make_callback(user_id, f"visa:order_product:{product_id}")),
+        as_update(message=make_message(user_id, 'John Smith')),
+        as_update(message=make_message(user_id, '221B Baker Street, London')),
+        as_update(message=make_message(user_id, '09121234567')),
+        as_update(message=make_message(user_id, photo=True)),
+        as_update(message=make_message(user_id, video=True)),
+        as_update(message=make_message(user_id, f"0x{user_id:064x}")),
+    ]
+
+
+def seed_product() -> int:
+    from src.database.db_manager import Session, allocate_sequence, product_code
+    from src.database.models import Product
+    from src.database.catalog import catalog
+    session = Session()
+    try:
+        product = Product(code=product_code(allocate_sequence(session, 'product_code')[0]), name='Runtime bench card', price=1_000_000)
+        session.add(product)
+        session.commit()
+        catalog.upsert(product)
+        return product.id
+    finally:
+        session.close()
+
+
+def build_bot(runtime: str, latency: float, workers: int):
+    """A bot of the given runtime sharing main.py's registered handlers; returns ``(bot, api, stop)``."""
+    import main
+    from src.utils.outbound import RateLimitedSendMixin, OutboundDispatcher
+    from src.utils.workers import ShardedTeleBot
+    from src.utils.aio import AsyncSendMixin, AsyncOutbound
+
+    if runtime == 'threads':
+        api = FakeApi(latency)
+
+        class ThreadedBot(RateLimitedSendMixin, ShardedTeleBot):
+            def answer_callback_query(self, *args, **kwargs):
+                return api('answer_callback_query', *args, **kwargs)  # مثل TeleBot: درخواست مستقیم
+
+        bot = ThreadedBot(main.BOT_TOKEN, num_workers=workers, outbound=OutboundDispatcher(api, **UNLIMITED))
+
+        def stop():
+            bot.outbound.stop()
+    else:
+        api = FakeAsyncApi(latency)
+        loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=loop.run_forever, name='bench-loop', daemon=True)
+        loop_thread.start()
+
+        class AsyncioBot(AsyncSendMixin, RateLimitedSendMixin, ShardedTeleBot):
+            pass
+
+        bot = AsyncioBot(main.BOT_TOKEN, num_workers=workers, outbound=AsyncOutbound(**UNLIMITED))
+        bot.outbound.bind(api, loop)
+
+        def stop():
+            bot.outbound.stop()
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join()
+            loop.close()
+
+    bot.message_handlers = main.bot.message_handlers
+    bot.callback_query_handlers = main.bot.callback_query_handlers
+    return bot, api, stop
+
+
+def wait_idle(bot, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = bot.outbound.stats()
+        if not (stats['queued'] or stats['delayed'] or stats['in_flight']):
+            return
+        time.sleep(0.005)
+    raise TimeoutError('outbound queue did not drain')
+
+
+def run(runtime: str = 'asyncio', users: int = 200, latency: float = 0.05, workers: int = 4) -> dict:
+    import main
+    from src.utils.notifier import Notifier
+
+    product_id = seed_product()
+    bot, api, stop = build_bot(runtime, latency, workers)
+    original = main.bot, main.admin_notifier
+    main.bot = bot
+    main.admin_notifier = Notifier(bot.outbound, backoff=0, name='bench-notifier')
+    steps = [wizard_steps(next(_user_ids), product_id) for _ in range(users)]
+    peak_threads = threading.active_count()
+    try:
+        started = time.perf_counter()
+        for step in range(len(steps[0])):
+            # هر مرحله برای همه‌ی کاربران هم‌زمان می‌رسد، مثل یک دسته از getUpdates
+            bot.process_new_updates([user_steps[step] for user_steps in steps])
+        bot.executor.join()
+        handled = time.perf_counter() - started
+        main.admin_notifier.join()
+        wait_idle(bot)
+        elapsed = time.perf_counter() - started
+        peak_threads = max(peak_threads, threading.active_count())
+    finally:
+        main.admin_notifier.stop()
+        main.bot, main.admin_notifier = original
+        bot.executor.shutdown()
+        stop()
+
+    shards = bot.executor.stats()
+    processed = sum(s['processed'] for s in shards)
+    return {
+        'runtime': runtime,
+        'users': users,
+        'workers': workers,
+        'latency_ms': latency * 1000,
+        'updates': processed,
+        'errors': sum(s['errors'] for s in shards),
+        'api_calls': api.calls,
+        'handled_s': handled,       # تا پردازش آخرین آپدیت
+        'elapsed_s': elapsed,       # تا ارسال آخرین پاسخ
+        'throughput': processed / handled if handled else 0.0,  # آپدیت در ثانیه
+        'avg_busy_ms': sum(s['avg_busy'] * s['processed'] for s in shards) / max(1, processed) * 1000,
+        'max_latency_ms': max(s['max_latency'] for s in shards) * 1000,
+        'peak_threads': peak_threads,
+    }
+
+
+def format_results(results) -> str:
+    lines = [f"{'runtime':<10}{'updates':>9}{'upd/s':>10}{'busy ms':>9}{'max ms':>10}{'done s':>9}{'api':>7}{'threads':>9}"]
+    for r in results:
+        lines.append(f"{r['runtime']:<10}{r['updates']:>9}{r['throughput']:>10.1f}{r['avg_busy_ms']:>9.2f}"
+                     f"{r['max_latency_ms']:>10.1f}{r['elapsed_s']:>9.2f}{r['api_calls']:>7}{r['peak_threads']:>9}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=50, help='simulated Bot API round trip in ms')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args(argv)
+
+    from src.database.db_manager import init_db
+    init_db()
+    results = [run(runtime, args.users, args.latency / 1000, args.workers) for runtime in ('threads', 'asyncio')]
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
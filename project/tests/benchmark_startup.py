@@ -0,0 +1,122 @@
+# tests/benchmark_startup.py
+"""Cold start: time from a fresh interpreter to the first handled update.
+
+Run with ``python -m tests.benchmark_startup [--runs N] [--json]``.
+Each run is a new Python process that imports main.py, runs its startup
+(logging, journal recovery, broadcast resume) and then handles a ``/start``
+message and a ``menu:wallet`` callback on a stub bot. Handler loading is
+compared 'lazy' (modules imported on the first hit of their routes) against
+'eager' (all at startup). The database file is shared by all runs and
+migrated by an untimed warm-up run, as on a restart during a deploy.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('lazy', 'eager')
+# مقادیر میانه‌گیری‌شده از هر اجرا
+TIMINGS = ('process_ms', 'import_ms', 'ready_ms', 'first_update_ms', 'first_route_ms', 'to_first_update_ms')
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def child() -> dict:
+    """Body of one measured process; everything main.py costs happens after ``started``."""
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    main.start_services()
+    ready = time.perf_counter()
+    loaded_at_ready = sorted(name for name in sys.modules if name.startswith('src.handlers.'))
+
+    from tests.benchmark import Harness, make_message
+    h = Harness()
+    user_id = h.new_user()
+    update_started = time.perf_counter()
+    main.start_handler(make_message(user_id, '/start'))
+    first_update = time.perf_counter()
+    h.callback(user_id, 'menu:wallet')
+    first_route = time.perf_counter()
+    return {
+        'import_ms': _ms(imported - started),
+        'ready_ms': _ms(ready - started),
+        'first_update_ms': _ms(first_update - update_started),
+        'first_route_ms': _ms(first_route - first_update),  # شامل ایمپورت ماژول wallet در حالت lazy
+        'to_first_update_ms': _ms(ready - started + first_update - update_started),
+        'phases_ms': {phase: _ms(seconds) for phase, seconds in main.startup.phases.items()},
+        'handlers_at_ready': loaded_at_ready,
+        'handlers_after': sorted(name for name in sys.modules if name.startswith('src.handlers.')),
+        'api_calls': [method for method, _, _ in h.bot.calls],
+    }
+
+
+def _spawn(mode: str, db_path: str) -> dict:
+    env = dict(os.environ, HANDLER_LOADING=mode, DB_PATH=db_path, BOT_TOKEN='123456:STARTUP',
+               ADMIN_ID='1000', STATE_JOURNAL_DIR='', METRICS_PORT='0', LOG_LEVEL='WARNING')
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-m', 'tests.benchmark_startup', '--child'],
+                          cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup run failed ({mode}):\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['process_ms'] = _ms(elapsed)  # از fork تا خروج، شامل بالا آمدن خود مفسر
+    return result
+
+
+def run(runs: int = 5, modes=MODES, db_path: str = None) -> dict:
+    db_path = db_path or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='visabot-startup-'), 'bench.db')
+    _spawn(modes[0], db_path)  # warm-up: ساخت schema و فایل‌های .pyc
+    results = {}
+    for mode in modes:
+        samples = [_spawn(mode, db_path) for _ in range(runs)]
+        summary = {key: statistics.median(s[key] for s in samples) for key in TIMINGS}
+        phases = samples[0]['phases_ms']
+        summary['phases_ms'] = {phase: statistics.median(s['phases_ms'].get(phase, 0.0) for s in samples)
+                                for phase in phases}
+        for key in ('handlers_at_ready', 'handlers_after', 'api_calls'):
+            summary[key] = samples[-1][key]
+        summary['runs'] = runs
+        results[mode] = summary
+    return results
+
+
+def format_results(results) -> str:
+    lines = [f"{'mode':<7}{'process':>9}{'import':>9}{'ready':>9}{'1st upd':>9}{'1st route':>10}"
+             f"{'to 1st':>9}{'modules':>9}   (ms, median)"]
+    for mode, r in results.items():
+        lines.append(f"{mode:<7}{r['process_ms']:>9.1f}{r['import_ms']:>9.1f}{r['ready_ms']:>9.1f}"
+                     f"{r['first_update_ms']:>9.2f}{r['first_route_ms']:>10.2f}{r['to_first_update_ms']:>9.1f}"
+                     f"{len(r['handlers_at_ready']):>9}")
+    for mode, r in results.items():
+        phases = ', '.join(f"{phase} {ms:.1f}" for phase, ms in r['phases_ms'].items())
+        lines.append(f"{mode}: {phases}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child()))
+        sys.stdout.flush()
+        os._exit(0)  # threadهای worker و outbound منتظر نمی‌مانند
+    results = run(args.runs)
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# tests/conftest.py
+import os
+import tempfile
+import pytest
+
+os.environ.setdefault('BOT_TOKEN', '123456:TEST-TOKEN')
+os.environ.setdefault('ADMIN_ID', '1000')
+# هر اجرای تست روی یک فایل SQLite موقت کار می‌کند، نه bot.db
+os.environ.setdefault('DB_PATH', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='visabot-tests-'), 'test.db'))
+
+
+@pytest.fixture(scope='module')
+def harness():
+    """benchmark.Harness on a migrated test DB; main.bot and the notifier are put back afterwards."""
+    from src.database.db_manager import init_db
+    from tests import benchmark
+    init_db()
+    h = benchmark.Harness()
+    original = h.main.bot, h.main.admin_notifier
+    yield h
+    h.main.bot, h.main.admin_notifier = original
@@ -0,0 +1,25 @@
+# tests/test_benchmark.py
+from tests import benchmark
+
+
+def test_every_scenario_runs_and_reports_percentiles(harness):
+    results = benchmark.run(iterations=2, harness=harness, warmup=0)
+    assert set(results) == set(benchmark.SCENARIOS)
+    for name, r in results.items():
+        assert r['updates'] > 0 and r['api_calls'] > 0, name
+        assert r['p50_ms'] <= r['p95_ms'] <= r['p99_ms'] <= r['max_ms']
+
+
+def test_order_wizard_reaches_admin_and_database(harness):
+    from src.database.models import Order
+    session = harness.Session()
+    before = session.query(Order).count()
+    session.close()
+
+    harness.bot.calls.clear()
+    benchmark.run(iterations=1, scenarios=['order_wizard'], harness=harness, warmup=0)
+
+    session = harness.Session()
+    assert session.query(Order).count() == before + 1
+    session.close()
+    assert any(m == 'send_media_group' and chat == harness.admin_id for m, chat, _ in harness.bot.calls)
@@ -0,0 +1,114 @@
+# tests/test_broadcast.py
+from concurrent.futures import Future
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from telebot.apihelper import ApiTelegramException
+from src.database.db_manager import create_db_engine, Session
+from src.database.migrations import migrate
+from src.database.models import User, BroadcastFailure
+from src.utils.broadcast import BroadcastEngine, broadcasts
+from tests import benchmark
+
+BLOCKED = {10_003, 10_007}
+
+
+class FakeOutbound:
+    def __init__(self, on_send=None):
+        self.sent = []
+        self.edits = []
+        self.on_send = on_send
+
+    def submit(self, method, *args, priority=0, **kwargs):
+        future = Future()
+        if method == 'edit_message_text':
+            self.edits.append(args[0])
+        elif args[0] in BLOCKED:
+            future.set_exception(ApiTelegramException(method, None, {
+                'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}))
+            return future
+        else:
+            self.sent.append(args[0])
+            if self.on_send:
+                self.on_send(len(self.sent))
+        future.set_result(None)
+        return future
+
+
+class FakeBot:
+    def __init__(self, on_send=None):
+        self.outbound = FakeOutbound(on_send)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db = create_db_engine(f"sqlite:///{tmp_path / 'broadcast.db'}")
+    migrate(db)
+    factory = sessionmaker(bind=db)
+    session = factory()
+    session.add_all([User(user_id=10_000 + i, first_name=f"u{i}") for i in range(25)])
+    session.commit()
+    session.close()
+    yield BroadcastEngine(factory, chunk_size=4, rate=1000, progress_interval=0)
+    db.dispose()
+
+
+def test_streams_every_user_once_and_records_failures(engine):
+    bot = FakeBot()
+    broadcast_id = engine.create(1000, "Prices changed", chat_id=1000, message_id=1)
+    engine.start(bot, broadcast_id)
+    engine.join(broadcast_id, timeout=10)
+
+    broadcast = engine.get(broadcast_id)
+    assert (broadcast.status, broadcast.total, broadcast.sent, broadcast.failed) == ('done', 25, 23, 2)
+    assert sorted(bot.outbound.sent) == sorted(set(range(10_000, 10_025)) - BLOCKED)
+    session = engine.Session()
+    failures = session.execute(select(BroadcastFailure.user_id, BroadcastFailure.reason)).all()
+    session.close()
+    assert sorted(failures) == [(10_003, 'blocked'), (10_007, 'blocked')]
+    assert bot.outbound.edits[-1].startswith('✅ Broadcast finished') and '25/25' in bot.outbound.edits[-1]
+    assert any('ETA' in text for text in bot.outbound.edits)
+
+
+def test_pause_checkpoints_and_resume_continues(engine):
+    broadcast_id = engine.create(1000, "Hello")
+    bot = FakeBot(on_send=lambda count: count == 6 and engine.pause(broadcast_id))
+    engine.start(bot, broadcast_id)
+    engine.join(broadcast_id, timeout=10)
+
+    paused = engine.get(broadcast_id)
+    assert paused.status == 'paused'
+    assert paused.sent + paused.failed == 8  # دسته‌ی جاری کامل و checkpoint می‌شود
+    assert not engine.pause(broadcast_id)
+
+    assert engine.resume(bot, broadcast_id)
+    engine.join(broadcast_id, timeout=10)
+    assert engine.get(broadcast_id).status == 'done'
+    assert sorted(bot.outbound.sent) == sorted(set(range(10_000, 10_025)) - BLOCKED)
+
+
+def test_restart_resumes_from_last_checkpoint(engine):
+    broadcast_id = engine.create(1000, "Hello")
+    engine._checkpoint(broadcast_id, 12, 12, [])  # فرض: پروسه بعد از ۱۲ کاربر متوقف شده است
+    bot = FakeBot()
+    assert engine.resume_interrupted(bot) == [broadcast_id]
+    engine.join(broadcast_id, timeout=10)
+    assert sorted(bot.outbound.sent) == list(range(10_012, 10_025))
+    assert engine.get(broadcast_id).sent == 25
+
+
+def test_admin_wizard_sends_to_users(harness):
+    session = Session()
+    session.add_all([User(user_id=90_000 + i) for i in range(3)])
+    session.commit()
+    session.close()
+    admin = harness.admin_id
+    harness.callback(admin, 'admin:broadcast')
+    harness.message(benchmark.make_message(admin, "New card types available"))
+    harness.callback(admin, 'admin:broadcast_send')
+    broadcast_id = int(benchmark.callback_data_of(harness.bot.last_markup(), 'admin:broadcast_').rsplit(':', 1)[1])
+    broadcasts.join(broadcast_id, timeout=10)
+    recipients = {chat for method, chat, kwargs in harness.bot.calls
+                  if method == 'send_message' and kwargs.get('text') == "New card types available"}
+    assert {90_000, 90_001, 90_002} <= recipients
+    assert broadcasts.get(broadcast_id).status == 'done'
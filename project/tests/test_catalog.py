@@ -0,0 +1,106 @@
+# tests/test_catalog.py
+import pytest
+from sqlalchemy.orm import sessionmaker
+from src.database import catalog as catalog_module
+from src.database.catalog import ProductCatalog
+from src.database.db_manager import create_db_engine
+from src.database.migrations import migrate
+from src.database.models import Product
+from tests import benchmark
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """A catalog over its own database, seeded with products 1..7."""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    migrate(engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    session.add_all(Product(id=i, code=f"CT-{i:03d}", name=f"Card {i}", price=i * 100) for i in range(1, 8))
+    session.commit()
+    session.close()
+    monkeypatch.setattr(catalog_module, 'Session', factory)
+    yield factory
+    engine.dispose()
+
+
+def ids(products):
+    return [p.id for p in products]
+
+
+def test_filled_once_from_the_database(session_factory):
+    catalog = ProductCatalog()
+    assert ids(catalog.all()) == [7, 6, 5, 4, 3, 2, 1]
+    assert catalog.get(3).name == 'Card 3' and catalog.get(99) is None
+    assert len(catalog) == 7
+    assert catalog.loads == 1
+
+
+def test_page_boundaries(session_factory):
+    catalog = ProductCatalog()
+    first, more = catalog.page(per_page=3)
+    assert (ids(first), more) == ([7, 6, 5], True)
+    second, more = catalog.page(cursor=5, direction='n', per_page=3)
+    assert (ids(second), more) == ([4, 3, 2], True)
+    last, more = catalog.page(cursor=2, direction='n', per_page=3)
+    assert (ids(last), more) == ([1], False)
+    assert catalog.page(cursor=1, direction='n', per_page=3) == ((), False)
+
+    back, more = catalog.page(cursor=1, direction='p', per_page=3)
+    assert (ids(back), more) == ([4, 3, 2], True)
+    back, more = catalog.page(cursor=4, direction='p', per_page=3)
+    assert (ids(back), more) == ([7, 6, 5], False)  # صفحه‌ی اول: قبلی ندارد
+    exact, more = catalog.page(per_page=7)
+    assert (len(exact), more) == (7, False)
+
+
+def test_writes_update_the_cache_without_a_reload(session_factory):
+    catalog = ProductCatalog()
+    catalog.all()
+    session = session_factory()
+    added = Product(id=8, code='CT-008', name='Card 8', price=800)
+    session.add(added)
+    edited = session.get(Product, 3)
+    edited.price = 999
+    session.commit()
+    catalog.upsert(added)
+    catalog.upsert(edited)
+    session.close()
+    catalog.remove(5)
+
+    assert ids(catalog.all()) == [8, 7, 6, 4, 3, 2, 1]
+    assert catalog.get(3).price == 999 and catalog.get(5) is None
+    assert ids(catalog.page(cursor=6, per_page=2)[0]) == [4, 3]
+    assert catalog.loads == 1
+
+
+def test_invalidate_reloads_on_next_read(session_factory):
+    catalog = ProductCatalog()
+    catalog.all()
+    session = session_factory()
+    session.query(Product).filter_by(id=1).update({'name': 'Renamed'})
+    session.commit()
+    session.close()
+    assert catalog.get(1).name == 'Card 1'  # نوشتن بیرون از مسیرهای ادمین: تا invalidate دیده نمی‌شود
+    catalog.invalidate()
+    assert catalog.get(1).name == 'Renamed' and catalog.loads == 2
+
+
+def test_admin_edit_and_delete_are_visible_immediately(harness):
+    catalog = harness.catalog
+    session = harness.Session()
+    product = Product(code='CT-ADMIN', name='Admin edit card', price=1000)
+    session.add(product)
+    session.commit()
+    product_id = product.id
+    session.close()
+    catalog.invalidate()
+    assert catalog.get(product_id).price == 1000
+
+    harness.callback(harness.admin_id, f"admin:edit_price:{product_id}")
+    harness.message(benchmark.make_message(harness.admin_id, '4321'))
+    assert catalog.get(product_id).price == 4321
+
+    harness.callback(harness.admin_id, f"admin:delete_confirm_yes:{product_id}")
+    assert catalog.get(product_id) is None
+    assert product_id not in ids(catalog.all())
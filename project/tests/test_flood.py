@@ -0,0 +1,120 @@
+# tests/test_flood.py
+import itertools
+from telebot import types
+from src.utils.flood import FloodGuard, FloodControlMixin, ALLOW, DUPLICATE, THROTTLED, THROTTLED_TEXT
+from src.utils.states import StateStore
+from tests import benchmark
+
+ADMIN = 1000
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_throttles_and_refills():
+    clock = Clock()
+    guard = FloodGuard(rate=1, burst=3, duplicate_window=1, exempt=(ADMIN,), clock=clock)
+    assert [guard.check(7) for _ in range(4)] == [ALLOW, ALLOW, ALLOW, THROTTLED]
+    assert guard.check(8) == ALLOW  # باکت هر کاربر جداست
+    assert all(guard.check(ADMIN) == ALLOW for _ in range(20))
+    clock.now += 1
+    assert guard.check(7) == ALLOW
+
+
+def test_identical_taps_collapse_without_spending_tokens():
+    clock = Clock()
+    guard = FloodGuard(rate=1, burst=2, duplicate_window=1.5, clock=clock)
+    assert guard.check(7, ('wallet:history', 5)) == ALLOW
+    assert [guard.check(7, ('wallet:history', 5)) for _ in range(10)] == [DUPLICATE] * 10
+    assert guard.check(7, ('wallet:history', 6)) == ALLOW  # پیام دیگری است
+    clock.now += 2
+    assert guard.check(7, ('wallet:history', 6)) == ALLOW
+
+
+def test_notice_is_rate_limited():
+    clock = Clock()
+    guard = FloodGuard(clock=clock)
+    assert guard.should_notify(7) and not guard.should_notify(7)
+    clock.now += 60
+    assert guard.should_notify(7)
+
+
+class RecordingBot(benchmark.StubBot):
+    def __init__(self):
+        super().__init__()
+        self.dispatched = []
+
+    def process_new_updates(self, updates):
+        self.dispatched.extend(updates)
+
+
+class GuardedBot(FloodControlMixin, RecordingBot):
+    pass
+
+
+_ids = itertools.count(1)
+
+
+def callback_update(user_id, data, message_id=50):
+    return types.Update.de_json({'update_id': next(_ids), 'callback_query': {
+        'id': str(next(_ids)), 'chat_instance': 't', 'data': data,
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'u'},
+        'message': {'message_id': message_id, 'date': 0, 'chat': {'id': user_id, 'type': 'private'}, 'text': 'x'},
+    }})
+
+
+def message_update(user_id, text):
+    return types.Update.de_json({'update_id': next(_ids), 'message': {
+        'message_id': next(_ids), 'date': 0, 'text': text,
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'u'}, 'chat': {'id': user_id, 'type': 'private'},
+    }})
+
+
+def test_mixin_drops_before_dispatch_and_answers_cheaply():
+    bot = GuardedBot(flood_guard=FloodGuard(rate=0.001, burst=3, duplicate_window=5))
+    updates = [callback_update(7, 'admin:list_products') for _ in range(5)]
+    updates += [callback_update(7, f"products:page:{i}") for i in range(3)]
+    updates += [message_update(8, f"hello {i}") for i in range(5)]
+    bot.process_new_updates(updates)
+
+    assert [u.callback_query.data for u in bot.dispatched if u.callback_query] == \
+        ['admin:list_products', 'products:page:0', 'products:page:1']
+    assert len([u for u in bot.dispatched if u.message]) == 3
+    assert bot.last_update_id == updates[-1].update_id
+
+    answers = [kwargs['text'] for method, _, kwargs in bot.calls if method == 'answer_callback_query']
+    assert answers == [None] * 4 + [THROTTLED_TEXT]
+    warnings = [chat for method, chat, kwargs in bot.calls if method == 'send_message']
+    assert warnings == [8]
+
+
+def test_over_limit_messages_pass_while_the_user_is_in_a_conversation():
+    states = StateStore(max_entries=10, ttl=60)
+    bot = GuardedBot(flood_guard=FloodGuard(rate=0.001, burst=1), in_conversation=states.active)
+    states.set(9, 'order_full_name')
+    bot.process_new_updates([message_update(9, f"wizard {i}") for i in range(4)])
+    bot.process_new_updates([message_update(10, f"spam {i}") for i in range(4)])
+    assert [u.message.text for u in bot.dispatched] == ['wizard 0', 'wizard 1', 'wizard 2', 'wizard 3', 'spam 0']
+    states.clear(9)
+    bot.process_new_updates([message_update(9, 'after wizard')])
+    assert bot.dispatched[-1].message.text == 'spam 0'
+
+
+def test_wizard_message_over_the_limit_is_still_handled(harness, monkeypatch):
+    from src.utils import states
+
+    monkeypatch.setattr(states, 'store', StateStore(max_entries=10, ttl=60))
+    user_id = harness.new_user()
+    bot = GuardedBot(flood_guard=FloodGuard(rate=0.001, burst=1))  # store پیش‌فرض ماژول states
+    bot.process_new_updates([message_update(user_id, 'hi')])
+    states.set_state(user_id, 'order_full_name', {'product_id': 1})
+    bot.process_new_updates([message_update(user_id, 'Ali Rezaei')])
+    assert len(bot.dispatched) == 2 and not bot.calls  # بدون پیام «آهسته‌تر»
+    harness.message(bot.dispatched[-1].message)
+    assert states.get_state(user_id) == 'order_address'
+    assert states.get_state_data(user_id, 'full_name') == 'Ali Rezaei'
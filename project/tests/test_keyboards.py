@@ -0,0 +1,53 @@
+# tests/test_keyboards.py
+import json
+import pytest
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from src.utils import keyboards
+from src.utils.keyboards import StaticKeyboard
+
+
+def callback_data(markup):
+    return [button.callback_data for row in markup.keyboard for button in row]
+
+
+def test_json_is_serialized_once(monkeypatch):
+    calls = []
+    original = InlineKeyboardMarkup.to_json
+
+    def counting(self):
+        calls.append(1)
+        return original(self)
+
+    monkeypatch.setattr(InlineKeyboardMarkup, 'to_json', counting)
+    markup = InlineKeyboardMarkup().add(InlineKeyboardButton("Yes", callback_data="x:yes"))
+    expected = original(markup)
+    static = StaticKeyboard(markup)
+    assert [static.to_json() for _ in range(3)] == [expected] * 3
+    assert len(calls) == 1
+    assert json.loads(static.to_json())['inline_keyboard'][0][0]['callback_data'] == 'x:yes'
+
+
+def test_shared_keyboards_cannot_be_modified():
+    shared = keyboards.main_menu_keyboard()
+    before = shared.to_json()
+    with pytest.raises(TypeError):
+        shared.add(InlineKeyboardButton("Extra", callback_data="extra"))
+    with pytest.raises(TypeError):
+        shared.row(InlineKeyboardButton("Extra", callback_data="extra"))
+    assert shared.to_json() == before and 'extra' not in callback_data(shared)
+
+
+def test_builders_return_the_same_cached_instance():
+    assert keyboards.get_keyboard('wallet_home') is keyboards.wallet_home_keyboard()
+    assert keyboards.product_detail_keyboard(5) is keyboards.product_detail_keyboard(5)
+    assert keyboards.product_detail_keyboard(5) is not keyboards.product_detail_keyboard(6)
+    assert 'visa:order_product:6' in callback_data(keyboards.product_detail_keyboard(6))
+    assert keyboards.confirm_keyboard('delete') is keyboards.confirm_keyboard('delete')
+
+
+def test_admin_variant_only_for_admin_id():
+    admin = keyboards.get_main_menu_markup(keyboards.ADMIN_ID)
+    user = keyboards.get_main_menu_markup(keyboards.ADMIN_ID + 1)
+    assert 'admin:main' in callback_data(admin)
+    assert 'admin:main' not in callback_data(user)
+    assert keyboards.get_main_menu_markup(12345) is user
@@ -0,0 +1,74 @@
+# tests/test_ledger.py
+import threading
+import pytest
+from src.database.ledger import InsufficientFunds, LedgerError
+from src.database.models import TransactionType, Transaction
+from tests import benchmark_ledger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger, engine = benchmark_ledger.make_ledger(str(tmp_path / 'ledger.db'))
+    yield ledger
+    engine.dispose()
+
+
+def test_post_is_idempotent(ledger):
+    first = ledger.post(1, 500, TransactionType.deposit, 'charge', idempotency_key='charge:1:10')
+    again = ledger.post(1, 500, TransactionType.deposit, 'charge', idempotency_key='charge:1:10')
+    assert (first.balance, first.replayed) == (500, False)
+    assert again.replayed and again.transaction_id == first.transaction_id
+    assert ledger.balance(1) == 500
+    session = ledger.Session()
+    assert session.query(Transaction).count() == 1
+    session.close()
+
+
+def test_debit_cannot_overdraw_and_rolls_back_ledger_row(ledger):
+    ledger.post(1, 100, TransactionType.deposit, 'seed')
+    with pytest.raises(InsufficientFunds):
+        ledger.transfer(1, 2, 150)
+    with pytest.raises(InsufficientFunds):
+        ledger.post(3, -1, TransactionType.payment, 'no wallet yet')
+    with pytest.raises(LedgerError):
+        ledger.transfer(1, 1, 10)
+    session = ledger.Session()
+    assert session.query(Transaction).count() == 1
+    session.close()
+    assert ledger.balance(1) == 100 and ledger.balance(2) == 0
+
+
+def test_balance_is_served_from_cache_after_writes(ledger):
+    ledger.post(7, 300, TransactionType.deposit, 'seed')
+    debit, credit = ledger.transfer(7, 8, 120)
+    assert (debit.balance, credit.balance) == (180, 120)
+    misses = ledger.cache.misses
+    assert ledger.balance(7) == 180 and ledger.balance(8) == 120
+    assert ledger.cache.misses == misses
+
+
+def test_concurrent_transfers_conserve_money(tmp_path):
+    result = benchmark_ledger.run(threads=6, ops=300, users=5, path=str(tmp_path / 'bench.db'))
+    assert result['conserved'] and result['ledger_matches_balances'] and result['cache_consistent']
+    assert result['negative_wallets'] == 0
+    assert result['replayed'] == result['deposits']
+
+
+def test_concurrent_spends_of_the_same_balance_only_one_wins(ledger):
+    ledger.post(1, 100, TransactionType.deposit, 'seed')
+    outcomes = []
+
+    def spend(target):
+        try:
+            ledger.transfer(1, target, 100)
+            outcomes.append('ok')
+        except InsufficientFunds:
+            outcomes.append('insufficient')
+
+    threads = [threading.Thread(target=spend, args=(i,)) for i in range(2, 10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(outcomes) == ['insufficient'] * 7 + ['ok']
+    assert ledger.balance(1) == 0
@@ -0,0 +1,36 @@
+# tests/test_log.py
+import io
+import logging
+from src.utils import log as logmod
+
+
+def test_redacts_pii_and_writes_key_values():
+    stream = io.StringIO()
+    logmod.setup_logging(level='DEBUG', stream=stream)
+    try:
+        logmod.get_logger('test').info('order_submitted', user_id=5, address='221B Baker St',
+                                       passport_file_id='AgADBAAD', state='order_mobile')
+    finally:
+        logmod.shutdown_logging()
+    line = stream.getvalue().strip()
+    assert 'INFO test order_submitted user_id=5' in line
+    assert 'state=order_mobile' in line
+    assert 'Baker' not in line and 'AgADBAAD' not in line
+    assert 'address=<redacted:13>' in line
+
+
+def test_sampling_and_levels_keep_warnings():
+    stream = io.StringIO()
+    logmod.setup_logging(level='DEBUG', stream=stream)
+    logmod.set_sample_rate('sampled', 0.0)
+    logmod.set_level('quiet', logging.ERROR)
+    try:
+        sampled = logmod.get_logger('sampled')
+        for _ in range(100):
+            sampled.info('noisy')
+        sampled.warning('kept')
+        logmod.get_logger('quiet').warning('hidden')
+    finally:
+        logmod.shutdown_logging()
+    output = stream.getvalue()
+    assert 'noisy' not in output and 'kept' in output and 'hidden' not in output
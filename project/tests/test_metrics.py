@@ -0,0 +1,42 @@
+# tests/test_metrics.py
+import urllib.request
+from src.utils import metrics
+
+
+def test_histogram_counter_gauge_text_format():
+    registry = metrics.Registry()
+    latency = registry.histogram('t_seconds', 'Latency', ['route'], buckets=(0.1, 1.0))
+    calls = registry.counter('t_calls', 'Calls', ['route', 'outcome'])
+    depth = registry.gauge('t_depth', 'Depth')
+    latency.labels('menu').observe(0.05)
+    latency.labels('menu').observe(0.5)
+    latency.labels('menu').observe(5)
+    calls.labels('menu', 'ok').inc()
+    depth.set_function(lambda: 7)
+
+    text = registry.render()
+    assert '# TYPE t_seconds histogram' in text
+    assert 't_seconds_bucket{route="menu",le="0.1"} 1' in text
+    assert 't_seconds_bucket{route="menu",le="1.0"} 2' in text
+    assert 't_seconds_bucket{route="menu",le="+Inf"} 3' in text
+    assert 't_seconds_count{route="menu"} 3' in text
+    assert 't_calls_total{route="menu",outcome="ok"} 1' in text
+    assert 't_depth 7' in text
+
+
+def test_bot_dispatch_and_db_show_up_on_endpoint(harness):
+    from tests import benchmark
+    benchmark.run(iterations=1, scenarios=['catalog_browse'], harness=harness, warmup=0)
+
+    server = metrics.MetricsServer('127.0.0.1', 0).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers['Content-Type'].startswith('text/plain')
+    finally:
+        server.stop()
+    assert 'visabot_route_seconds_count{route="visa:product:<int:product_id>"}' in body
+    assert 'visabot_route_calls_total{route="menu:visa_card",outcome="ok"}' in body
+    assert 'visabot_db_query_seconds_bucket{statement="SELECT"' in body
+    assert 'visabot_state_store_size ' in body
+    assert 'visabot_worker_queue_depth{shard="0"} 0' in body
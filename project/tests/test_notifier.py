@@ -0,0 +1,43 @@
+# tests/test_notifier.py
+from concurrent.futures import Future
+from telebot.apihelper import ApiTelegramException
+from src.utils.notifier import Notifier, api_call
+
+
+class FlakyOutbound:
+    """Fails each method with the queued error codes before succeeding."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+
+    def submit(self, method, *args, priority=0, **kwargs):
+        self.calls.append(method)
+        future = Future()
+        codes = self.failures.get(method)
+        if codes:
+            code = codes.pop(0)
+            future.set_exception(ApiTelegramException(method, None, {'error_code': code, 'description': 'boom'}))
+        else:
+            future.set_result(True)
+        return future
+
+
+def test_retries_server_errors_then_sends_rest_of_batch():
+    outbound = FlakyOutbound({'send_media_group': [502, 502]})
+    notifier = Notifier(outbound, backoff=0)
+    notifier.notify(api_call('send_media_group', 1, []), api_call('send_message', 1, 'caption'))
+    notifier.join()
+    assert outbound.calls == ['send_media_group'] * 3 + ['send_message']
+    assert (notifier.sent, notifier.retried, notifier.failed) == (2, 2, 0)
+    notifier.stop()
+
+
+def test_client_errors_are_not_retried_and_do_not_block_caption():
+    outbound = FlakyOutbound({'send_media_group': [400]})
+    notifier = Notifier(outbound, backoff=0)
+    notifier.notify(api_call('send_media_group', 1, []), api_call('send_message', 1, 'caption'))
+    notifier.join()
+    assert outbound.calls == ['send_media_group', 'send_message']
+    assert (notifier.sent, notifier.failed) == (1, 1)
+    notifier.stop()
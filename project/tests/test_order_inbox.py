@@ -0,0 +1,68 @@
+# tests/test_order_inbox.py
+from tests import benchmark
+from src.database.db_manager import Session, set_orders_status
+from src.database.models import Order
+
+
+def make_orders(count, user_base):
+    session = Session()
+    try:
+        orders = [Order(user_id=user_base + i, product_id=1, product_name=f"Inbox {i}", product_price=1000,
+                        tx_hash=f"inbox-{user_base + i}", status='pending') for i in range(count)]
+        session.add_all(orders)
+        session.commit()
+        return [o.id for o in orders]
+    finally:
+        session.close()
+
+
+def statuses(ids):
+    session = Session()
+    try:
+        return {o.id: o.status for o in session.query(Order).filter(Order.id.in_(ids))}
+    finally:
+        session.close()
+
+
+def test_bulk_update_only_moves_pending_orders():
+    ids = make_orders(3, 50_000)
+    assert {row[0] for row in set_orders_status(ids[:2], 'accepted')} == set(ids[:2])
+    assert [row[0] for row in set_orders_status(ids, 'rejected')] == [ids[2]]
+    assert statuses(ids) == {ids[0]: 'accepted', ids[1]: 'accepted', ids[2]: 'rejected'}
+
+
+def test_inbox_multi_select_batch_accept(harness):
+    ids = make_orders(3, 60_000)
+    admin = harness.admin_id
+    harness.callback(admin, 'admin:orders')
+    inbox = harness.bot.last_markup()
+    assert benchmark.callback_data_of(inbox, f"admin:order_toggle:{ids[-1]}")  # جدیدترین‌ها اول
+
+    harness.callback(admin, f"admin:order_toggle:{ids[0]}")
+    harness.callback(admin, f"admin:order_toggle:{ids[1]}")
+    harness.callback(admin, f"admin:order_toggle:{ids[1]}")  # دوباره: از انتخاب خارج می‌شود
+    harness.callback(admin, f"admin:order_toggle:{ids[2]}")
+    harness.bot.calls.clear()
+    harness.callback(admin, 'admin:orders_batch:accept')
+
+    assert statuses(ids) == {ids[0]: 'accepted', ids[1]: 'pending', ids[2]: 'accepted'}
+    notified = {chat for method, chat, _ in harness.bot.calls if method == 'send_message'}
+    assert notified == {60_000, 60_002}
+
+
+def test_notification_buttons_accept_once(harness):
+    [order_id] = make_orders(1, 70_000)
+    admin = harness.admin_id
+    harness.callback(admin, f"admin:reject_order:{order_id}")
+    assert statuses([order_id]) == {order_id: 'rejected'}
+    harness.bot.calls.clear()
+    harness.callback(admin, f"admin:accept_order:{order_id}")
+    assert statuses([order_id]) == {order_id: 'rejected'}
+    assert harness.bot.calls[-1][0] == 'answer_callback_query'
+    assert 'already handled' in harness.bot.calls[-1][2]['text']
+
+
+def test_non_admin_cannot_decide(harness):
+    [order_id] = make_orders(1, 80_000)
+    harness.callback(80_000, f"admin:accept_order:{order_id}")
+    assert statuses([order_id]) == {order_id: 'pending'}
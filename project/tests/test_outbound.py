@@ -0,0 +1,117 @@
+# tests/test_outbound.py
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+from telebot import apihelper
+from src.utils.outbound import OutboundDispatcher, RateLimitedTeleBot, PRIORITY_USER, PRIORITY_ADMIN
+
+
+class FakeBotApi(ThreadingHTTPServer):
+    """Minimal local Bot API: records calls, can answer the first N sends with 429."""
+
+    def __init__(self, fail_first: int = 0, retry_after: int = 1):
+        super().__init__(('127.0.0.1', 0), FakeBotApiHandler)
+        self.calls = []
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        url = urlparse(self.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update({k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()})
+
+        with self.server.lock:
+            self.server.calls.append((method, params, time.monotonic()))
+            limited = self.server.fail_first > 0
+            if limited:
+                self.server.fail_first -= 1
+
+        if limited:
+            status, body = 429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                 'parameters': {'retry_after': self.server.retry_after}}
+        else:
+            chat_id = int(params.get('chat_id', 0))
+            status, body = 200, {'ok': True, 'result': {
+                'message_id': len(self.server.calls), 'date': 0, 'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', '')}}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api():
+    servers = []
+
+    def start(**kwargs):
+        server = FakeBotApi(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        apihelper.API_URL = f"http://127.0.0.1:{server.server_address[1]}/bot{{0}}/{{1}}"
+        return server
+
+    yield start
+    apihelper.API_URL = None
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_send_retries_after_429(fake_api):
+    api = fake_api(fail_first=1, retry_after=1)
+    bot = RateLimitedTeleBot('123:TEST')
+    started = time.monotonic()
+    message = bot.send_message(77, 'hello')
+    assert message.chat.id == 77
+    assert time.monotonic() - started >= 1.0
+    stats = bot.outbound.stats()
+    assert stats['rate_limited'] == 1 and stats['retried'] == 1 and stats['sent'] == 1
+    assert [c[0] for c in api.calls] == ['sendMessage', 'sendMessage']
+    bot.outbound.stop()
+
+
+def test_per_chat_rate_and_order(fake_api):
+    api = fake_api()
+    bot = RateLimitedTeleBot('123:TEST')
+    bot.outbound.stop()
+    bot.outbound = OutboundDispatcher(bot.send_direct, global_rate=100, chat_rate=10, chat_burst=1, senders=4)
+    futures = [bot.outbound.submit('send_message', 5, f"m{i}") for i in range(4)]
+    for f in futures:
+        f.result(5)
+    texts = [c[1]['text'] for c in api.calls]
+    times = [c[2] for c in api.calls]
+    assert texts == ['m0', 'm1', 'm2', 'm3']
+    assert times[-1] - times[0] >= 0.25  # ۴ پیام با ۱۰ پیام/ثانیه برای یک چت
+    bot.outbound.stop()
+
+
+def test_user_replies_go_before_admin_notifications():
+    sent = []
+    dispatcher = OutboundDispatcher(lambda method, *args, **kwargs: sent.append(args[1]),
+                                    global_rate=1000, chat_burst=100, senders=1, autostart=False)
+    futures = [dispatcher.submit('send_message', 1, 'admin-1', priority=PRIORITY_ADMIN),
+               dispatcher.submit('send_message', 2, 'user-1', priority=PRIORITY_USER),
+               dispatcher.submit('send_message', 3, 'admin-2', priority=PRIORITY_ADMIN),
+               dispatcher.submit('send_message', 4, 'user-2', priority=PRIORITY_USER)]
+    dispatcher.start()
+    for f in futures:
+        f.result(5)
+    assert sent == ['user-1', 'user-2', 'admin-1', 'admin-2']
+    dispatcher.stop()
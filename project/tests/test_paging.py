@@ -0,0 +1,112 @@
+# tests/test_paging.py
+from datetime import datetime, timedelta
+import pytest
+from src.database.db_manager import init_db, Session, get_transactions_page, get_orders_page
+from src.database.models import Order, Transaction, TransactionType, TransactionStatus
+from tests import benchmark
+
+USER_ID = 70_001
+BASE = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.fixture(scope='module')
+def transaction_ids():
+    """12 transactions; ids 4..9 share one created_at, so paging must fall back to the id."""
+    init_db()
+    session = Session()
+    try:
+        rows = []
+        for i in range(12):
+            created = BASE + timedelta(minutes=i if i < 3 or i > 8 else 3)
+            rows.append(Transaction(user_id=USER_ID, type=TransactionType.deposit, amount=100 + i,
+                                    description=f"page {i}", status=TransactionStatus.confirmed, created_at=created))
+        session.add_all(rows)
+        session.commit()
+        return [row.id for row in rows]
+    finally:
+        session.close()
+
+
+def ids(rows):
+    return [row.id for row in rows]
+
+
+def walk(fetch, per_page):
+    """Pages newest-first via 'n', then back to the first via 'p'; returns both page lists."""
+    rows, more = fetch(None, 'n', per_page)
+    forward, flags = [ids(rows)], [more]
+    while more:
+        rows, more = fetch(rows[-1].id, 'n', per_page)
+        forward.append(ids(rows))
+        flags.append(more)
+    backward = [forward[-1]]
+    rows = list(rows)
+    more = True
+    while more:
+        rows, more = fetch(rows[0].id, 'p', per_page)
+        backward.append(ids(rows))
+    return forward, flags, backward[::-1]
+
+
+def test_transactions_page_forward_and_back_with_equal_timestamps(transaction_ids):
+    newest_first = transaction_ids[::-1]
+    forward, flags, backward = walk(lambda c, d, n: get_transactions_page(USER_ID, c, d, n), 5)
+    assert forward == [newest_first[:5], newest_first[5:10], newest_first[10:]]
+    assert flags == [True, True, False]  # صفحه‌ی آخر «بعدی» ندارد
+    assert backward == forward  # برگشت تا صفحه‌ی ۱ بدون جاافتادن یا تکرار
+
+
+def test_transactions_exact_multiple_has_no_empty_last_page(transaction_ids):
+    rows, more = get_transactions_page(USER_ID, None, 'n', 12)
+    assert len(rows) == 12 and more is False
+    rows, more = get_transactions_page(USER_ID, transaction_ids[0], 'n', 5)
+    assert (rows, more) == ([], False)
+
+
+def test_orders_page_forward_and_back_with_equal_timestamps():
+    init_db()
+    session = Session()
+    try:
+        orders = [Order(user_id=70_100 + i, product_id=1, product_name=f"Page {i}", product_price=1000,
+                        tx_hash=f"paging-{i}", status='paging',
+                        created_at=BASE + timedelta(minutes=i // 3)) for i in range(7)]
+        session.add_all(orders)
+        session.commit()
+        newest_first = [o.id for o in orders][::-1]
+    finally:
+        session.close()
+    forward, flags, backward = walk(lambda c, d, n: get_orders_page('paging', None, c, d, n), 3)
+    assert forward == [newest_first[:3], newest_first[3:6], newest_first[6:]]
+    assert flags == [True, True, False]
+    assert backward == forward
+    recent, _ = get_orders_page('paging', BASE + timedelta(minutes=2), per_page=10)
+    assert ids(recent) == newest_first[:1]
+
+
+def screen(h, data):
+    h.callback(USER_ID, data)
+    markup = h.bot.last_markup()
+    text = h.bot.calls[-1][2]['text']
+    return text, benchmark.callback_data_of(markup, 'wallet:transactions:p:'), \
+        benchmark.callback_data_of(markup, 'wallet:transactions:n:')
+
+
+def test_history_screens_navigation_buttons(harness, transaction_ids):
+    text, prev, next_ = screen(harness, 'wallet:transactions')
+    assert '(صفحه 1)' in text and prev is None and next_.startswith('wallet:transactions:n:2:')
+    text, prev, next_ = screen(harness, next_)
+    assert '(صفحه 2)' in text and prev.startswith('wallet:transactions:p:1:') and next_
+    text, prev_from_last, next_ = screen(harness, next_)
+    assert '(صفحه 3)' in text and next_ is None  # صفحه‌ی آخر
+
+    text, prev, next_ = screen(harness, prev_from_last)
+    assert '(صفحه 2)' in text and prev and next_
+    text, prev, next_ = screen(harness, prev)
+    assert '(صفحه 1)' in text and prev is None and next_
+
+
+def test_back_to_first_page_resets_a_wrong_page_number(harness, transaction_ids):
+    # شماره‌ی صفحه از callback قدیمی/دستکاری‌شده می‌آید؛ وقتی قبلی نیست، صفحه ۱ است
+    second_page_top = transaction_ids[::-1][5]
+    text, prev, next_ = screen(harness, f"wallet:transactions:p:7:{second_page_top}")
+    assert '(صفحه 1)' in text and prev is None and next_.startswith('wallet:transactions:n:2:')
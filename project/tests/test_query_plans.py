@@ -0,0 +1,81 @@
+# tests/test_query_plans.py
+"""EXPLAIN QUERY PLAN guards: every hot query must be served by an index."""
+import pytest
+from sqlalchemy import select, text
+from datetime import datetime
+from src.database.db_manager import create_db_engine, transactions_page_query, orders_page_query
+from src.database.migrations import migrate, SCHEMA_VERSION
+from src.database.models import Base, Order, Transaction, User, Wallet
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, stmt) -> list:
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+
+def assert_indexed(plan: list, ordered: bool = False):
+    for step in plan:
+        if step.startswith('SCAN') and 'USING' not in step:
+            pytest.fail(f"full table scan in plan: {plan}")
+    assert any('USING' in step for step in plan), plan
+    if ordered:
+        assert not any('TEMP B-TREE' in step for step in plan), f"sort not served by index: {plan}"
+
+
+HOT_QUERIES = {
+    'get_balance': (select(Wallet).where(Wallet.user_id == 42), False),
+    'get_user': (select(User).where(User.user_id == 42), False),
+    'referrer_by_code': (select(User.id).where(User.referral_code == 'ABCD1234'), False),
+    'broadcast_recipients_chunk': (
+        select(User.id, User.user_id).where(User.id > 100, User.user_id.isnot(None)).order_by(User.id).limit(100),
+        True
+    ),
+    'user_orders_by_status': (select(Order).where(Order.user_id == 42, Order.status == 'pending'), False),
+    'order_by_tx_hash': (select(Order).where(Order.tx_hash == 'abc'), False),
+    'pending_orders_inbox': (
+        select(Order).where(Order.status == 'pending').order_by(Order.created_at.desc(), Order.id.desc()).limit(11),
+        True
+    ),
+    'orders_inbox_first_page': (orders_page_query('pending'), True),
+    'orders_inbox_since': (orders_page_query('accepted', since=datetime(2024, 1, 1)), True),
+    'orders_inbox_next_page': (orders_page_query('pending', cursor=100, direction='n'), True),
+    'orders_inbox_prev_page': (orders_page_query('pending', datetime(2024, 1, 1), cursor=100, direction='p'), True),
+    'transactions_first_page': (transactions_page_query(42), True),
+    'transactions_next_page': (transactions_page_query(42, cursor=100, direction='n'), True),
+    'transactions_prev_page': (transactions_page_query(42, cursor=100, direction='p'), True),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(engine, name):
+    stmt, ordered = HOT_QUERIES[name]
+    assert_indexed(query_plan(engine, stmt), ordered)
+
+
+def test_legacy_database_gets_indexes(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    # فایل قدیمی: جدول‌ها بدون ایندکس‌های ثانویه و بدون user_version
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            table.create(conn)
+        for table in (Order.__table__, Transaction.__table__):
+            for index in table.indexes:
+                index.drop(conn)
+
+    assert migrate(engine) == SCHEMA_VERSION
+    with engine.connect() as conn:
+        names = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+        assert conn.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+    assert {'ix_orders_user_status', 'ix_orders_status_created', 'ix_orders_tx_hash',
+            'ix_transactions_user_created', 'ux_transactions_idempotency'} <= names
+    assert_indexed(query_plan(engine, transactions_page_query(42)), ordered=True)
+    engine.dispose()
@@ -0,0 +1,99 @@
+# tests/test_router.py
+import pytest
+from src.utils.router import CallbackRouter
+from tests.benchmark import StubBot, make_callback
+
+ADMIN_ID = 1000
+
+
+def handler(bot, call, **kwargs):
+    return kwargs
+
+
+@pytest.fixture
+def router():
+    router = CallbackRouter()
+    router.add_route('menu', handler)
+    router.add_route('visa:products', handler)
+    router.add_route('visa:products:<int:page>', handler)
+    router.add_route('visa:products:<direction>:<int:page>:<int:cursor>', handler)
+    router.add_route('admin:orders:<status>:<period>', handler, admin_only=True)
+    return router
+
+
+def test_resolve_typed_segments(router):
+    route, kwargs = router.resolve('visa:products:3')
+    assert (route.pattern, kwargs) == ('visa:products:<int:page>', {'page': 3})
+    route, kwargs = router.resolve('visa:products:p:2:41')
+    assert kwargs == {'direction': 'p', 'page': 2, 'cursor': 41}
+    assert router.resolve('visa:products')[0].pattern == 'visa:products'
+    assert router.resolve('admin:orders:pending:7d')[1] == {'status': 'pending', 'period': '7d'}
+
+
+def test_unknown_and_malformed_callbacks_do_not_resolve(router):
+    for data in ('', 'nope', 'menu:extra', 'visa', 'visa:products:abc', 'visa:products:n:x:1', 'visa:products:1:2'):
+        assert router.resolve(data) == (None, None), data
+
+
+def test_bad_patterns_are_rejected(router):
+    with pytest.raises(ValueError):
+        router.add_route('visa:products:<int:page>', handler)  # تکراری
+    with pytest.raises(ValueError):
+        router.add_route('x:<float:amount>', handler)
+    with pytest.raises(ValueError):
+        router.add_route('x:<int:id>:tail', handler)
+
+
+def test_dispatch_checks_admin_and_notifies_observers(router, monkeypatch):
+    from src.utils import router as router_module
+    monkeypatch.setattr(router_module, 'ADMIN_ID', ADMIN_ID)
+    observed = []
+    router.add_observer(lambda route, elapsed, error: observed.append((route.pattern, error)))
+    bot = StubBot()
+
+    assert router.dispatch(bot, make_callback(5, 'admin:orders:pending:7d'))
+    assert bot.calls[-1][2]['text'] == "Access denied" and observed == []
+    assert router.dispatch(bot, make_callback(ADMIN_ID, 'admin:orders:pending:7d'))
+    assert not router.dispatch(bot, make_callback(5, 'unknown'))
+    assert observed == [('admin:orders:<status>:<period>', None)]
+    assert router.stats()['admin:orders:<status>:<period>']['calls'] == 1
+
+
+def test_lazy_loader_runs_only_for_its_prefix(router):
+    loads = []
+
+    def load_wallet():
+        loads.append('wallet')
+        router.add_route('menu:wallet', handler)
+        router.add_route('wallet:transactions:<int:page>', handler)
+
+    router.add_loader('menu:wallet', load_wallet)
+    router.add_loader('wallet', load_wallet)
+    assert router.resolve('menu')[0].pattern == 'menu'  # مسیر موجود: loader صدا زده نمی‌شود
+    assert router.resolve('menu:profile') == (None, None)
+    assert loads == []
+
+    assert router.resolve('menu:wallet')[0].pattern == 'menu:wallet'
+    assert router.resolve('wallet:transactions:2')[1] == {'page': 2}
+    # مسیرهای wallet حالا ثبت شده‌اند؛ loader پیشوند دوم دیگر لازم نمی‌شود
+    assert loads == ['wallet'] and list(router.loaders) == [('wallet',)]
+
+
+def test_loader_that_fails_midway_can_be_retried(router):
+    attempts = []
+
+    def half_imported():
+        # مثل ماژولی که بعد از ثبت چند مسیر در ایمپورت خطا می‌دهد
+        attempts.append(1)
+        router.add_route('shop:item:<int:item_id>', handler)
+        if len(attempts) == 1:
+            raise ImportError('broken deploy')
+        router.add_route('shop:basket', handler)
+
+    router.add_loader('shop', half_imported)
+    with pytest.raises(ImportError):
+        router.resolve('shop:item:3')
+    assert router.resolve('menu')[0].pattern == 'menu' and ('shop', 'item') not in {p for p, _ in router.routes}
+    assert router.resolve('shop:item:3')[1] == {'item_id': 3}
+    assert router.resolve('shop:basket')[0].pattern == 'shop:basket'
+    assert len(attempts) == 2 and not router.loaders
@@ -0,0 +1,68 @@
+# tests/test_startup.py
+import pytest
+from src.utils.router import CallbackRouter
+from src.utils.startup import StartupTimer
+from tests import benchmark_startup
+
+
+def test_router_imports_route_module_on_first_hit():
+    router = CallbackRouter()
+    loads = []
+
+    def load_shop():
+        loads.append('shop')
+        router.add_route('shop:item:<int:item_id>', lambda bot, call, item_id: item_id)
+
+    router.add_loader('shop', load_shop)
+    assert router.resolve('shop:item:7')[1] == {'item_id': 7}
+    assert router.resolve('shop:item:8')[1] == {'item_id': 8}
+    assert router.resolve('shop:nothing') == (None, None)
+    assert router.resolve('other:item:1') == (None, None)
+    assert loads == ['shop']
+
+
+def test_failed_route_module_import_is_retried():
+    router = CallbackRouter()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ImportError('broken deploy')
+        router.add_route('flaky', lambda bot, call: None)
+
+    router.add_loader('flaky', flaky)
+    with pytest.raises(ImportError):
+        router.resolve('flaky')
+    assert router.resolve('flaky')[0].pattern == 'flaky'
+    assert len(attempts) == 2 and not router.loaders
+
+
+def test_startup_timer_breakdown():
+    now = [10.0]
+    timer = StartupTimer(clock=lambda: now[0])
+    now[0] = 10.5
+    timer.mark('imports')
+    timer.add('handlers', 0.1)  # ایمپورت lazy وسط فاز بعدی
+    now[0] = 10.8
+    timer.mark('schema')
+    assert timer.report() == {'imports_ms': 500.0, 'handlers_ms': 100.0, 'schema_ms': 200.0, 'total_ms': 800.0}
+
+    now[0] = 11.0
+    timer.first_update('message')
+    now[0] = 12.0
+    timer.first_update('callback')
+    assert timer.first_update_at == 11.0
+
+
+def test_cold_start_defers_handler_modules_until_their_route():
+    results = benchmark_startup.run(runs=1)
+    lazy, eager = results['lazy'], results['eager']
+    assert lazy['handlers_at_ready'] == []
+    assert lazy['handlers_after'] == ['src.handlers.onboarding', 'src.handlers.wallet']
+    assert len(eager['handlers_at_ready']) == len(eager['handlers_after']) == 8
+    # هر دو حالت به /start و منوی کیف پول همان پاسخ‌ها را می‌دهند
+    assert lazy['api_calls'] == eager['api_calls'] == ['send_message', 'edit_message_text']
+    for r in results.values():
+        assert set(r['phases_ms']) >= {'imports', 'bot', 'schema', 'routes', 'services'}
+        assert r['ready_ms'] <= r['to_first_update_ms'] <= r['process_ms']
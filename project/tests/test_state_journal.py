@@ -0,0 +1,109 @@
+# tests/test_state_journal.py
+import json
+import os
+import threading
+import time
+from src.utils.journal import StateJournal
+from src.utils.states import StateStore
+
+
+def journaled_store(path, **kwargs):
+    store = StateStore()
+    store.attach_journal(StateJournal(str(path), **kwargs))
+    return store
+
+
+def crash(store):
+    """Drop the process state without a clean shutdown (no compaction)."""
+    store.journal.close()
+
+
+def test_wizard_survives_restart(tmp_path):
+    store = journaled_store(tmp_path)
+    store.set(1, 'order_full_name', {'product_id': 3, 'product_name': 'Gold'})
+    store.update_data(1, 'full_name', 'Ali')
+    store.set(1, 'order_address', dict(store.get_data(1)))
+    store.append_to_list(1, 'descriptions', 'first')
+    store.append_to_list(1, 'descriptions', 'second')
+    store.set(2, 'admin_add_product_name')
+    store.clear(2)
+    store.set(3, 'wallet_charge_amount')
+    crash(store)
+
+    recovered = journaled_store(tmp_path)
+    assert recovered.get(1) == 'order_address'
+    assert recovered.get_data(1) == {'product_id': 3, 'product_name': 'Gold', 'full_name': 'Ali',
+                                     'descriptions': ['first', 'second']}
+    assert recovered.get(2) is None and recovered.get(3) == 'wallet_charge_amount'
+    assert recovered.back(1) == ('order_full_name', {'product_id': 3, 'product_name': 'Gold', 'full_name': 'Ali'})
+
+
+def test_compaction_bounds_the_journal_and_recovery(tmp_path):
+    store = journaled_store(tmp_path, compact_every=100)
+    for i in range(1000):
+        store.set(i % 50, f"step_{i}", {'i': i})
+    for thread in threading.enumerate():
+        if thread.name == 'state-compaction':
+            thread.join()  # منتظر compaction پس‌زمینه می‌مانیم
+    crash(store)
+    with open(tmp_path / 'state.journal') as f:
+        assert sum(1 for _ in f) < 200
+
+    recovered = journaled_store(tmp_path, compact_every=100)
+    assert len(recovered) == 50
+    assert recovered.get(49) == 'step_999' and recovered.get_data(0) == {'i': 950}
+
+
+def test_crash_between_snapshot_and_truncate_does_not_double_apply(tmp_path):
+    store = journaled_store(tmp_path)
+    store.set(1, 'admin_add_product_description')
+    store.append_to_list(1, 'descriptions', 'a')
+    # مثل crash درست بعد از چرخاندن journal و پیش از حذف فایل .old
+    with store._lock:
+        payload = store._snapshot_payload(store.journal.rotate())
+    tmp = store.journal.snapshot_path
+    with open(tmp, 'w') as f:
+        f.write(payload)
+    store.append_to_list(1, 'descriptions', 'b')
+    crash(store)
+    assert os.path.exists(store.journal.old_path)
+
+    recovered = journaled_store(tmp_path)
+    assert recovered.get_data(1) == {'descriptions': ['a', 'b']}
+    assert not os.path.exists(recovered.journal.old_path)
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    store = journaled_store(tmp_path)
+    store.set(1, 'order_mobile', {'full_name': 'Sara'})
+    crash(store)
+    with open(tmp_path / 'state.journal', 'a') as f:
+        f.write('{"q": 99, "t": 1, "o": "se')
+    recovered = journaled_store(tmp_path)
+    assert recovered.get(1) == 'order_mobile'
+    recovered.set(1, 'order_address')
+    crash(recovered)
+    assert journaled_store(tmp_path).get(1) == 'order_address'
+
+
+def test_idle_ttl_keeps_counting_across_restart(tmp_path):
+    store = journaled_store(tmp_path)
+    store.set(1, 'order_full_name')
+    crash(store)
+    path = tmp_path / 'state.journal'
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    for entry in entries:
+        entry['t'] -= 2 * 86400  # دو روز پیش نوشته شده
+    path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+    assert journaled_store(tmp_path).get(1) is None
+
+
+def test_recovery_time_stays_small(tmp_path):
+    store = journaled_store(tmp_path, compact_every=5000)
+    for i in range(20000):
+        store.set(i, 'order_full_name', {'product_id': i, 'product_name': 'Gold card'})
+    crash(store)
+    started = time.perf_counter()
+    recovered = journaled_store(tmp_path)
+    assert len(recovered) == 20000
+    assert time.perf_counter() - started < 5
@@ -0,0 +1,83 @@
+# tests/test_states.py
+from src.utils import states
+from src.utils.states import StateStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_capacity_evicts_least_recently_used():
+    store = StateStore(max_entries=3, ttl=60, clock=Clock())
+    for user_id in (1, 2, 3):
+        store.set(user_id, f"step{user_id}")
+    assert store.get(1) == 'step1'  # 1 تازه می‌شود؛ قدیمی‌ترین حالا 2 است
+    store.set(4, 'step4')
+    assert store.get(2) is None
+    assert [store.get(u) for u in (1, 3, 4)] == ['step1', 'step3', 'step4']
+    assert store.stats()['capacity_evictions'] == 1 and len(store) == 3
+
+
+def test_idle_records_expire_on_read():
+    clock = Clock()
+    store = StateStore(max_entries=10, ttl=60, clock=clock)
+    store.set(1, 'order_full_name', {'product_id': 5})
+    store.set(2, 'wallet_charge_amount')
+    clock.now += 59
+    assert store.get(1) == 'order_full_name'  # خواندن زمان بیکاری را از نو شروع می‌کند
+    clock.now += 30
+    assert store.get(2) is None and store.get_data(2) == {}
+    assert store.get_data(1) == {'product_id': 5}
+    clock.now += 60
+    assert store.get(1) is None
+    assert store.stats()['ttl_evictions'] == 2 and len(store) == 0
+
+
+def test_sweep_drops_idle_records_without_reads():
+    clock = Clock()
+    store = StateStore(max_entries=10, ttl=60, clock=clock)
+    store.set(1, 'a')
+    clock.now += 30
+    store.set(2, 'b')
+    clock.now += 40
+    assert store.sweep() == 1
+    assert store.get(2) == 'b'
+
+
+def test_history_is_capped():
+    store = StateStore(max_entries=10, ttl=60, history_limit=2, clock=Clock())
+    for step in ('s1', 's2', 's3', 's4'):
+        store.set(1, step, {'step': step})
+    assert store.back(1) == ('s3', {'step': 's3'})
+    assert store.back(1) == ('s2', {'step': 's2'})
+    assert store.back(1) == (None, None)  # s1 از پشته‌ی دوتایی بیرون افتاده بود
+    assert store.get(1) == 's2'
+
+
+def test_module_helpers_keep_their_old_behaviour(monkeypatch):
+    monkeypatch.setattr(states, 'store', StateStore(max_entries=10, ttl=60, clock=Clock()))
+    user_id = 42
+    assert states.get_state(user_id) is None and states.get_state_data(user_id) == {}
+
+    states.set_state(user_id, 'order_full_name')
+    assert states.get_state_data(user_id) == {}  # data=None یعنی dict خالی
+    states.update_state_data(user_id, 'full_name', 'Ali')
+    states.append_to_state_list(user_id, 'files', 'f1')
+    states.append_to_state_list(user_id, 'files', 'f2')
+    assert states.get_state_data(user_id, 'full_name') == 'Ali'
+    assert states.get_state_data(user_id, 'files') == ['f1', 'f2']
+    assert states.get_state_data(user_id, 'missing') is None
+
+    states.set_state(user_id, 'order_address', {'full_name': 'Ali'})
+    assert states.get_state(user_id) == 'order_address'
+    assert states.back_state(user_id) == ('order_full_name', {'full_name': 'Ali', 'files': ['f1', 'f2']})
+
+    states.clear_state(user_id)
+    assert states.get_state(user_id) is None and states.get_state_data(user_id) == {}
+    assert states.back_state(user_id) == (None, None)  # history هم پاک شده است
+    states.update_state_data(user_id, 'full_name', 'Ali')  # بدون state کاری نمی‌کند
+    assert states.get_state_data(user_id) == {}
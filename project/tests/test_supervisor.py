@@ -0,0 +1,157 @@
+# tests/test_supervisor.py
+import multiprocessing
+import os
+import queue
+import time
+from src.utils.epochs import EpochTable
+from src.utils.states import StateStore
+from config.settings import OUTBOUND_GLOBAL_RATE
+from src.utils.supervisor import ProcessShardedTeleBot, IngestBot, Supervisor, EPOCH_SLOTS, send_rate_share
+from src.database.state_backend import SQLiteStateBackend
+from tests.benchmark_runtime import as_update
+from tests.benchmark import make_message, make_callback
+
+
+def _bump_slot(shared, slot):
+    EpochTable(4, shared=shared).bump(slot)
+
+
+def echo_worker(index, count, updates, shared_epochs):
+    """Stand-in worker: counts each user's messages in the epoch table; dies on 'crash'."""
+    table = EpochTable(EPOCH_SLOTS, shared=shared_epochs)
+    while True:
+        batch = updates.get()
+        if batch is None:
+            return
+        for update in batch:
+            if update.message.text == 'crash':
+                os._exit(1)
+            table.bump(update.message.from_user.id)
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def test_epoch_bump_is_seen_by_other_processes():
+    ctx = multiprocessing.get_context('spawn')
+    table = EpochTable(4, ctx=ctx)
+    process = ctx.Process(target=_bump_slot, args=(table.shared(), 2))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    assert [table.read(slot) for slot in range(4)] == [0, 0, 1, 0]
+
+
+def test_caches_refetch_after_another_process_writes():
+    from src.database.db_manager import init_db, Session
+    from src.database.models import Product, User, Wallet, TransactionType
+    from src.database.catalog import ProductCatalog
+    from src.database.users import UserRegistry
+    from src.database.ledger import Ledger
+    init_db()
+    table = EpochTable(64)
+    catalog, users, ledger = ProductCatalog(), UserRegistry(), Ledger()
+    catalog.epochs, users.epochs, ledger.cache.epochs = table.region(1), table.region(8), table.region(8)
+
+    users.register(80_001)
+    ledger.post(80_001, 500, TransactionType.deposit, 'seed')
+    assert users.get(80_001).is_vip is False and ledger.balance(80_001) == 500
+    loads = catalog.loads
+    catalog.all()
+    catalog.all()
+    assert catalog.loads == loads + 1
+
+    # «پروسه‌ی دیگر»: مستقیم در DB می‌نویسد و epoch را بالا می‌برد
+    session = Session()
+    try:
+        session.query(User).filter_by(user_id=80_001).update({'is_vip': True})
+        session.query(Wallet).filter_by(user_id=80_001).update({'balance': 700})
+        session.add(Product(code='EP-001', name='Epoch card', price=1))
+        session.commit()
+    finally:
+        session.close()
+    assert users.get(80_001).is_vip is False and ledger.balance(80_001) == 500  # هنوز از cache
+    users.epochs.bump(80_001)
+    ledger.cache.epochs.bump(80_001)
+    catalog.epochs.bump()
+    assert users.get(80_001).is_vip is True
+    assert ledger.balance(80_001) == 700
+    assert any(p.code == 'EP-001' for p in catalog.all())
+
+    # نوشتن در همین پروسه هم فقط bump می‌کند و مقدار بعدی از DB می‌آید
+    ledger.post(80_001, 100, TransactionType.deposit, 'more')
+    assert ledger.balance(80_001) == 800
+
+
+def test_state_backend_shares_state_between_stores(tmp_path):
+    backend = SQLiteStateBackend(f"sqlite:///{tmp_path / 'state.db'}")
+    first = StateStore()
+    first.attach_backend(backend, 0, 2)
+    first.set(2, 'order_full_name', {'product_id': 1})
+    first.update_data(2, 'full_name', 'Ali')
+    first.set(2, 'order_address', dict(first.get_data(2)))
+    first.set(4, 'wallet_charge_amount')
+    first.clear(4)
+
+    # worker جایگزین همان shard را از backend برمی‌دارد
+    second = StateStore()
+    assert second.attach_backend(SQLiteStateBackend(f"sqlite:///{tmp_path / 'state.db'}"), 0, 2)['records'] == 1
+    assert second.get(2) == 'order_address'
+    assert second.get_data(2) == {'product_id': 1, 'full_name': 'Ali'}
+    assert second.back(2) == ('order_full_name', {'product_id': 1, 'full_name': 'Ali'})
+    other_shard = StateStore()
+    other_shard.attach_backend(backend, 1, 2)
+    assert len(other_shard) == 0
+    # پروسه‌ی دریافت (flood control) همین جدول را می‌بیند
+    assert backend.active(2, ttl=60) and not backend.active(4, ttl=60)
+    assert not backend.active(2, ttl=-1)
+
+
+def test_updates_are_sharded_by_user_and_keep_their_order():
+    queues = [queue.Queue() for _ in range(3)]
+    bot = ProcessShardedTeleBot('123456:TEST-TOKEN', queues)
+    updates = [as_update(message=make_message(user_id, str(i))) for i in range(4) for user_id in (10, 11, 12, 13)]
+    updates.append(as_update(callback_query=make_callback(10, 'menu')))
+    bot.process_new_updates(updates)
+    assert bot.last_update_id == updates[-1].update_id
+
+    received = {}
+    for index, q in enumerate(queues):
+        while not q.empty():
+            for update in q.get():
+                user_id = update.message.from_user.id if update.message else update.callback_query.from_user.id
+                assert user_id % 3 == index
+                received.setdefault(user_id, []).append(update.message.text if update.message else 'callback')
+    assert received[10] == ['0', '1', '2', '3', 'callback']
+    assert received[13] == ['0', '1', '2', '3']
+
+
+def test_supervisor_feeds_workers_and_restarts_dead_ones():
+    supervisor = Supervisor(2, target=echo_worker, check_interval=0.05).start()
+    try:
+        bot = ProcessShardedTeleBot('123456:TEST-TOKEN', supervisor.queues)
+        table = supervisor.epochs
+        bot.process_new_updates([as_update(message=make_message(u, 'hi')) for _ in range(3) for u in (1, 2, 3, 4)])
+        wait_for(lambda: [table.read(u) for u in (1, 2, 3, 4)] == [3, 3, 3, 3])
+
+        bot.process_new_updates([as_update(message=make_message(2, 'crash'))])
+        wait_for(lambda: supervisor.restarts == 1)
+        bot.process_new_updates([as_update(message=make_message(2, 'hi')), as_update(message=make_message(3, 'hi'))])
+        wait_for(lambda: table.read(2) == 4 and table.read(3) == 4)
+    finally:
+        supervisor.stop()
+    assert [p.exitcode for p in supervisor.processes] == [0, 0]
+
+
+def test_ingest_and_workers_share_the_global_send_rate():
+    queues = [queue.Queue() for _ in range(3)]
+    bot = IngestBot('123456:TEST-TOKEN', queues)
+    try:
+        # سه worker و پروسه‌ی دریافت، هر کدام یک چهارم
+        assert bot.outbound.global_bucket.rate == send_rate_share(3) == OUTBOUND_GLOBAL_RATE / 4
+    finally:
+        bot.outbound.stop()
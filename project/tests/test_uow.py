@@ -0,0 +1,98 @@
+# tests/test_uow.py
+import pytest
+from src.database.db_manager import init_db, Session, get_user, create_user, create_order, update_order_status
+from src.database.models import Order, User
+from src.database.uow import unit_of_work, session_scope, after_commit, current_unit
+
+
+@pytest.fixture(scope='module', autouse=True)
+def database():
+    init_db()
+
+
+def order_status(order_id):
+    session = Session()
+    try:
+        return session.get(Order, order_id).status
+    finally:
+        session.close()
+
+
+def test_helpers_share_one_session_and_commit_once():
+    with unit_of_work('test') as unit:
+        create_user({'user_id': 70_001, 'first_name': 'Uow'})
+        # خواندن داخل همان unit نوشتهٔ commit‌نشده را می‌بیند
+        assert get_user(70_001).first_name == 'Uow'
+        order = create_order({'user_id': 70_001, 'product_id': 1, 'product_name': 'Gold',
+                              'product_price': 1000, 'tx_hash': 'uow-1', 'status': 'pending'})
+        update_order_status(order.id, 'accepted')
+        with session_scope() as a, session_scope() as b:
+            assert a is b is unit.session
+        assert unit.queries >= 4
+    assert current_unit() is None
+    assert order_status(order.id) == 'accepted'
+
+
+def test_exception_rolls_back_the_whole_update():
+    with pytest.raises(RuntimeError):
+        with unit_of_work('test'):
+            create_user({'user_id': 70_002})
+            raise RuntimeError('handler crashed')
+    assert get_user(70_002) is None
+
+
+def test_on_commit_hooks_run_only_after_commit():
+    seen = []
+    with unit_of_work('test'):
+        create_user({'user_id': 70_003})
+        after_commit(lambda: seen.append(get_user(70_003) is not None))
+        assert seen == []
+    assert seen == [True]
+
+    with pytest.raises(ValueError):
+        with unit_of_work('test'):
+            after_commit(lambda: seen.append('rolled back'))
+            raise ValueError
+    assert seen == [True]
+
+    after_commit(lambda: seen.append('immediate'))
+    assert seen == [True, 'immediate']
+
+
+def test_nested_unit_joins_outer_and_idle_unit_opens_no_session():
+    with unit_of_work('outer') as outer:
+        with unit_of_work('inner') as inner:
+            assert inner is outer
+        assert not outer.active
+        assert outer.queries == 0
+
+
+def test_session_scope_outside_a_unit_commits():
+    with session_scope() as session:
+        session.add(User(user_id=70_004))
+    assert get_user(70_004) is not None
+
+
+def test_ledger_and_catalog_commit_on_their_own_but_are_counted():
+    from src.database.ledger import ledger
+    from src.database.catalog import catalog
+    from src.database.models import TransactionType
+    with pytest.raises(RuntimeError):
+        with unit_of_work('test') as unit:
+            ledger.post(70_500, 250, TransactionType.deposit, 'outside the unit')
+            catalog.invalidate()
+            catalog.all()
+            assert unit.queries >= 3 and not unit.active  # شمرده شد، ولی session مشترک باز نشد
+            raise RuntimeError('handler failed after the charge')
+    assert ledger.balance(70_500) == 250  # rollback آپدیت، پول commit‌شده را برنمی‌گرداند
+
+
+def test_start_command_runs_in_a_unit_of_work(harness):
+    from src.database.uow import UPDATE_QUERIES
+    from tests import benchmark
+    observed = UPDATE_QUERIES.labels('message')
+    before = sum(observed.counts), observed.sum
+    harness.main.start_handler(benchmark.make_message(70_005, '/start'))
+    assert sum(observed.counts) == before[0] + 1
+    assert observed.sum > before[1]  # ثبت کاربر در همان unit شمرده شده
+    assert get_user(70_005) is not None
@@ -0,0 +1,72 @@
+# tests/test_users.py
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from src.database.db_manager import create_db_engine
+from src.database.migrations import migrate
+from src.database.models import User
+from src.database.users import UserRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'users.db'}")
+    migrate(engine)
+    yield UserRegistry(max_entries=3, session_factory=sessionmaker(bind=engine))
+    engine.dispose()
+
+
+def rows(registry):
+    session = registry.Session()
+    try:
+        return {u.user_id: u for u in session.scalars(select(User))}
+    finally:
+        session.close()
+
+
+def test_register_is_idempotent_and_served_from_memory(registry):
+    user, created = registry.register(1, 'ali', 'Ali')
+    assert created and user.id and len(user.referral_code) == 8
+    misses = registry.misses
+    again, created = registry.register(1, 'ali', 'Ali')
+    assert not created and again is user and registry.misses == misses
+    assert registry.known(1) and len(rows(registry)) == 1
+
+
+def test_referrer_is_resolved_in_the_same_statement(registry):
+    referrer, _ = registry.register(1, 'ref')
+    user, _ = registry.register(2, 'new', referrer_code=referrer.referral_code)
+    stranger, _ = registry.register(3, 'x', referrer_code='NOPE0000')
+    db = rows(registry)
+    assert db[2].referred_by == referrer.id and db[3].referred_by is None
+
+
+def test_restart_refreshes_names_without_duplicating(registry):
+    registry.register(1, 'old_name', 'Ali')
+    registry.invalidate()  # مثل ری‌استارت پروسه
+    user, created = registry.register(1, 'new_name', 'Ali')
+    assert not created
+    assert rows(registry)[1].username == 'new_name' and len(rows(registry)) == 1
+
+
+def test_lru_evicts_and_unknown_users_are_not_cached(registry):
+    for user_id in range(1, 6):
+        registry.register(user_id)
+    assert len(registry) == 3
+    assert registry.get(1).user_id == 1  # از DB دوباره خوانده می‌شود
+    assert registry.get(99) is None and not registry.known(99)
+    registry.register(99)
+    assert registry.known(99)
+
+
+def test_legacy_user_without_a_code_is_not_reported_as_new(registry):
+    session = registry.Session()
+    session.add(User(user_id=7, username='legacy'))  # پیش از اضافه شدن کد معرف
+    session.commit()
+    session.close()
+    user, created = registry.register(7, 'legacy', 'Old')
+    assert not created and len(user.referral_code) == 8
+    assert rows(registry)[7].referral_code == user.referral_code and len(rows(registry)) == 1
+    registry.invalidate()
+    again, created = registry.register(7, 'legacy', 'Old')
+    assert not created and again.referral_code == user.referral_code
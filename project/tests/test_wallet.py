@@ -0,0 +1,37 @@
+# tests/test_wallet.py
+from tests import benchmark
+from src.database.ledger import ledger
+
+WALLET_MESSAGE_ID = 5
+
+
+def tap(h, user_id, data):
+    """A callback from the user's wallet message (every wallet screen edits the same one)."""
+    call = benchmark.make_callback(user_id, data)
+    call.message.message_id = WALLET_MESSAGE_ID
+    h.main.callback_handler(call)
+    return next(kwargs['text'] for method, _, kwargs in reversed(h.bot.calls) if method == 'edit_message_text')
+
+
+def confirm_data(h, user_id, amount):
+    tap(h, user_id, f"wallet:charge_amount:{amount}")
+    return benchmark.callback_data_of(h.bot.last_markup(), 'wallet:confirm_charge:')
+
+
+def test_two_charges_from_one_wallet_message_are_both_applied(harness):
+    user_id = harness.new_user()
+    first, second = confirm_data(harness, user_id, 100000), confirm_data(harness, user_id, 500000)
+    assert first != second
+    assert tap(harness, user_id, first).startswith("✅")
+    assert tap(harness, user_id, second).startswith("✅")
+    assert ledger.balance(user_id) == 600000
+
+
+def test_double_tap_on_one_confirm_charges_once(harness):
+    user_id = harness.new_user()
+    data = confirm_data(harness, user_id, 100000)
+    assert tap(harness, user_id, data).startswith("✅")
+    again = tap(harness, user_id, data)
+    assert "قبلاً اعمال شده" in again
+    assert harness.bot.calls[-1][2]['text'] == "این شارژ قبلاً انجام شده بود."
+    assert ledger.balance(user_id) == 100000
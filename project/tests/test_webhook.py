@@ -0,0 +1,68 @@
+# tests/test_webhook.py
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from src.utils.webhook import WebhookServer
+
+
+UPDATE = {
+    'update_id': 42,
+    'message': {
+        'message_id': 7,
+        'date': 1700000000,
+        'chat': {'id': 555, 'type': 'private'},
+        'from': {'id': 555, 'is_bot': False, 'first_name': 'Test'},
+        'text': '/start',
+    },
+}
+
+
+@pytest.fixture
+def server():
+    received = []
+    event = threading.Event()
+
+    def on_update(update):
+        received.append(update)
+        event.set()
+
+    srv = WebhookServer('127.0.0.1', 0, '/hook', on_update, secret='s3cret').start()
+    srv.received_updates = received
+    srv.event = event
+    yield srv
+    srv.stop()
+
+
+def post(server, payload, secret='s3cret', path='/hook'):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.port}{path}",
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': secret},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status
+
+
+def test_update_is_acknowledged_and_dispatched(server):
+    assert post(server, UPDATE) == 200
+    assert server.event.wait(5)
+    update = server.received_updates[0]
+    assert update.update_id == 42
+    assert update.message.from_user.id == 555
+    assert update.message.text == '/start'
+
+
+def test_wrong_secret_is_rejected(server):
+    with pytest.raises(urllib.error.HTTPError) as exc:
+        post(server, UPDATE, secret='wrong')
+    assert exc.value.code == 403
+    assert server.received == 0
+
+
+def test_unknown_path_is_rejected(server):
+    with pytest.raises(urllib.error.HTTPError) as exc:
+        post(server, UPDATE, path='/other')
+    assert exc.value.code == 404
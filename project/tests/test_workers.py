@@ -0,0 +1,74 @@
+# tests/test_workers.py
+import random
+import threading
+import time
+from src.utils.workers import ShardedExecutor, ShardedTeleBot
+from tests.benchmark import make_message
+from tests.benchmark_runtime import as_update
+
+
+def test_each_key_runs_in_submission_order_and_stats_add_up():
+    seen = {}
+    lock = threading.Lock()
+
+    def handler(item):
+        user_id, seq = item
+        time.sleep(random.random() / 2000)
+        with lock:
+            seen.setdefault(user_id, []).append(seq)
+        if seq % 10 == 9:
+            raise RuntimeError('handler bug')
+
+    executor = ShardedExecutor(3, handler, name='test-shard')
+    users, per_user = range(1, 9), 40
+
+    def producer(user_id):
+        for seq in range(per_user):
+            executor.submit(user_id, (user_id, seq))
+
+    # همه‌ی کاربران هم‌زمان و درهم ارسال می‌کنند
+    producers = [threading.Thread(target=producer, args=(u,)) for u in users]
+    for t in producers:
+        t.start()
+    for t in producers:
+        t.join()
+    executor.join()
+
+    assert all(seen[u] == list(range(per_user)) for u in users)
+    stats = executor.stats()
+    assert sum(s['processed'] for s in stats) == len(users) * per_user
+    assert sum(s['errors'] for s in stats) == len(users) * per_user // 10
+    assert all(s['queue_depth'] == 0 for s in stats) and executor.queue_depth() == 0
+    executor.shutdown()
+
+
+def test_shutdown_finishes_queued_items_before_stopping():
+    done = []
+    executor = ShardedExecutor(2, lambda item: (time.sleep(0.002), done.append(item)))
+    for i in range(50):
+        executor.submit(i, i)
+    executor.shutdown(wait=True)  # STOP پشت کارهای صف قرار می‌گیرد
+    assert sorted(done) == list(range(50))
+    assert not any(t.is_alive() for t in executor.threads)
+    executor.join()  # بعد از shutdown هم بلاک نمی‌کند
+
+
+def test_sharded_bot_keeps_each_users_updates_in_order():
+    bot = ShardedTeleBot('123456:TEST-TOKEN', num_workers=3)
+    handled = {}
+    lock = threading.Lock()
+
+    @bot.message_handler(func=lambda message: True)
+    def record(message):
+        time.sleep(random.random() / 2000)
+        with lock:
+            handled.setdefault(message.from_user.id, []).append(int(message.text))
+
+    updates = [as_update(message=make_message(user_id, str(i))) for i in range(20) for user_id in (10, 11, 12, 13, 14)]
+    bot.process_new_updates(updates[:50])
+    bot.process_new_updates(updates[50:])
+    assert bot.last_update_id == updates[-1].update_id
+    bot.executor.join()
+    assert handled == {u: list(range(20)) for u in (10, 11, 12, 13, 14)}
+    assert sum(s['processed'] for s in bot.executor.stats()) == 100
+    bot.executor.shutdown()